@@ -18,4 +18,6 @@ __version__ = '.'.join((__major_version__,
 from osc import OpenSphericalCamera
 from theta import RicohThetaS
 from bubl import Bublcam
+from transport import HTTPTransport
+from asyncosc import AsyncOpenSphericalCamera, AsyncRicohThetaS, AsyncBublcam
 
@@ -0,0 +1,216 @@
+"""
+Asynchronous counterparts of OpenSphericalCamera, RicohThetaS and Bublcam.
+
+Every command returns a Future instead of blocking. The commands of all of
+the asynchronous cameras run on one shared WorkerPool of 16 threads, so at
+most 16 blocking calls run at once across all of the cameras. The commands
+of each camera run one at a time, in the order they were sent. Downloads and
+the live preview are returned as iterators that are filled ahead of the
+consumer, each holding a worker until it ends or is closed.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.asyncosc import AsyncRicohThetaS
+  from osc.pool import waitAll
+
+After you import the library, you can use the commands like this:
+
+  cameras = [AsyncRicohThetaS(ip) for ip in ["192.168.1.1", "192.168.1.2"]]
+
+  # Capture an image on every camera
+  responses = waitAll([camera.takePicture() for camera in cameras])
+
+  # Stream the live preview of the first camera for 3 seconds
+  for frame in cameras[0].iterLivePreview(timeLimitSeconds=3):
+      print( "%04d - %d bytes" % (frame.sequence, len(frame)) )
+"""
+
+import threading
+
+import osc
+import theta
+import bubl
+from pool import SerialQueue, defaultPool
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['AsyncOpenSphericalCamera',
+           'AsyncRicohThetaS',
+           'AsyncBublcam']
+
+def _command(name):
+    """
+    Build a method that runs the named method of the wrapped camera on the
+    pool and returns a Future.
+    """
+    def command(self, *args, **kwargs):
+        return self._submit(name, *args, **kwargs)
+    command.__name__ = name
+    command.__doc__ = "Asynchronous %s. Returns a Future." % name
+    return command
+
+def _iterator(name):
+    """
+    Build a method that runs the named generator of the wrapped camera on the
+    pool and returns a BufferedIterator.
+    """
+    def iterator(self, *args, **kwargs):
+        maxBuffered = kwargs.pop('maxBuffered', 8)
+        return self._iterate(name, maxBuffered, *args, **kwargs)
+    iterator.__name__ = name
+    iterator.__doc__ = ("Asynchronous %s. Returns an iterator that is filled "
+        "ahead of the consumer, holding up to maxBuffered items." % name)
+    return iterator
+
+#
+# Generic OpenSphericalCamera
+#
+class AsyncOpenSphericalCamera(object):
+    # Class variables / methods
+    cameraClass = osc.OpenSphericalCamera
+
+    # Instance variables / methods
+    def __init__(self, ip_base="192.168.1.1", httpPort=80, transport=None,
+        pool=None):
+        if pool is None:
+            pool = defaultPool()
+        self._pool = pool
+        self._queue = SerialQueue(pool)
+        # Held by each command, and by each step of an iterator, as the
+        # wrapped camera isn't thread-safe
+        self._lock = threading.Lock()
+
+        # Creating the camera starts a session, so it also runs on the pool
+        self._camera = None
+        self._connected = self._queue.submit(self._connect,
+            ip_base, httpPort, transport)
+
+    def _connect(self, ip_base, httpPort, transport):
+        self._camera = self.cameraClass(ip_base, httpPort, transport)
+        return self._camera
+
+    def _call(self, name, args, kwargs):
+        camera = self._connected.result()
+        with self._lock:
+            return getattr(camera, name)(*args, **kwargs)
+
+    def _submit(self, name, *args, **kwargs):
+        return self._queue.submit(self._call, name, args, kwargs)
+
+    def _iterate(self, name, maxBuffered, *args, **kwargs):
+        def generator():
+            camera = self._connected.result()
+            items = getattr(camera, name)(*args, **kwargs)
+            try:
+                while True:
+                    # Commands of the camera can run between two items
+                    with self._lock:
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                with self._lock:
+                    items.close()
+        return self._pool.iterate(generator(), maxBuffered)
+
+    def connected(self):
+        """
+        A Future for the wrapped, blocking camera, resolved once the initial
+        session has been started.
+        """
+        return self._connected
+
+    def getCamera(self):
+        """
+        The wrapped, blocking camera. Waits for the initial session.
+        """
+        return self._connected.result()
+
+    def getOptionNames(self):
+        return self.getCamera().getOptionNames()
+
+    info = _command("info")
+    state = _command("state")
+    status = _command("status")
+    commandStatus = _command("commandStatus")
+    checkForUpdates = _command("checkForUpdates")
+    checkFingerprint = _command("checkFingerprint")
+    waitForProcessing = _command("waitForProcessing")
+    startSession = _command("startSession")
+    updateSession = _command("updateSession")
+    closeSession = _command("closeSession")
+    takePicture = _command("takePicture")
+    listImages = _command("listImages")
+    delete = _command("delete")
+    getImage = _command("getImage")
+    getMetadata = _command("getMetadata")
+    setOption = _command("setOption")
+    setOptions = _command("setOptions")
+    getOption = _command("getOption")
+    getSid = _command("getSid")
+    getAllOptions = _command("getAllOptions")
+    latestFileUri = _command("latestFileUri")
+    getLatestImage = _command("getLatestImage")
+
+    iterImage = _iterator("iterImage")
+    iterImages = _iterator("iterImages")
+
+#
+# Ricoh Theta S
+#
+class AsyncRicohThetaS(AsyncOpenSphericalCamera):
+    # Class variables / methods
+    cameraClass = theta.RicohThetaS
+
+    setCaptureMode = _command("setCaptureMode")
+    getCaptureMode = _command("getCaptureMode")
+    listAll = _command("listAll")
+    finishWlan = _command("finishWlan")
+    startCapture = _command("startCapture")
+    stopCapture = _command("stopCapture")
+    getVideo = _command("getVideo")
+    getLatestVideo = _command("getLatestVideo")
+    getLivePreview = _command("getLivePreview")
+
+    iterAll = _iterator("iterAll")
+    iterVideo = _iterator("iterVideo")
+    iterLivePreview = _iterator("iterLivePreview")
+
+    def __init__(self, ip_base="192.168.1.1", httpPort=80, transport=None,
+        pool=None):
+        AsyncOpenSphericalCamera.__init__(self, ip_base, httpPort, transport, pool)
+
+#
+# Bubl cam
+#
+class AsyncBublcam(AsyncOpenSphericalCamera):
+    # Class variables / methods
+    cameraClass = bubl.Bublcam
+
+    updateFirmware = _command("updateFirmware")
+    stop = _command("stop")
+    poll = _command("poll")
+    captureVideo = _command("captureVideo")
+    shutdown = _command("shutdown")
+    stream = _command("stream")
+
+    iterStream = _iterator("iterStream")
+
+    def __init__(self, ip_base="192.168.0.100", httpPort=80, transport=None,
+        pool=None):
+        AsyncOpenSphericalCamera.__init__(self, ip_base, httpPort, transport, pool)
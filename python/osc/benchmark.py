@@ -0,0 +1,412 @@
+"""
+Benchmarks of the library against an emulated camera.
+
+BenchmarkSuite measures, against a CameraEmulator served from a separate
+process, so the emulator's work doesn't count against the library
+
+  commandRates    Calls per second of state, getOption and status
+  capture         Seconds from takePicture to the file being downloaded
+  downloads       getImage and getVideo throughput, by chunk size
+  listings        Seconds to list every file of cameras with 1000 and
+                  10000 files, with listImages and _listAll
+  preview         Frames per second of the live preview, and the CPU time
+                  the library spends on each frame
+
+The results are a dict of plain values, which can be written as JSON and
+compared between releases.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.benchmark import BenchmarkSuite, writeResults
+
+After you import the library, you can use the commands like this:
+
+  results = BenchmarkSuite(duration=2.0).run()
+  writeResults(results, "benchmark.json")
+
+  # Only some of the benchmarks, on a slower camera
+  suite = BenchmarkSuite(emulatorOptions={"latency": 0.02,
+      "bandwidth": 8*1024*1024})
+  results = suite.run(["commandRates", "downloads"])
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import tempfile
+import time
+import timeit
+
+import osc
+from emulator import CameraEmulator
+from theta import RicohThetaS
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['g_benchmarks',
+           'g_chunkSizes',
+           'g_listingSizes',
+           'BenchmarkSuite',
+           'writeResults']
+
+'''
+The benchmarks run by default, in order.
+'''
+g_benchmarks = [
+    "commandRates",
+    "capture",
+    "downloads",
+    "listings",
+    "preview"
+    ]
+
+'''
+Chunk sizes, in bytes, that downloads are measured with.
+'''
+g_chunkSizes = [16384, 65536, 262144, 1048576]
+
+'''
+Numbers of files on the camera that listings are measured with.
+'''
+g_listingSizes = [1000, 10000]
+
+#
+# Helpers
+#
+def _serve(connection, options):
+    emulator = CameraEmulator(**options)
+    emulator.start()
+    connection.send(emulator.address())
+    try:
+        connection.recv()
+    except EOFError:
+        pass
+    emulator.stop()
+
+class _EmulatorProcess(object):
+    """
+    A CameraEmulator running in a child process.
+    """
+    def __init__(self, options):
+        self._connection, childConnection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve,
+            args=(childConnection, options))
+        self._process.daemon = True
+        self._process.start()
+        self._address = self._connection.recv()
+
+    def address(self):
+        return self._address
+
+    def stop(self):
+        self._connection.send("stop")
+        self._process.join(5.0)
+
+def _cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+def _summary(values):
+    """
+    The count, mean, median, 90th percentile and extremes of a list of
+    values.
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "p50": ordered[len(ordered) // 2],
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "max": ordered[-1]
+    }
+
+def writeResults(results, fileName):
+    """
+    Write benchmark results to a JSON file.
+    """
+    with open(fileName, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+
+#
+# Benchmarks
+#
+class BenchmarkSuite(object):
+    """
+    Benchmarks of the library against an emulated camera.
+
+    cameraClass:
+            Class The camera class that is measured, like RicohThetaS or
+            Bublcam. Benchmarks of commands the class doesn't have are
+            skipped.
+    duration:
+            Float Seconds each command rate and download chunk size is
+            measured for.
+    chunkSizes:
+            List (Optional) Chunk sizes the downloads are measured with.
+            Defaults to g_chunkSizes.
+    listingSizes:
+            List (Optional) Numbers of files the listings are measured with.
+            Defaults to g_listingSizes.
+    fileSize:
+            Integer Size of the images, in bytes.
+    videoSize:
+            Integer Size of the video, in bytes.
+    captures:
+            Integer Number of captures measured, one after the other.
+    stitchDelay:
+            Float Seconds the emulated camera takes to stitch a capture.
+    previewFrames:
+            Integer Number of live preview frames measured.
+    emulatorOptions:
+            Dict (Optional) Other arguments of the CameraEmulator, like
+            latency or bandwidth.
+    """
+    def __init__(self, cameraClass=RicohThetaS, duration=2.0, chunkSizes=None,
+        listingSizes=None, fileSize=16777216, videoSize=67108864, captures=5,
+        stitchDelay=1.0, previewFrames=1000, emulatorOptions=None):
+        self.cameraClass = cameraClass
+        self.duration = duration
+        self.chunkSizes = list(chunkSizes or g_chunkSizes)
+        self.listingSizes = list(listingSizes or g_listingSizes)
+        self.fileSize = fileSize
+        self.videoSize = videoSize
+        self.captures = captures
+        self.stitchDelay = stitchDelay
+        self.previewFrames = previewFrames
+        self.emulatorOptions = dict(emulatorOptions or {})
+
+    def _startEmulator(self, **options):
+        settings = {"files": 10, "fileSize": self.fileSize,
+            "videoSize": self.videoSize, "stitchDelay": self.stitchDelay}
+        settings.update(self.emulatorOptions)
+        settings.update(options)
+        return _EmulatorProcess(settings)
+
+    def _camera(self, emulator):
+        host, port = emulator.address()
+        return self.cameraClass(host, port)
+
+    def _rate(self, function):
+        """
+        Call function repeatedly for the suite's duration.
+        """
+        latencies = []
+        started = timeit.default_timer()
+        end = started + self.duration
+        while True:
+            t0 = timeit.default_timer()
+            function()
+            t1 = timeit.default_timer()
+            latencies.append(t1 - t0)
+            if t1 >= end:
+                break
+        seconds = timeit.default_timer() - started
+        return {
+            "calls": len(latencies),
+            "seconds": seconds,
+            "callsPerSecond": len(latencies) / seconds,
+            "latency": _summary(latencies)
+        }
+
+    def commandRates(self):
+        """
+        Calls per second of state, getOption and status. getOption reads
+        remainingSpace, which isn't cached, so every call reaches the camera.
+        """
+        emulator = self._startEmulator(stitchDelay=0)
+        try:
+            camera = self._camera(emulator)
+            commandId = camera.takePicture()["id"]
+            return {
+                "state": self._rate(camera.state),
+                "getOption": self._rate(lambda: camera.getOption("remainingSpace")),
+                "status": self._rate(lambda: camera.status(commandId))
+            }
+        finally:
+            emulator.stop()
+
+    def capture(self, directory):
+        """
+        Seconds from sending takePicture to the image being written to
+        disk. The overhead is the part of that not spent stitching.
+        """
+        emulator = self._startEmulator()
+        try:
+            camera = self._camera(emulator)
+            latencies = []
+            for index in range(self.captures):
+                fileName = os.path.join(directory, "capture.jpg")
+                t0 = timeit.default_timer()
+                fileUri = camera.takePicture().result()["fileUri"]
+                camera.getImage(fileUri, fileName=fileName)
+                latencies.append(timeit.default_timer() - t0)
+                os.remove(fileName)
+            return {
+                "stitchDelay": self.stitchDelay,
+                "latency": _summary(latencies),
+                "overhead": _summary([latency - self.stitchDelay
+                    for latency in latencies])
+            }
+        finally:
+            emulator.stop()
+
+    def _throughput(self, download, fileName):
+        """
+        Megabytes per second of a download, repeated for the suite's
+        duration.
+        """
+        total = 0
+        started = timeit.default_timer()
+        while True:
+            download()
+            total += os.path.getsize(fileName)
+            os.remove(fileName)
+            if timeit.default_timer() - started >= self.duration:
+                break
+        seconds = timeit.default_timer() - started
+        return {
+            "bytes": total,
+            "seconds": seconds,
+            "megabytesPerSecond": total / seconds / (1024 * 1024)
+        }
+
+    def downloads(self, directory):
+        """
+        Throughput of getImage and getVideo for each chunk size.
+        """
+        emulator = self._startEmulator()
+        try:
+            camera = self._camera(emulator)
+            imageUri = camera.latestFileUri()
+            fileName = os.path.join(directory, "download")
+
+            results = {"getImage": {}}
+            for chunkSize in self.chunkSizes:
+                results["getImage"][str(chunkSize)] = self._throughput(
+                    lambda: camera.getImage(imageUri, fileName=fileName,
+                        chunkSize=chunkSize), fileName)
+
+            if hasattr(camera, "getVideo"):
+                camera.startCapture()
+                camera.stopCapture()
+                videoUri = camera.latestFileUri()
+                results["getVideo"] = {}
+                for chunkSize in self.chunkSizes:
+                    results["getVideo"][str(chunkSize)] = self._throughput(
+                        lambda: camera.getVideo(videoUri, fileName=fileName,
+                            chunkSize=chunkSize), fileName)
+            return results
+        finally:
+            emulator.stop()
+
+    def listings(self):
+        """
+        Seconds to page through every file, 100 entries at a time.
+        """
+        results = {}
+        for size in self.listingSizes:
+            emulator = self._startEmulator(files=size)
+            try:
+                camera = self._camera(emulator)
+                result = {}
+                t0 = timeit.default_timer()
+                result["entries"] = sum(1 for entry in camera.iterImages(pageSize=100))
+                result["listImages"] = timeit.default_timer() - t0
+                if hasattr(camera, "iterAll"):
+                    t0 = timeit.default_timer()
+                    for entry in camera.iterAll(pageSize=100, detail=True):
+                        pass
+                    result["listAll"] = timeit.default_timer() - t0
+                results[str(size)] = result
+            finally:
+                emulator.stop()
+        return results
+
+    def preview(self):
+        """
+        Frames per second of the live preview, and the CPU time the library
+        spends on each frame. The emulated camera sends frames as fast as it
+        can, so the frame rate is bounded by the library.
+        """
+        emulator = self._startEmulator(previewFps=100000)
+        try:
+            camera = self._camera(emulator)
+            if not hasattr(camera, "iterLivePreview"):
+                return None
+            frames = 0
+            size = 0
+            cpu0 = _cpuTime()
+            t0 = timeit.default_timer()
+            for frame in camera.iterLivePreview(maxFrames=self.previewFrames):
+                frames += 1
+                size += len(frame)
+            seconds = timeit.default_timer() - t0
+            cpu = _cpuTime() - cpu0
+            return {
+                "frames": frames,
+                "seconds": seconds,
+                "framesPerSecond": frames / seconds if seconds else None,
+                "megabytesPerSecond": size / seconds / (1024 * 1024) if seconds else None,
+                "cpuSecondsPerFrame": cpu / frames if frames else None
+            }
+        finally:
+            emulator.stop()
+
+    def run(self, benchmarks=None):
+        """
+        Run the benchmarks, by default those in g_benchmarks, and return the
+        results along with the versions and settings they were measured
+        with.
+        """
+        if benchmarks is None:
+            benchmarks = g_benchmarks
+
+        directory = tempfile.mkdtemp(prefix="oscbenchmark")
+        results = {}
+        try:
+            for name in benchmarks:
+                if name in ("capture", "downloads"):
+                    results[name] = getattr(self, name)(directory)
+                else:
+                    results[name] = getattr(self, name)()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        return {
+            "version": osc.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "camera": self.cameraClass.__name__,
+            "settings": {
+                "duration": self.duration,
+                "chunkSizes": self.chunkSizes,
+                "listingSizes": self.listingSizes,
+                "fileSize": self.fileSize,
+                "videoSize": self.videoSize,
+                "captures": self.captures,
+                "stitchDelay": self.stitchDelay,
+                "previewFrames": self.previewFrames,
+                "emulatorOptions": self.emulatorOptions
+            },
+            "results": results
+        }
+# BenchmarkSuite
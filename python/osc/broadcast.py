@@ -0,0 +1,236 @@
+"""
+Local re-broadcast of a camera's live preview.
+
+A camera only serves one live preview stream at a time. PreviewBroadcaster
+holds that one upstream connection and serves the frames it receives as a
+multipart/x-mixed-replace stream to any number of local HTTP clients.
+
+Every client is sent the newest frame whenever it is ready for one, so a
+slow client skips frames instead of holding up the upstream reader or the
+other clients.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.broadcast import PreviewBroadcaster
+  from osc.theta import RicohThetaS
+
+After you import the library, you can use the commands like this:
+
+  thetas = RicohThetaS()
+  broadcaster = PreviewBroadcaster(thetas, port=8080)
+  broadcaster.start()
+
+  # Open http://127.0.0.1:8080/ in a browser, or
+  # http://127.0.0.1:8080/snapshot.jpg for the newest single frame
+
+  broadcaster.stop()
+"""
+
+import BaseHTTPServer
+import SocketServer
+import socket
+import threading
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['PreviewBroadcaster']
+
+class _FrameHub(object):
+    """
+    Holds the newest frame and wakes up the clients waiting for it.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self.closed = False
+
+    def publish(self, frame):
+        with self._condition:
+            self._frame = frame
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def latest(self):
+        return self._frame
+
+    def next(self, previous, timeout=None):
+        """
+        Wait for a frame other than previous. Returns None on timeout or once
+        the hub is closed.
+        """
+        with self._condition:
+            if not self.closed and self._frame is previous:
+                self._condition.wait(timeout)
+            if self.closed or self._frame is previous:
+                return None
+            return self._frame
+
+class _BroadcastHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        broadcaster = self.server.broadcaster
+        if self.path.split('?')[0] == "/snapshot.jpg":
+            self._snapshot(broadcaster)
+        else:
+            self._stream(broadcaster)
+
+    def _snapshot(self, broadcaster):
+        frame = broadcaster._hub.latest()
+        if frame is None:
+            self.send_error(503, "No live preview frame yet")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(frame.data)))
+        self.end_headers()
+        self.wfile.write(frame.data)
+
+    def _stream(self, broadcaster):
+        boundary = broadcaster.boundary
+        self.send_response(200)
+        self.send_header("Content-Type",
+            "multipart/x-mixed-replace; boundary=%s" % boundary)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        broadcaster._addClient()
+        frame = None
+        try:
+            while True:
+                frame = broadcaster._hub.next(frame, timeout=1.0)
+                if frame is None:
+                    if broadcaster._hub.closed:
+                        break
+                    continue
+                self.wfile.write("--%s\r\nContent-Type: image/jpeg\r\n"
+                    "Content-Length: %d\r\n\r\n" % (boundary, len(frame.data)))
+                self.wfile.write(frame.data)
+                self.wfile.write("\r\n")
+                self.wfile.flush()
+                broadcaster._sentFrame()
+        except socket.error:
+            # The client went away
+            pass
+        finally:
+            broadcaster._removeClient()
+
+class _BroadcastServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class PreviewBroadcaster(object):
+    """
+    Serve one camera's live preview to many local clients.
+
+    camera:
+            RicohThetaS or Bublcam The camera to read the preview from.
+    host:
+            String Address to serve on. Defaults to the local host only.
+    port:
+            Integer Port to serve on. 0 picks a free port.
+    reconnectDelay:
+            Float Seconds to wait before reconnecting when the upstream
+            preview stream ends or fails.
+    """
+    def __init__(self, camera, host="127.0.0.1", port=8080, reconnectDelay=1.0,
+        boundary="osclivepreview"):
+        self.camera = camera
+        self.reconnectDelay = reconnectDelay
+        self.boundary = boundary
+
+        if hasattr(camera, 'iterLivePreview'):
+            self._source = camera.iterLivePreview
+        else:
+            self._source = camera.iterStream
+
+        self._hub = _FrameHub()
+        self._server = _BroadcastServer((host, port), _BroadcastHandler)
+        self._server.broadcaster = self
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads = []
+
+        self.clients = 0
+        self.framesReceived = 0
+        self.framesSent = 0
+        self.reconnects = 0
+
+    def address(self):
+        """
+        The (host, port) the broadcaster is serving on.
+        """
+        return self._server.server_address
+
+    def _addClient(self):
+        with self._lock:
+            self.clients += 1
+
+    def _removeClient(self):
+        with self._lock:
+            self.clients -= 1
+
+    def _sentFrame(self):
+        with self._lock:
+            self.framesSent += 1
+
+    def _readUpstream(self):
+        while not self._stopped.is_set():
+            frames = self._source()
+            try:
+                for frame in frames:
+                    self._hub.publish(frame)
+                    self.framesReceived += 1
+                    if self._stopped.is_set():
+                        break
+            except Exception, e:
+                print( "Live preview broadcast - upstream failed : %s" % repr(e) )
+            finally:
+                frames.close()
+
+            if not self._stopped.is_set():
+                self.reconnects += 1
+                self._stopped.wait(self.reconnectDelay)
+
+    def start(self):
+        """
+        Connect to the camera and start serving clients, on background threads.
+        """
+        for target in (self._readUpstream, self._server.serve_forever):
+            thread = threading.Thread(target=target, name="osc-broadcast")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Disconnect the clients and the camera and stop serving.
+        """
+        self._stopped.set()
+        self._hub.close()
+        self._server.shutdown()
+        self._server.server_close()
+        # The upstream reader stops at its next frame
+        for thread in self._threads:
+            thread.join(5.0)
+        self._threads = []
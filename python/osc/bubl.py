@@ -36,7 +36,8 @@ After you import the library, you can use the commands like this:
   # Capture image
   response = bublcam.takePicture()
 
-  # Wait for the stitching to finish
+  # Wait for the stitching to finish. The Bublcam is long polled with 
+  # _bublPoll, so this returns as soon as the camera reports the result
   bublcam.waitForProcessing(response['id'])
 
   # Copy image to computer
@@ -55,10 +56,14 @@ After you import the library, you can use the commands like this:
 """
 
 import json
-import requests
+import threading
+import time
 import timeit
+import weakref
 
 import osc
+from poller import CommandFailed, StatusPoller
+from pool import Future, FutureTimeoutError
 
 __author__ = 'Haarm-Pieter Duiker'
 __copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
@@ -74,15 +79,171 @@ __version__ = '.'.join((__major_version__,
                         __minor_version__,
                         __change_version__))
 
-__all__ = ['Bublcam']
+__all__ = ['BublPoller',
+           'Bublcam']
+
+#
+# Command completion
+#
+class BublPoller(object):
+    """
+    Track inProgress commands of a Bublcam with _bublPoll long polls.
+
+    Each call to _bublPoll returns as soon as the state of the command
+    changes, or after waitTimeout seconds, so completion and progress are
+    seen the moment the camera reports them, without sleeping between
+    polls. Each outstanding command is long polled from its own thread.
+
+    camera:
+            Bublcam The camera the commands were sent to.
+    waitTimeout:
+            Integer Longest time, in seconds, the camera holds a poll open.
+    maxFailures:
+            Integer Number of polls in a row that may fail before the command
+            is given up on.
+    retryDelay:
+            Float Seconds to wait after a failed or throttled poll.
+    fallback:
+            StatusPoller (Optional) Poller for the commands of a camera that
+            doesn't list _bublPoll in its api. Defaults to a new StatusPoller.
+
+    Used like a StatusPoller. Like a StatusPoller, it holds the camera
+    through a weak reference.
+    """
+    def __init__(self, camera, waitTimeout=10, maxFailures=3, retryDelay=0.25,
+        fallback=None):
+        self.camera = weakref.proxy(camera)
+        self.waitTimeout = waitTimeout
+        self.maxFailures = maxFailures
+        self.retryDelay = retryDelay
+
+        self._lock = threading.Lock()
+        self._tracked = {}
+        self._callbacks = []
+        if fallback is None:
+            fallback = StatusPoller(camera)
+        self._fallback = fallback
+
+        self.polls = 0
+
+    def outstanding(self):
+        return len(self._tracked) + self._fallback.outstanding()
+
+    def addProgressCallback(self, callback):
+        """
+        Call callback(commandId, command) each time a poll reports a change
+        in a command. command is the status of the command, with its state
+        and progress.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def removeProgressCallback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def track(self, commandId, timeout=None, started=None):
+        """
+        Return a Future for the results of an inProgress command. Tracking
+        the same id again returns the same Future. With timeout, the command
+        is given up on after that many seconds, failing the Future with
+        FutureTimeoutError.
+        """
+        api = self.camera._api
+        if api and u"/osc/commands/_bublPoll" not in api:
+            return self._fallback.track(commandId, timeout, started)
+
+        with self._lock:
+            future = self._tracked.get(commandId)
+            if future is not None:
+                return future
+            future = Future()
+            self._tracked[commandId] = future
+
+        deadline = None
+        if timeout is not None:
+            deadline = timeit.default_timer() + timeout
+        thread = threading.Thread(target=self._longPoll, 
+            args=(commandId, future, deadline),
+            name="osc-bubl-poll")
+        thread.daemon = True
+        thread.start()
+        return future
+
+    def _notify(self, commandId, command):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(commandId, command)
+            except Exception, e:
+                print( "Bubl poll - callback failed : %s" % repr(e) )
+
+    def _finish(self, commandId, future, result=None, exception=None):
+        with self._lock:
+            self._tracked.pop(commandId, None)
+        if exception is None:
+            future.setResult(result)
+        else:
+            future.setException(exception)
+
+    def _longPoll(self, commandId, future, deadline):
+        fingerprint = ""
+        failures = 0
+        while True:
+            waitTimeout = self.waitTimeout
+            if deadline is not None:
+                remaining = deadline - timeit.default_timer()
+                if remaining <= 0:
+                    self._finish(commandId, future, exception=FutureTimeoutError(
+                        "Command %s didn't finish in time" % commandId))
+                    return
+                waitTimeout = max(1, min(waitTimeout, int(remaining + 0.5)))
+
+            self.polls += 1
+            try:
+                response = self.camera.poll(commandId, fingerprint, waitTimeout)
+            except Exception, e:
+                print( "Bubl poll failed : %s" % repr(e) )
+                response = None
+            if response is None:
+                failures += 1
+                if failures >= self.maxFailures:
+                    self._finish(commandId, future, exception=IOError(
+                        "Command %s could not be polled" % commandId))
+                    return
+                time.sleep(self.retryDelay)
+                continue
+
+            failures = 0
+            command = response.get('command', response)
+            newFingerprint = response.get('fingerprint', fingerprint)
+            if newFingerprint != fingerprint:
+                fingerprint = newFingerprint
+                self._notify(commandId, command)
+
+            state = command.get('state')
+            if state == "done":
+                self._finish(commandId, future, result=command.get('results', {}))
+                return
+            elif state == "error":
+                self._finish(commandId, future, exception=CommandFailed(command))
+                return
+
+            if response.get('throttled'):
+                time.sleep(self.retryDelay)
 
 #
 # Bubl cam
 #
 class Bublcam(osc.OpenSphericalCamera):
 
-    def __init__(self, ip_base="192.168.0.100", httpPort=80):
-        osc.OpenSphericalCamera.__init__(self, ip_base, httpPort)
+    def __init__(self, ip_base="192.168.0.100", httpPort=80, transport=None):
+        osc.OpenSphericalCamera.__init__(self, ip_base, httpPort, transport)
+
+        # Commands are long polled instead of polling their status
+        self._poller = BublPoller(self, fallback=self._poller)
 
     def updateFirmware(self, firmwareFilename):
         """
@@ -98,7 +259,7 @@ class Bublcam(osc.OpenSphericalCamera):
             body = handle.read()
 
         try:
-            req = requests.get(url, data=body, 
+            req = self._scheduler.get(url, data=body, 
                 headers={'Content-Type': 'application/octet-stream'})
         except Exception, e:
             self._httpError(e)
@@ -111,13 +272,27 @@ class Bublcam(osc.OpenSphericalCamera):
             response = None
         return response
 
-    def getImage(self, fileUri):
+    def getImage(self, fileUri, imageType=None, fileName=None, chunkSize=65536,
+        retries=2):
         """
         _bublGetImage
 
         Transfer the file from the camera to computer and save the
         binary data to local storage.  This works, but is clunky.
-        There are easier ways to do this.
+        There are easier ways to do this. imageType is ignored.
+
+        The data is written to fileName + ".part" and moved into place once
+        complete. An interrupted transfer resumes from the end of the .part
+        file, on the next attempt or the next call.
+
+        fileName:
+                String (Optional) Where to save the file. Defaults to the 
+                name of the file in the current directory.
+        chunkSize:
+                Integer (Optional) Size of the blocks read from the camera.
+        retries:
+                Integer (Optional) Number of times an interrupted transfer is
+                resumed before giving up.
 
         Not currently applying the equivalent of Javascript's encodeURIComponent
         to the fileUri
@@ -128,24 +303,43 @@ class Bublcam(osc.OpenSphericalCamera):
         acquired = False
         if fileUri:
             url = self._request("_bublGetImage/%s" % fileUri)
-            fileName = fileUri.split("/")[1]
+            if fileName is None:
+                fileName = self._fileName(fileUri)
 
-            try:
-                response = requests.post(url, stream=True)
-            except Exception, e:
-                self._httpError(e)
-                return acquired
+            def send(headers):
+                return self._scheduler.post(url, headers=headers, stream=True)
 
-            if response.status_code == 200:
-                with open(fileName, 'wb') as handle:
-                    for block in response.iter_content(1024):
-                        handle.write(block)
-                acquired = True
-            else:
-                self._oscError(req)
+            acquired = self._downloadFile(send, fileName, chunkSize, retries)
 
         return acquired
 
+    def iterImage(self, fileUri, imageType=None, chunkSize=65536):
+        """
+        _bublGetImage
+
+        Generator that yields the binary data of the named fileUri in blocks
+        of up to chunkSize bytes instead of writing it to local storage.
+        imageType is ignored.
+
+        Reference:
+        https://github.com/BublTechnology/osc-client/blob/master/lib/BublOscClient.js#L31
+        """
+        if not fileUri:
+            return
+
+        url = self._request("_bublGetImage/%s" % fileUri)
+        try:
+            response = self._scheduler.post(url, stream=True)
+        except Exception, e:
+            self._httpError(e)
+            return
+
+        if response.status_code == 200:
+            for block in response.iter_content(chunkSize):
+                yield block
+        else:
+            self._streamError(response)
+
     def stop(self, commandId):
         """
         _bublStop
@@ -158,7 +352,7 @@ class Bublcam(osc.OpenSphericalCamera):
                 "id": commandId
              })
         try:
-             req = requests.post(url, data=body)
+             req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -174,6 +368,11 @@ class Bublcam(osc.OpenSphericalCamera):
         """
         _bublPoll
 
+        Wait up to waitTimeout seconds for the state of a command to change
+        from the one identified by fingerprint. Use an empty fingerprint to
+        return the current state immediately. The response holds the 
+        command status and its new fingerprint.
+
         Reference:
         https://github.com/BublTechnology/osc-client/blob/master/lib/BublOscClient.js#L43
         """
@@ -184,7 +383,10 @@ class Bublcam(osc.OpenSphericalCamera):
                 "waitTimeout" : waitTimeout
              })
         try:
-             req = requests.post(url, data=body)
+             # The long poll doesn't hold up the other commands, and may
+             # take waitTimeout seconds to answer
+             req = self._scheduler.post(url, data=body, serialize=False,
+                 timeout=self._scheduler.longPollTimeout(waitTimeout))
         except Exception, e:
             self._httpError(e)
             return None
@@ -210,13 +412,13 @@ class Bublcam(osc.OpenSphericalCamera):
              }
              })
         try:
-             req = requests.post(url, data=body)
+             req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
 
         if req.status_code == 200:
-            response = req.json()
+            response = self._commandFuture(req.json())
         else:
             self._oscError(req)
             response = None
@@ -237,7 +439,7 @@ class Bublcam(osc.OpenSphericalCamera):
              }
              })
         try:
-             req = requests.post(url, data=body)
+             req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -249,20 +451,69 @@ class Bublcam(osc.OpenSphericalCamera):
             response = None
         return response
 
-    def stream(self, fileNamePrefix = "livePreview", timeLimitSeconds=10):
+    def stream(self, fileNamePrefix = "livePreview", timeLimitSeconds=10,
+        recorder=None):
         """
         _bublStream
 
         Stream the live preview video stream to disk as a series of jpegs. 
 
-        Credit for jpeq decoding:
-        https://stackoverflow.com/questions/21702477/how-to-parse-mjpeg-http-stream-from-ip-camera
+        recorder:
+                FrameRecorder (Optional) Hand the frames to a background 
+                writer instead of writing them while reading the stream.
 
         Reference:
         https://github.com/BublTechnology/osc-client/blob/master/lib/BublOscClient.js#L59
         """
         acquired = False
 
+        response = self._streamResponse()
+        if response is None:
+            return acquired
+
+        if response.status_code == 200:
+            self._savePreview(response, fileNamePrefix, timeLimitSeconds, recorder)
+
+            acquired = True
+        else:
+            self._streamError(response)
+
+        return acquired
+
+    def iterStream(self, timeLimitSeconds=None, maxFrames=None, latestOnly=False):
+        """
+        _bublStream
+
+        Generator that yields the live preview video stream as a series of 
+        PreviewFrame objects, held in memory.
+
+        timeLimitSeconds:
+                Float (Optional) Stop after this many seconds.
+        maxFrames:
+                Integer (Optional) Stop after this many frames.
+        latestOnly:
+                Boolean (Optional) Only yield the newest frame, dropping 
+                frames when the consumer is slower than the camera.
+
+        Reference:
+        https://github.com/BublTechnology/osc-client/blob/master/lib/BublOscClient.js#L59
+        """
+        response = self._streamResponse()
+        if response is None:
+            return
+
+        if response.status_code == 200:
+            for frame in self._previewFrames(response, timeLimitSeconds, 
+                maxFrames, latestOnly):
+                yield frame
+        else:
+            self._streamError(response)
+
+    def _streamResponse(self):
+        """
+        Send the _bublStream command and return the streaming response, or 
+        None if the request could not be sent.
+        """
         url = self._request("commands/execute")
         body = json.dumps({"name": "camera._bublStream",
                 "parameters": {
@@ -270,46 +521,11 @@ class Bublcam(osc.OpenSphericalCamera):
                  }})
 
         try:
-            response = requests.post(url, data=body, stream=True)
+            response = self._scheduler.post(url, data=body, stream=True)
         except Exception, e:
             self._httpError(e)
-            return acquired
-
-        if response.status_code == 200:
-            bytes=''
-            t0 = timeit.default_timer()
-            i = 0
-            for block in response.iter_content(16384):
-                bytes += block
-
-                # Search the current block of bytes for the jpq start and end
-                a = bytes.find('\xff\xd8')
-                b = bytes.find('\xff\xd9')
-
-                # If you have a jpg, write it to disk
-                if a !=- 1 and b != -1:
-                    #print( "Writing frame %04d - Byte range : %d to %d" % (i, a, b) )
-                    # Found a jpg, write to disk
-                    frameFileName = "%s.%04d.jpg" % (fileNamePrefix, i)
-                    with open(frameFileName, 'wb') as handle:
-                        jpg = bytes[a:b+2]
-                        handle.write(jpg)
-
-                        # Reset the buffer to point to the next set of bytes
-                        bytes = bytes[b+2:]
-                        #print( "Wrote frame %04d - %2.2f seconds" % (i, elapsed) )
-
-                    i += 1
-
-                t1 = timeit.default_timer()
-                elapsed = t1 - t0
-                if elapsed > timeLimitSeconds:
-                    #print( "Breaking" )
-                    break
-
-            acquired = True
-        else:
-            self._oscError(response)
+            return None
+        return response
 # Bublcam
 
 
@@ -0,0 +1,395 @@
+"""
+Recording and replaying the HTTP traffic of a camera.
+
+RecordingTransport sends calls through a real transport and writes every
+request and response to a cassette file, including the bodies of streamed
+responses, like getImage downloads and _getLivePreview streams, along with
+when each block of them arrived. ReplayTransport serves a cassette back
+without a camera, at the recorded speed or faster, so a capture pipeline
+can be profiled or tested against a session recorded in the field.
+
+A cassette is a gzip file of records, each a line of JSON followed by raw
+data. A call record describes the request and the response, and holds the
+body of responses that weren't streamed. The body of a streamed response
+follows in block records, written as the blocks are read, so a long live
+preview is never held in memory while it is recorded.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.cassette import RecordingTransport, ReplayTransport
+  from osc.transport import HTTPTransport
+
+After you import the library, you can use the commands like this:
+
+  # Record a session
+  transport = RecordingTransport("session.cassette", HTTPTransport())
+  thetas = RicohThetaS(transport=transport)
+  thetas.takePicture()
+  thetas.getLatestImage()
+  transport.close()
+
+  # Replay it ten times faster, without a camera
+  thetas = RicohThetaS(transport=ReplayTransport("session.cassette", speed=10))
+  thetas.takePicture()
+  thetas.getLatestImage()
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+import timeit
+import urlparse
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['CassetteMiss',
+           'RecordingTransport',
+           'ReplayTransport',
+           'readCassette']
+
+# Request bodies larger than this, like firmware images, are recorded by
+# their hash only
+_maxRecordedRequest = 65536
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """
+    A replayed call that isn't in the cassette.
+    """
+    pass
+
+def _requestBody(data):
+    if data is None:
+        return None, None
+    if len(data) > _maxRecordedRequest:
+        return None, hashlib.sha1(data).hexdigest()
+    try:
+        # Compare commands independent of the key order of their JSON
+        return json.dumps(json.loads(data), sort_keys=True), None
+    except (ValueError, TypeError):
+        return data.encode('base64'), None
+
+def _path(url):
+    parts = urlparse.urlsplit(url or "")
+    if parts.query:
+        return parts.path + "?" + parts.query
+    return parts.path
+
+def _commandName(body):
+    try:
+        return json.loads(body)["name"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _readRecords(handle):
+    while True:
+        try:
+            line = handle.readline()
+            if not line:
+                return
+            header = json.loads(line)
+            size = header.get("size", 0)
+            data = handle.read(size)
+        except (IOError, EOFError, ValueError, zlib.error):
+            # The recording was interrupted
+            return
+        if len(data) < size:
+            return
+        yield header, data
+
+def readCassette(path):
+    """
+    The calls recorded in a cassette, in the order they were sent, as a
+    list of (header, body) pairs. The chunks entry of a header lists the
+    (seconds after the call was sent, size) of each block of the body. A
+    cassette that wasn't closed is read up to its last complete record.
+    """
+    calls = []
+    bodies = {}
+    handle = gzip.open(path, 'rb')
+    try:
+        for header, data in _readRecords(handle):
+            if header.get("type") == "block":
+                call = bodies.get(header["id"])
+                if call is not None:
+                    call[0]["chunks"].append([header["arrived"], len(data)])
+                    call[1].append(data)
+                continue
+            header.setdefault("chunks", [])
+            call = (header, [data] if data else [])
+            bodies[header["id"]] = call
+            calls.append(call)
+    finally:
+        handle.close()
+    return [(header, "".join(blocks)) for header, blocks in calls]
+
+#
+# Recording
+#
+class RecordingTransport(object):
+    """
+    Send calls through a transport, recording them to a cassette.
+
+    path:
+            String The cassette file to write.
+    transport:
+            HTTPTransport The transport that reaches the camera.
+
+    The blocks of streamed responses are recorded as they are read. Call
+    close() at the end of the session to complete the cassette.
+    """
+    def __init__(self, path, transport):
+        self.path = path
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wb')
+        self._started = timeit.default_timer()
+        self._nextId = 0
+        self.records = 0
+
+    def timeout(self):
+        return self.transport.timeout()
+
+    def growPool(self, poolSize):
+        growPool = getattr(self.transport, 'growPool', None)
+        if growPool is not None:
+            growPool(poolSize)
+
+    def _write(self, header, data="", flush=True):
+        header["size"] = len(data)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(header) + "\n")
+            self._file.write(data)
+            if flush:
+                # Keep what was recorded readable if the session is 
+                # interrupted
+                self._file.flush()
+            self.records += 1
+
+    def request(self, method, url, **kwargs):
+        body, bodyHash = _requestBody(kwargs.get('data'))
+        with self._lock:
+            self._nextId += 1
+            header = {"type": "call", "id": self._nextId}
+        header.update({
+            "method": method,
+            "path": _path(url),
+            "request": body,
+            "requestSha1": bodyHash,
+            "start": timeit.default_timer() - self._started
+        })
+
+        t0 = timeit.default_timer()
+        try:
+            response = self.transport.request(method, url, **kwargs)
+        except Exception, e:
+            header["latency"] = timeit.default_timer() - t0
+            header["error"] = repr(e)
+            header["timeout"] = isinstance(e, requests.exceptions.Timeout)
+            self._write(header)
+            raise
+        latency = timeit.default_timer() - t0
+
+        header.update({
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "latency": latency,
+            "stream": bool(kwargs.get('stream'))
+        })
+        if not kwargs.get('stream'):
+            content = response.content or ""
+            header["chunks"] = [[latency, len(content)]]
+            self._write(header, content)
+        else:
+            self._write(header)
+            self._recordStream(header["id"], response, t0)
+        return response
+
+    def _recordStream(self, callId, response, t0):
+        iterContent = response.iter_content
+        def iter_content(chunk_size=1, decode_unicode=False):
+            if response._content_consumed:
+                # Served again from memory, and already recorded
+                for block in iterContent(chunk_size, decode_unicode):
+                    yield block
+                return
+            for block in iterContent(chunk_size, decode_unicode):
+                self._write({"type": "block", "id": callId,
+                    "arrived": timeit.default_timer() - t0}, block, flush=False)
+                yield block
+        response.iter_content = iter_content
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """
+        Complete the cassette and close the wrapped transport.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self.transport.close()
+
+#
+# Replay
+#
+class _ReplayBody(object):
+    """
+    The raw body of a replayed response, returning each recorded block no
+    sooner than it arrived when it was recorded.
+    """
+    def __init__(self, chunks, body, started, speed):
+        self._chunks = chunks
+        self._body = body
+        self._started = started
+        self._speed = speed
+        self._index = 0
+        self._offset = 0
+        self._blockOffset = 0
+        self._closed = False
+
+    def read(self, amount=None):
+        if self._closed or self._index >= len(self._chunks):
+            return ""
+        arrived, size = self._chunks[self._index]
+        if self._speed:
+            wait = self._started + arrived / self._speed - timeit.default_timer()
+            if wait > 0:
+                time.sleep(wait)
+
+        remaining = size - self._blockOffset
+        if amount is not None and amount < remaining:
+            remaining = amount
+        data = self._body[self._offset:self._offset + remaining]
+        self._offset += remaining
+        self._blockOffset += remaining
+        if self._blockOffset >= size:
+            self._index += 1
+            self._blockOffset = 0
+        return data
+
+    def close(self):
+        self._closed = True
+
+class ReplayTransport(object):
+    """
+    Serve the calls recorded in a cassette, without a camera.
+
+    path:
+            String The cassette file to read.
+    speed:
+            Float How much faster than recorded the responses are served.
+            1 replays the recorded latencies and stream timing, None serves
+            everything as fast as possible.
+
+    A call is answered with the next unused recording of the same request.
+    Calls recorded fewer times than they are replayed, like status polls,
+    are answered with their last recording, and requests that were never
+    recorded with the next recording of the same command. Calls that
+    aren't in the cassette at all raise CassetteMiss.
+    """
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._loose = {}
+        self._used = set()
+
+        for index, (header, body) in enumerate(readCassette(path)):
+            record = (index, header, body)
+            key = (header["method"], header["path"],
+                header.get("request") or header.get("requestSha1"))
+            self._exact.setdefault(key, []).append(record)
+            looseKey = (header["method"], header["path"],
+                _commandName(header.get("request")))
+            self._loose.setdefault(looseKey, []).append(record)
+        self.records = sum(len(records) for records in self._exact.itervalues())
+        self.misses = 0
+
+    def timeout(self):
+        return None
+
+    def _nextRecord(self, records):
+        for record in records:
+            if record[0] not in self._used:
+                self._used.add(record[0])
+                return record
+        return records[-1]
+
+    def _find(self, method, url, data):
+        body, bodyHash = _requestBody(data)
+        path = _path(url)
+        with self._lock:
+            records = self._exact.get((method, path, body or bodyHash))
+            if not records:
+                records = self._loose.get((method, path, _commandName(body)))
+            if not records:
+                self.misses += 1
+                raise CassetteMiss("No recording of %s %s" % (method, path))
+            return self._nextRecord(records)
+
+    def _response(self, url, header, body, started, stream):
+        response = requests.models.Response()
+        response.status_code = header["status"]
+        response.reason = header.get("reason")
+        response.headers = CaseInsensitiveDict(header.get("headers") or {})
+        response.url = url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = _ReplayBody(header.get("chunks", []), body, started,
+            self.speed)
+        if not stream:
+            # Read the body now, as requests does for calls that aren't
+            # streamed
+            response.content
+        return response
+
+    def request(self, method, url, **kwargs):
+        index, header, body = self._find(method, url, kwargs.get('data'))
+        started = timeit.default_timer()
+
+        if self.speed:
+            time.sleep(header.get("latency", 0) / self.speed)
+
+        if "error" in header:
+            if header.get("timeout"):
+                raise requests.exceptions.Timeout(header["error"])
+            raise requests.exceptions.ConnectionError(header["error"])
+
+        return self._response(url, header, body, started, kwargs.get('stream'))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        pass
+# RecordingTransport
@@ -0,0 +1,258 @@
+"""
+A local catalog of the media stored on a camera.
+
+MediaCatalog keeps a SQLite record of every file seen on the camera, with
+its name, uri, size, dateTime, listing metadata and the local path it was
+downloaded to. A sync pages through the listing newest first and stops at
+the first entry the catalog already knows, so finding the files captured
+since the last sync usually takes a single short listing call.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.catalog import MediaCatalog
+  from osc.theta import RicohThetaS
+
+After you import the library, you can use the commands like this:
+
+  thetas = RicohThetaS()
+  catalog = MediaCatalog("/data/theta/catalog.db")
+
+  # List the files captured since the last sync
+  for entry in catalog.sync(thetas):
+      print( "New : %s" % entry["uri"] )
+
+  # Files that haven't been downloaded yet
+  pending = catalog.pending()
+
+  catalog.close()
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from download import listEntries
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['MediaCatalog']
+
+#
+# Schema
+#
+_schema = [
+    """CREATE TABLE IF NOT EXISTS files (
+        uri TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        size INTEGER,
+        dateTime TEXT,
+        metadata TEXT,
+        localPath TEXT,
+        synced REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS filesDateTime ON files (dateTime)",
+    """CREATE TABLE IF NOT EXISTS syncs (
+        synced REAL NOT NULL,
+        added INTEGER NOT NULL,
+        removed INTEGER NOT NULL,
+        listed INTEGER NOT NULL)"""
+]
+
+_columns = ["uri", "name", "size", "dateTime", "metadata", "localPath"]
+
+# Entry fields stored in their own columns rather than in the metadata
+_entryFields = ["uri", "name", "size", "dateTime", "thumbnail"]
+
+#
+# Catalog
+#
+class MediaCatalog(object):
+    """
+    A SQLite catalog of the files on a camera.
+
+    path:
+            String Where the catalog database is stored. Use ":memory:" for a
+            catalog that isn't kept between runs.
+
+    Entries are returned as dicts with the keys name, uri, size, dateTime,
+    metadata and localPath. metadata holds the remaining fields of the
+    listing entry. The catalog can be shared between threads.
+    """
+    def __init__(self, path="catalog.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            for statement in _schema:
+                self._connection.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def _entry(self, row):
+        entry = dict(zip(_columns, row))
+        entry["metadata"] = json.loads(entry["metadata"] or "{}")
+        return entry
+
+    def _select(self, where="", parameters=()):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT %s FROM files %s ORDER BY dateTime DESC, uri DESC" % (
+                    ", ".join(_columns), where), parameters).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def entry(self, uri):
+        """
+        The entry for a uri, or None if it isn't in the catalog.
+        """
+        entries = self._select("WHERE uri = ?", (uri,))
+        if entries:
+            return entries[0]
+        return None
+
+    def entries(self, downloaded=None):
+        """
+        All of the entries, newest first. Pass downloaded as True or False to
+        only return the files that were or weren't downloaded.
+        """
+        if downloaded is None:
+            return self._select()
+        elif downloaded:
+            return self._select("WHERE localPath IS NOT NULL")
+        return self._select("WHERE localPath IS NULL")
+
+    def pending(self):
+        """
+        The entries that haven't been downloaded yet, newest first.
+        """
+        return self.entries(downloaded=False)
+
+    def setLocalPath(self, uri, localPath):
+        """
+        Record where the file of an entry was downloaded to. Use None to mark
+        it as not downloaded.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE files SET localPath = ? WHERE uri = ?", (localPath, uri))
+
+    def setMetadata(self, uri, metadata):
+        """
+        Merge a dict into the metadata of an entry, for example the result of
+        getMetadata.
+        """
+        entry = self.entry(uri)
+        if entry is None:
+            return
+        entry["metadata"].update(metadata)
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE files SET metadata = ? WHERE uri = ?",
+                    (json.dumps(entry["metadata"]), uri))
+
+    def lastSync(self):
+        """
+        The time of the last completed sync, in seconds since the epoch, or
+        None.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT MAX(synced) FROM syncs").fetchone()[0]
+
+    def sync(self, camera, pageSize=20, full=False):
+        """
+        Add the files that are new on the camera to the catalog and return
+        their entries, newest first.
+
+        The listing is read newest first and stops at the first entry that
+        is already in the catalog with the same dateTime. With full, the
+        whole listing is read, and entries for files that are no longer on
+        the camera are removed.
+
+        The catalog only changes once the listing has been read, so an
+        interrupted sync doesn't leave a gap that later syncs would stop in
+        front of. Returns None if the listing failed.
+        """
+        with self._lock:
+            known = dict(self._connection.execute(
+                "SELECT uri, dateTime FROM files").fetchall())
+
+        added = []
+        listed = 0
+        seen = set()
+        reachedKnown = False
+        try:
+            for entry in listEntries(camera, pageSize, strict=True):
+                listed += 1
+                uri = entry["uri"]
+                seen.add(uri)
+                if uri in known and known[uri] == entry.get("dateTime"):
+                    reachedKnown = True
+                    if not full:
+                        break
+                    continue
+                added.append(entry)
+        except Exception, e:
+            print( "Catalog sync failed : %s" % repr(e) )
+            return None
+
+        synced = time.time()
+        entries = []
+        for entry in added:
+            entries.append({
+                "uri": entry["uri"],
+                "name": entry["name"],
+                "size": entry.get("size"),
+                "dateTime": entry.get("dateTime"),
+                "metadata": dict((key, value) for key, value in entry.iteritems()
+                    if key not in _entryFields),
+                "localPath": None})
+
+        removed = []
+        if full:
+            removed = [uri for uri in known if uri not in seen]
+
+        with self._lock:
+            with self._connection:
+                # A file that replaced one with the same uri needs to be
+                # downloaded again
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO files "
+                    "(uri, name, size, dateTime, metadata, localPath, synced) "
+                    "VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                    [(entry["uri"], entry["name"], entry["size"], entry["dateTime"],
+                      json.dumps(entry["metadata"]), synced) for entry in entries])
+                for uri in removed:
+                    self._connection.execute(
+                        "DELETE FROM files WHERE uri = ?", (uri,))
+                self._connection.execute(
+                    "INSERT INTO syncs (synced, added, removed, listed) "
+                    "VALUES (?, ?, ?, ?)", (synced, len(added), len(removed), listed))
+
+        if not reachedKnown and known and not full:
+            print( "Catalog sync - no known entry in the listing, %d files added" %
+                len(added) )
+
+        return entries
+# MediaCatalog
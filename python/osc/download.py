@@ -0,0 +1,398 @@
+"""
+Bulk download of the media stored on a camera.
+
+MediaSync pages through the camera's file listing and downloads every file
+that isn't already in the destination directory. The downloads run
+concurrently on a bounded pool of workers, each reading in large blocks,
+and the aggregate transfer rate is reported at the end.
+
+SegmentedDownload fetches one large file over several connections at once,
+each filling its own byte range of the output file.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.download import MediaSync
+  from osc.theta import RicohThetaS
+
+After you import the library, you can use the commands like this:
+
+  thetas = RicohThetaS()
+  sync = MediaSync(thetas, "/data/theta", workers=4)
+  report = sync.run()
+  print( "%d files, %2.2f MB/s" % (len(report.downloaded), report.megabytesPerSecond()) )
+
+  # Download a long video over 4 connections
+  thetas.getVideo(thetas.latestFileUri(), connections=4)
+"""
+
+import os
+import threading
+import timeit
+
+from errors import OSCError
+from pool import WorkerPool
+from transport import parseContentRange
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['listEntries',
+           'SyncReport',
+           'MediaSync',
+           'SegmentedDownload']
+
+#
+# Listing
+#
+def listEntries(camera, pageSize=100, strict=False):
+    """
+    Generator that yields every file entry on the camera. Uses 
+    camera.iterAll when the camera supports it and camera.iterImages
+    otherwise.
+
+    A listing call that fails ends the listing, or raises IOError with 
+    strict.
+    """
+    if hasattr(camera, 'iterAll'):
+        return camera.iterAll(pageSize, strict=strict)
+    return camera.iterImages(pageSize, includeThumb=False, strict=strict)
+
+def isVideo(entry):
+    return entry["name"].lower().endswith(".mp4")
+
+#
+# Bulk download
+#
+class SyncReport(object):
+    """
+    What a MediaSync run did.
+    """
+    def __init__(self):
+        self.downloaded = []
+        self.skipped = []
+        self.failed = []
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def megabytesPerSecond(self):
+        if not self.seconds:
+            return 0.0
+        return self.bytes / self.seconds / (1024.0 * 1024.0)
+
+class MediaSync(object):
+    """
+    Download every file on a camera into a local directory.
+
+    camera:
+            OpenSphericalCamera The camera to download from.
+    destination:
+            String Directory the files are written to.
+    workers:
+            Integer Number of files downloaded at the same time.
+    chunkSize:
+            Integer Size of the blocks read from the camera.
+    pageSize:
+            Integer Number of entries requested per listing call.
+    catalog:
+            MediaCatalog (Optional) Catalog that records what was downloaded.
+            When given, only the files the catalog hasn't seen downloaded are
+            considered, after an incremental sync of the catalog.
+
+    The camera's transport pool is grown to workers connections, so that
+    every worker keeps its own connection open.
+    """
+    def __init__(self, camera, destination=".", workers=4, chunkSize=1048576,
+        pageSize=100, catalog=None):
+        self.camera = camera
+        self.destination = destination
+        self.workers = workers
+        self.chunkSize = chunkSize
+        self.pageSize = pageSize
+        self.catalog = catalog
+        self._lock = threading.Lock()
+
+    def localPath(self, entry):
+        return os.path.join(self.destination, entry["name"])
+
+    def isSynced(self, entry):
+        """
+        Whether the file of an entry was already downloaded.
+        """
+        path = self.localPath(entry)
+        if not os.path.exists(path):
+            return False
+        return "size" not in entry or os.path.getsize(path) == entry["size"]
+
+    def _download(self, entry, report):
+        path = self.localPath(entry)
+        try:
+            if isVideo(entry) and hasattr(self.camera, 'getVideo'):
+                acquired = self.camera.getVideo(entry["uri"], fileName=path,
+                    chunkSize=self.chunkSize)
+            else:
+                acquired = self.camera.getImage(entry["uri"], fileName=path,
+                    chunkSize=self.chunkSize)
+        except OSCError, e:
+            # A camera that raises errors fails just this file
+            print( "Download failed : %s, %s" % (entry["uri"], e) )
+            acquired = False
+
+        with self._lock:
+            if acquired:
+                report.downloaded.append(entry)
+                report.bytes += os.path.getsize(path)
+            else:
+                report.failed.append(entry)
+        if acquired and self.catalog is not None:
+            self.catalog.setLocalPath(entry["uri"], path)
+        return acquired
+
+    def run(self, entries=None):
+        """
+        Download the files that aren't in the destination yet. Pass a list of
+        listing entries to limit the download to them. Returns a SyncReport.
+        """
+        if not os.path.isdir(self.destination):
+            os.makedirs(self.destination)
+
+        report = SyncReport()
+        growPool = getattr(self.camera.getTransport(), 'growPool', None)
+        if growPool is not None:
+            growPool(self.workers)
+        pool = WorkerPool(workers=self.workers)
+        t0 = timeit.default_timer()
+        try:
+            if entries is None and self.catalog is not None:
+                if self.catalog.sync(self.camera, self.pageSize) is not None:
+                    entries = self.catalog.pending()
+            if entries is None:
+                entries = listEntries(self.camera, self.pageSize)
+
+            # Downloads start while the listing is still being paged through
+            futures = []
+            for entry in entries:
+                if self.isSynced(entry):
+                    report.skipped.append(entry)
+                    if self.catalog is not None:
+                        self.catalog.setLocalPath(entry["uri"], self.localPath(entry))
+                else:
+                    futures.append(pool.submit(self._download, entry, report))
+
+            for future in futures:
+                future.result()
+        finally:
+            pool.shutdown()
+        report.seconds = timeit.default_timer() - t0
+
+        return report
+
+#
+# Segmented download
+#
+class SegmentedDownload(object):
+    """
+    Download one file as byte ranges fetched over several connections.
+
+    send:
+            Function send(headers) that sends the download request and
+            returns the streaming response.
+    fileName:
+            String Where to save the file. The data is written to
+            fileName + ".segments", preallocated to the full size, and moved
+            into place once every segment is complete. A fileName + ".part"
+            file of an interrupted single stream download is left alone.
+    connections:
+            Integer Largest number of segments fetched at the same time. The
+            number drops by one each time a segment fails, down to one, so
+            the download settles at what the camera tolerates.
+    segmentSize:
+            Integer Size of the byte ranges the file is split into.
+    chunkSize:
+            Integer Size of the blocks read from the camera.
+    retries:
+            Integer Number of segment failures tolerated before giving up.
+    """
+    def __init__(self, send, fileName, connections=4, segmentSize=16777216,
+        chunkSize=1048576, retries=8):
+        self.send = send
+        self.fileName = fileName
+        self.connections = connections
+        self.segmentSize = segmentSize
+        self.chunkSize = chunkSize
+        self.retries = retries
+
+        self.size = None
+        self.received = 0
+        self.failures = 0
+        self.seconds = 0.0
+
+        self._condition = threading.Condition()
+        self._pending = []
+        self._inFlight = 0
+        self._active = 0
+        self._allowed = connections
+        self._aborted = False
+        self._refused = False
+
+    def probe(self):
+        """
+        Ask for the first byte of the file to learn its size. Returns None if
+        the camera doesn't honor range requests.
+        """
+        try:
+            response = self.send({'Range': "bytes=0-0"})
+        except Exception, e:
+            print( "Segmented download - probe failed : %s" % repr(e) )
+            return None
+        if response is None:
+            return None
+
+        contentRange = parseContentRange(response.headers.get('content-range'))
+        response.close()
+        if response.status_code == 206 and contentRange and contentRange[0] == 0:
+            return contentRange[2]
+        return None
+
+    def allowedConnections(self):
+        return self._allowed
+
+    def _fetch(self, segment, partFileName):
+        """
+        Fetch the remaining bytes of a [first, last] segment, advancing first
+        as data is written. Returns False if the segment didn't complete.
+        """
+        first, last = segment
+        try:
+            response = self.send({'Range': "bytes=%d-%d" % (first, last)})
+        except Exception, e:
+            print( "Segmented download - request failed : %s" % repr(e) )
+            return False
+        if response is None:
+            return False
+
+        try:
+            contentRange = parseContentRange(response.headers.get('content-range'))
+            if (response.status_code != 206 or not contentRange
+                or contentRange[0] != first or contentRange[1] != last):
+                print( "Segmented download - range refused, HTTP Status : %s" % 
+                    response.status_code )
+                if response.status_code != 503:
+                    # Fall back to a single stream, which reports the error
+                    # if there is one
+                    self._refused = True
+                    self._aborted = True
+                return False
+
+            with open(partFileName, 'r+b') as handle:
+                handle.seek(first)
+                for block in response.iter_content(self.chunkSize):
+                    block = block[:last + 1 - segment[0]]
+                    handle.write(block)
+                    segment[0] += len(block)
+                    with self._condition:
+                        self.received += len(block)
+                    if segment[0] > last:
+                        break
+        except Exception, e:
+            print( "Segmented download - transfer failed : %s" % repr(e) )
+            return False
+        finally:
+            response.close()
+
+        return segment[0] > last
+
+    def _nextSegment(self):
+        with self._condition:
+            while True:
+                if self._aborted:
+                    return None
+                if self._active > self._allowed:
+                    # Fewer connections are allowed since this one started
+                    self._active -= 1
+                    self._condition.notify_all()
+                    return None
+                if self._pending:
+                    self._inFlight += 1
+                    return self._pending.pop(0)
+                if not self._inFlight:
+                    return None
+                self._condition.wait()
+
+    def _work(self, partFileName):
+        while True:
+            segment = self._nextSegment()
+            if segment is None:
+                return
+
+            completed = self._fetch(segment, partFileName)
+            with self._condition:
+                self._inFlight -= 1
+                if not completed:
+                    self.failures += 1
+                    self._pending.append(segment)
+                    if self.failures > self.retries:
+                        self._aborted = True
+                    elif self._allowed > 1:
+                        self._allowed -= 1
+                self._condition.notify_all()
+
+    def run(self):
+        """
+        Download the file. Returns True once the whole file is in place, False
+        if it failed and None if the camera doesn't honor range requests, in
+        which case a single stream download should be used instead. The
+        preallocated .segments file is removed unless the download completes,
+        as it can't be resumed from.
+        """
+        t0 = timeit.default_timer()
+        self.size = self.probe()
+        if self.size is None:
+            return None
+
+        # Preallocate the output, so each segment can be written in place
+        partFileName = self.fileName + ".segments"
+        with open(partFileName, 'wb') as handle:
+            handle.truncate(self.size)
+
+        self._pending = [[first, min(first + self.segmentSize, self.size) - 1]
+            for first in range(0, self.size, self.segmentSize)]
+        workers = max(1, min(self.connections, len(self._pending)))
+        self._active = workers
+
+        pool = WorkerPool(workers=workers)
+        try:
+            futures = [pool.submit(self._work, partFileName) for i in range(workers)]
+            for future in futures:
+                future.result()
+        finally:
+            pool.shutdown()
+        self.seconds = timeit.default_timer() - t0
+
+        # The .segments file was preallocated, so only the bytes received show
+        # whether every segment is complete
+        if self._aborted or self._pending or self.received != self.size:
+            os.remove(partFileName)
+            if self._refused:
+                print( "Segmented download - falling back to a single stream : %s" % 
+                    self.fileName )
+                return None
+            print( "Segmented download failed : %s, %d of %d bytes" % (
+                self.fileName, self.received, self.size) )
+            return False
+
+        if os.path.exists(self.fileName):
+            os.remove(self.fileName)
+        os.rename(partFileName, self.fileName)
+        return True
@@ -0,0 +1,819 @@
+"""
+A local stand-in for an Open Spherical Camera.
+
+CameraEmulator serves the endpoints this library calls, for the commands of
+both RicohThetaS and Bublcam, from an HTTP server on the local host. Its
+behavior can be tuned to load test and benchmark the library without a
+camera:
+
+  latency           Seconds before each command is answered, for all
+                    commands or per command
+  stitchDelay       Seconds a capture stays inProgress
+  bandwidth         Bytes per second shared by all response bodies
+  unavailableRate   Fraction of commands answered with serviceUnavailable
+  files, fileSize   Number and size of the files on the emulated camera
+  previewFps        Frame rate of the live preview
+
+Commands are named as by the scheduler: camera.takePicture for
+commands/execute, and the path below /osc/ otherwise, like state or
+commands/status.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.emulator import CameraEmulator
+  from osc.theta import RicohThetaS
+
+After you import the library, you can use the commands like this:
+
+  emulator = CameraEmulator(files=1000, stitchDelay=2.0, latency=0.02,
+      bandwidth=4*1024*1024, unavailableRate=0.05)
+  emulator.start()
+
+  host, port = emulator.address()
+  thetas = RicohThetaS(host, port)
+  thetas.takePicture().result()
+
+  emulator.stop()
+"""
+
+import BaseHTTPServer
+import SocketServer
+import base64
+import json
+import random
+import re
+import socket
+import threading
+import time
+import timeit
+
+import osc
+import theta
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['g_emulatorApi',
+           'CameraEmulator']
+
+'''
+The endpoints listed by the emulator's info. Clients check the paths they
+call against this list, so the per-file _bublGetImage paths can only be
+called on an emulator created with api=None.
+'''
+g_emulatorApi = [
+    "/osc/info",
+    "/osc/state",
+    "/osc/checkForUpdates",
+    "/osc/commands/execute",
+    "/osc/commands/status",
+    "/osc/commands/_bublPoll",
+    "/osc/commands/_bublStop",
+    "/osc/_bublGetImage"
+    ]
+
+_defaultOptions = {
+    "remainingPictures" : 1000,
+    "remainingSpace" : 8000000000,
+    "totalSpace" : 8589934592,
+    "captureMode" : "image",
+    "captureModeSupport" : ["image", "_video", "_liveStreaming"],
+    "exposureProgram" : 2,
+    "exposureProgramSupport" : [1, 2, 4, 9],
+    "iso" : 100,
+    "isoSupport" : [100, 125, 160, 200, 250, 320, 400, 500, 640, 800, 1000, 1250, 1600],
+    "shutterSpeed" : 0.004,
+    "whiteBalance" : "auto",
+    "fileFormat" : {"type": "jpeg", "width": 5376, "height": 2688},
+    "offDelay" : 1800,
+    "sleepDelay" : 600,
+    "_remainingVideos" : 1,
+    "_filter" : "off"
+    }
+
+_rangePattern = re.compile(r'bytes=(\d*)-(\d*)')
+
+_previewBoundary = "---osclivepreview---"
+
+class _Throttle(object):
+    """
+    A bandwidth shared by all of the responses. Each block is scheduled to
+    be sent once the blocks before it would have been.
+    """
+    def __init__(self, bytesPerSecond):
+        self.bytesPerSecond = bytesPerSecond
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self, size):
+        if not self.bytesPerSecond:
+            return
+        with self._lock:
+            now = timeit.default_timer()
+            self._next = max(now, self._next) + size / float(self.bytesPerSecond)
+            wait = self._next - now
+        time.sleep(wait)
+
+class _CommandError(Exception):
+    def __init__(self, code, message, status=400):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+#
+# Request handling
+#
+class _EmulatorHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and small bodies go out in a single write
+    wbufsize = 65536
+
+    def log_message(self, format, *args):
+        pass
+
+    # Clients, like a live preview that was stopped, may close the
+    # connection before the response is sent
+    def handle(self):
+        connections = self.server.emulator._connections
+        connections.add(self.connection)
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.handle(self)
+        except socket.error:
+            self.close_connection = True
+        finally:
+            connections.discard(self.connection)
+
+    def finish(self):
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        except socket.error:
+            pass
+
+    def _sendJson(self, response, status=200):
+        body = json.dumps(response)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.server.emulator._sendBody(self.wfile, body)
+
+    def _sendError(self, name, error):
+        self._sendJson({"name": name, "state": "error",
+            "error": {"code": error.code, "message": error.message}}, error.status)
+
+    def _sendData(self, data, contentType="image/jpeg"):
+        """
+        Send file data, honoring a Range header.
+        """
+        first = 0
+        last = len(data) - 1
+        match = _rangePattern.match(self.headers.get("Range") or "")
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                first = int(match.group(1))
+                if match.group(2):
+                    last = min(last, int(match.group(2)))
+            else:
+                first = max(0, len(data) - int(match.group(2)))
+            if first >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%d" % len(data))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (first, last,
+                len(data)))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(last + 1 - first))
+        self.end_headers()
+        self.server.emulator._sendBody(self.wfile, data, first, last + 1)
+
+    def _readJson(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else ""
+        if not body:
+            return {}
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        emulator = self.server.emulator
+        path = self.path.split('?')[0]
+        try:
+            if path == "/osc/info":
+                emulator._delay("info")
+                self._sendJson(emulator._info(self.server.server_address[1]))
+            elif path == "/osc/_bublUpdate":
+                self._readJson()
+                emulator._delay("_bublUpdate")
+                self._sendJson({})
+            else:
+                self._sendJson({"error": {"code": "unknownCommand",
+                    "message": path}}, 404)
+        except _CommandError, e:
+            self._sendError(None, e)
+        except socket.error:
+            self.close_connection = True
+
+    def do_POST(self):
+        emulator = self.server.emulator
+        path = self.path.split('?')[0]
+        request = self._readJson()
+        name = request.get("name")
+        command = path[len("/osc/"):]
+        if path == "/osc/commands/execute" and name:
+            command = name
+        elif path.startswith("/osc/_bublGetImage/"):
+            command = "_bublGetImage"
+
+        try:
+            emulator._delay(command)
+            emulator._maybeUnavailable(command)
+            if path == "/osc/state":
+                self._sendJson(emulator._state())
+            elif path == "/osc/checkForUpdates":
+                self._sendJson(emulator._checkForUpdates(request))
+            elif path == "/osc/commands/status":
+                self._sendJson(emulator._status(request.get("id")))
+            elif path == "/osc/commands/_bublPoll":
+                self._sendJson(emulator._bublPoll(request))
+            elif path == "/osc/commands/_bublStop":
+                self._sendJson(emulator._bublStop(request.get("id")))
+            elif path == "/osc/commands/execute":
+                self._execute(emulator, name, request.get("parameters") or {})
+            elif command == "_bublGetImage":
+                self._sendData(emulator._fileData(path[len("/osc/_bublGetImage/"):]))
+            else:
+                raise _CommandError("unknownCommand", "Unknown path %s" % path, 404)
+        except _CommandError, e:
+            self._sendError(name, e)
+        except socket.error:
+            self.close_connection = True
+
+    def _execute(self, emulator, name, parameters):
+        if name in ("camera.getImage", "camera._getVideo"):
+            imageType = parameters.get("_type", parameters.get("type"))
+            self._sendData(emulator._fileData(parameters.get("fileUri"),
+                imageType in ("thumb", "thumbnail")))
+        elif name in ("camera._getLivePreview", "camera._bublStream"):
+            self._preview(emulator)
+        else:
+            self._sendJson(emulator._execute(name, parameters))
+
+    def _preview(self, emulator):
+        self.send_response(200)
+        self.send_header("Content-Type",
+            "multipart/x-mixed-replace; boundary=%s" % _previewBoundary)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        frame = emulator._payload(emulator.previewFrameSize)
+        part = ("%s\r\nContent-type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % (
+            _previewBoundary, len(frame))) + frame + "\r\n"
+        interval = 1.0 / emulator.previewFps
+        due = timeit.default_timer()
+        with emulator._lock:
+            emulator.previews += 1
+        try:
+            while not emulator._stopped.is_set():
+                emulator._sendBody(self.wfile, part)
+                self.wfile.flush()
+                due += interval
+                wait = due - timeit.default_timer()
+                if wait > 0:
+                    time.sleep(wait)
+        except socket.error:
+            # The client went away
+            pass
+        finally:
+            with emulator._lock:
+                emulator.previews -= 1
+
+class _EmulatorServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 64
+
+#
+# Emulator
+#
+class CameraEmulator(object):
+    """
+    An emulated camera, served over HTTP.
+
+    host:
+            String Address to serve on. Defaults to the local host only.
+    port:
+            Integer Port to serve on. 0 picks a free port.
+    files:
+            Integer Number of images on the camera when it starts.
+    fileSize:
+            Integer Size of each image, in bytes.
+    videoSize:
+            Integer Size of each video recorded with _startCapture, in bytes.
+    thumbnailSize:
+            Integer Size of each thumbnail, in bytes.
+    latency:
+            Float or Dict Seconds before a command is answered. A dict maps
+            command names to their latency, with "default" for the others.
+    stitchDelay:
+            Float Seconds takePicture stays inProgress.
+    bandwidth:
+            Integer (Optional) Bytes per second shared by all responses.
+            None doesn't limit the bandwidth.
+    unavailableRate:
+            Float Fraction of the commands, other than info and startSession,
+            answered with a 503 serviceUnavailable error.
+    busyWhileStitching:
+            Boolean Answer serviceUnavailable to other captures while a
+            capture is stitching, like a Theta does.
+    previewFps:
+            Float Frame rate of _getLivePreview and _bublStream.
+    previewFrameSize:
+            Integer Size of each live preview frame, in bytes.
+    model:
+            String The model reported by info.
+    api:
+            List (Optional) The endpoints reported by info. With None, an
+            empty list is reported and clients call any endpoint.
+    seed:
+            Integer Seed for the random unavailable errors, so a run can be
+            repeated.
+    """
+    def __init__(self, host="127.0.0.1", port=0, files=100, fileSize=4194304,
+        videoSize=16777216, thumbnailSize=8192, latency=0.0, stitchDelay=1.0,
+        bandwidth=None, unavailableRate=0.0, busyWhileStitching=False,
+        previewFps=15.0, previewFrameSize=65536, model="RICOH THETA S", api=g_emulatorApi,
+        seed=0):
+        self.fileSize = fileSize
+        self.videoSize = videoSize
+        self.thumbnailSize = thumbnailSize
+        self.latency = latency
+        self.stitchDelay = stitchDelay
+        self.unavailableRate = unavailableRate
+        self.busyWhileStitching = busyWhileStitching
+        self.previewFps = previewFps
+        self.previewFrameSize = previewFrameSize
+        self.model = model
+        self.api = api
+
+        self._throttle = _Throttle(bandwidth)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._payloads = {}
+
+        self._fingerprint = 0
+        self._sessionId = 0
+        self._commandId = 0
+        self._commands = {}
+        self._failures = []
+        self._capturing = None
+        self._options = dict(_defaultOptions)
+        self._files = []
+        self._fileIndex = 0
+        for index in range(files):
+            self._addFile()
+        self._started = time.time()
+
+        self._server = _EmulatorServer((host, port), _EmulatorHandler)
+        self._server.emulator = self
+        self._thread = None
+        # Open keep-alive connections, closed when the emulator stops
+        self._connections = set()
+
+        self.requests = 0
+        self.unavailable = 0
+        self.previews = 0
+        self.bytesSent = 0
+
+    def address(self):
+        """
+        The (host, port) the emulator is serving on.
+        """
+        return self._server.server_address
+
+    def start(self):
+        """
+        Start serving, on a background thread.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._server.serve_forever,
+            name="osc-emulator")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        End the live previews and stop serving.
+        """
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(5.0)
+            self._thread = None
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        # Let the handlers finish, so none is left running at exit
+        deadline = timeit.default_timer() + 1.0
+        while self._connections and timeit.default_timer() < deadline:
+            time.sleep(0.01)
+
+    @property
+    def bandwidth(self):
+        return self._throttle.bytesPerSecond
+
+    @bandwidth.setter
+    def bandwidth(self, bytesPerSecond):
+        self._throttle.bytesPerSecond = bytesPerSecond
+
+    def failNext(self, count=1, code="serviceUnavailable", status=503):
+        """
+        Answer the next count commands, other than info and startSession,
+        with an error.
+        """
+        with self._lock:
+            self._failures.extend([(code, status)] * count)
+
+    def setFiles(self, count):
+        """
+        Replace the files on the camera with count new images.
+        """
+        with self._lock:
+            self._files = []
+            for index in range(count):
+                self._addFile()
+            self._changeState()
+
+    def fileCount(self):
+        return len(self._files)
+
+    #
+    # Helpers
+    #
+    def _payload(self, size):
+        """
+        Jpeg-like data of a given size. The data of each size is only built
+        once.
+        """
+        data = self._payloads.get(size)
+        if data is None:
+            pattern = "".join(chr(index) for index in range(256))
+            body = (pattern * (size // len(pattern) + 1))[:max(0, size - 4)]
+            data = ("\xff\xd8" + body + "\xff\xd9")[:size]
+            self._payloads[size] = data
+        return data
+
+    def _sendBody(self, wfile, data, first=0, end=None):
+        if end is None:
+            end = len(data)
+        if self._throttle.bytesPerSecond:
+            blockSize = 16384
+            for offset in xrange(first, end, blockSize):
+                block = data[offset:min(end, offset + blockSize)]
+                self._throttle.wait(len(block))
+                wfile.write(block)
+                wfile.flush()
+        elif first == 0 and end == len(data):
+            wfile.write(data)
+        else:
+            wfile.write(buffer(data, first, end - first))
+        with self._lock:
+            self.bytesSent += end - first
+
+    def _delay(self, command):
+        with self._lock:
+            self.requests += 1
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(command, latency.get("default", 0.0))
+        if latency:
+            time.sleep(latency)
+
+    def _maybeUnavailable(self, command):
+        if command in ("info", "camera.startSession"):
+            return
+        with self._lock:
+            if self._failures:
+                code, status = self._failures.pop(0)
+                self.unavailable += 1
+                raise _CommandError(code, "Injected error", status)
+            if self.unavailableRate and self._random.random() < self.unavailableRate:
+                self.unavailable += 1
+                raise _CommandError("serviceUnavailable", "Camera is busy", 503)
+
+    def _changeState(self):
+        """
+        Give the state a new fingerprint. Called with the lock held.
+        """
+        self._fingerprint += 1
+        self._changed.notify_all()
+
+    def _fingerprintName(self):
+        return "FIG_%04d" % self._fingerprint
+
+    def _addFile(self, video=False):
+        """
+        Add a new file, the newest on the camera. Called with the lock held.
+        """
+        self._fileIndex += 1
+        index = self._fileIndex
+        if video:
+            name = "R%07d.MP4" % index
+            size = self.videoSize
+        else:
+            name = "R%07d.JPG" % index
+            size = self.fileSize
+        minutes, seconds = divmod(index, 60)
+        hours, minutes = divmod(minutes, 60)
+        dateTime = "2016:01:%02d %02d:%02d:%02d" % (1 + hours // 24 % 28,
+            hours % 24, minutes, seconds)
+        entry = {
+            "name": name,
+            "uri": "100RICOH/" + name,
+            "size": size,
+            "dateTime": dateTime,
+            "dateTimeZone": dateTime + "+00:00",
+            "width": 5376 if not video else 1920,
+            "height": 2688 if not video else 1080,
+            "isProcessed": True,
+            "previewUrl": ""
+        }
+        if video:
+            entry["recordTime"] = 10
+        self._files.append(entry)
+        return entry
+
+    def _findFile(self, fileUri):
+        with self._lock:
+            for entry in self._files:
+                if entry["uri"] == fileUri:
+                    return entry
+        raise _CommandError("invalidParameterValue",
+            "No file %s" % fileUri)
+
+    def _fileData(self, fileUri, thumbnail=False):
+        entry = self._findFile(fileUri)
+        if thumbnail:
+            return self._payload(self.thumbnailSize)
+        return self._payload(entry["size"])
+
+    def _advance(self):
+        """
+        Finish the commands that are due. Called with the lock held.
+        """
+        now = timeit.default_timer()
+        for command in self._commands.itervalues():
+            if command["state"] == "inProgress" and command["due"] is not None \
+                and now >= command["due"]:
+                entry = self._addFile(command["video"])
+                command["state"] = "done"
+                command["results"] = {"fileUri": entry["uri"]}
+                self._options["remainingPictures"] -= 1
+                self._changeState()
+
+    def _startCommand(self, name, delay, video=False):
+        """
+        Start a command that finishes after delay seconds, or when it is
+        stopped if delay is None. Called with the lock held.
+        """
+        self._commandId += 1
+        commandId = str(self._commandId)
+        due = None
+        if delay is not None:
+            due = timeit.default_timer() + delay
+        self._commands[commandId] = {"name": name, "id": commandId,
+            "state": "inProgress", "due": due, "video": video, "results": None}
+        return commandId
+
+    def _commandResponse(self, commandId):
+        command = self._commands[commandId]
+        response = {"name": command["name"], "id": commandId,
+            "state": command["state"]}
+        if command["state"] == "done":
+            response["results"] = command["results"]
+        else:
+            response["progress"] = {"completion": 0.0}
+        return response
+
+    #
+    # Endpoints
+    #
+    def _info(self, port):
+        return {
+            "manufacturer": "Emulated",
+            "model": self.model,
+            "serialNumber": "EMU00001",
+            "firmwareVersion": "1.0.0",
+            "supportUrl": "",
+            "endpoints": {"httpPort": port, "httpUpdatesPort": port},
+            "gps": False,
+            "gyro": False,
+            "uptime": int(time.time() - self._started),
+            "api": list(self.api or []),
+            "apiLevel": [1]
+        }
+
+    def _state(self):
+        with self._lock:
+            self._advance()
+            latest = self._files[-1]["uri"] if self._files else ""
+            return {
+                "fingerprint": self._fingerprintName(),
+                "state": {
+                    "sessionId": "SID_%04d" % self._sessionId,
+                    "batteryLevel": 1.0,
+                    "storageChanged": False,
+                    "_captureStatus": "shooting" if self._capturing else "idle",
+                    "_recordedTime": 0,
+                    "_recordableTime": 0,
+                    "_latestFileUri": latest,
+                    "_batteryState": "disconnect"
+                }
+            }
+
+    def _checkForUpdates(self, request):
+        fingerprint = request.get("stateFingerprint")
+        waitTimeout = request.get("waitTimeout")
+        deadline = timeit.default_timer() + (waitTimeout or 0)
+        with self._lock:
+            while True:
+                self._advance()
+                if self._fingerprintName() != fingerprint or self._stopped.is_set():
+                    break
+                remaining = deadline - timeit.default_timer()
+                if remaining <= 0:
+                    break
+                # Wake up for captures that finish in the meantime
+                self._changed.wait(min(remaining, 0.05))
+            return {"stateFingerprint": self._fingerprintName(),
+                "throttleTimeout": 1}
+
+    def _status(self, commandId):
+        with self._lock:
+            self._advance()
+            if commandId not in self._commands:
+                raise _CommandError("invalidParameterValue",
+                    "Unknown command id %s" % commandId)
+            return self._commandResponse(commandId)
+
+    def _bublPoll(self, request):
+        commandId = request.get("id")
+        deadline = timeit.default_timer() + (request.get("waitTimeout") or 0)
+        with self._lock:
+            while True:
+                self._advance()
+                if commandId not in self._commands:
+                    raise _CommandError("invalidParameterValue",
+                        "Unknown command id %s" % commandId)
+                command = self._commands[commandId]
+                fingerprint = "%s_%s" % (commandId, command["state"])
+                if fingerprint != request.get("fingerprint") or self._stopped.is_set():
+                    break
+                remaining = deadline - timeit.default_timer()
+                if remaining <= 0:
+                    break
+                self._changed.wait(min(remaining, 0.05))
+            return {"command": self._commandResponse(commandId),
+                "fingerprint": fingerprint, "throttled": False}
+
+    def _bublStop(self, commandId):
+        with self._lock:
+            command = self._commands.get(commandId)
+            if command is None:
+                raise _CommandError("invalidParameterValue",
+                    "Unknown command id %s" % commandId)
+            if command["state"] == "inProgress":
+                command["due"] = timeit.default_timer()
+                self._advance()
+            return self._commandResponse(commandId)
+
+    def _execute(self, name, parameters):
+        with self._lock:
+            self._advance()
+            done = {"name": name, "state": "done", "results": {}}
+
+            if name == "camera.startSession":
+                self._sessionId += 1
+                self._changeState()
+                done["results"] = {"sessionId": "SID_%04d" % self._sessionId,
+                    "timeout": 180}
+            elif name == "camera.updateSession":
+                done["results"] = {"sessionId": parameters.get("sessionId"),
+                    "timeout": 180}
+            elif name == "camera.closeSession":
+                pass
+            elif name == "camera.takePicture":
+                if self.busyWhileStitching and any(command["state"] == "inProgress"
+                    for command in self._commands.itervalues()):
+                    raise _CommandError("serviceUnavailable",
+                        "A capture is stitching", 503)
+                commandId = self._startCommand(name, self.stitchDelay)
+                if not self.stitchDelay:
+                    self._advance()
+                return self._commandResponse(commandId)
+            elif name == "camera._startCapture":
+                self._capturing = True
+                self._changeState()
+            elif name == "camera._stopCapture":
+                if self._capturing:
+                    self._capturing = None
+                    self._addFile(video=True)
+                    self._changeState()
+            elif name == "camera._bublCaptureVideo":
+                self._capturing = self._startCommand(name, None, video=True)
+                self._changeState()
+                return self._commandResponse(self._capturing)
+            elif name in ("camera._finishWlan", "camera._bublShutdown"):
+                pass
+            elif name in ("camera.listImages", "camera._listAll"):
+                done["results"] = self._listing(name, parameters)
+            elif name == "camera.delete":
+                fileUri = parameters.get("fileUri")
+                remaining = [entry for entry in self._files if entry["uri"] != fileUri]
+                if len(remaining) == len(self._files):
+                    raise _CommandError("invalidParameterValue",
+                        "No file %s" % fileUri)
+                self._files = remaining
+                self._changeState()
+            elif name == "camera.getMetadata":
+                fileUri = parameters.get("fileUri")
+                if not any(entry["uri"] == fileUri for entry in self._files):
+                    raise _CommandError("invalidParameterValue",
+                        "No file %s" % fileUri)
+                done["results"] = {
+                    "exif": {"ImageWidth": 5376, "ImageLength": 2688,
+                        "Make": "Emulated", "Model": self.model},
+                    "xmp": {"ProjectionType": "equirectangular",
+                        "FullPanoWidthPixels": 5376, "FullPanoHeightPixels": 2688}
+                }
+            elif name == "camera.getOptions":
+                options = {}
+                for option in parameters.get("optionNames", []):
+                    if option in self._options:
+                        options[option] = self._options[option]
+                    elif option in osc.g_oscOptions or option in theta.g_ricohOptions:
+                        options[option] = ""
+                    else:
+                        raise _CommandError("invalidParameterName",
+                            "Unknown option %s" % option)
+                done["results"] = {"options": options}
+            elif name == "camera.setOptions":
+                self._options.update(parameters.get("options", {}))
+                self._changeState()
+            else:
+                raise _CommandError("unknownCommand", "Unknown command %s" % name)
+            return done
+
+    def _listing(self, name, parameters):
+        """
+        A page of the files, newest first. Called with the lock held.
+        """
+        entryCount = int(parameters.get("entryCount") or 0)
+        start = int(parameters.get("continuationToken") or 0)
+        end = min(len(self._files), start + entryCount)
+        if name == "camera._listAll" and parameters.get("sort") == "oldest":
+            page = self._files[start:end]
+        else:
+            page = [self._files[-1 - index] for index in xrange(start, end)]
+
+        includeThumb = (name == "camera.listImages" and
+            parameters.get("includeThumb", True))
+        if includeThumb:
+            thumbnail = base64.b64encode(self._payload(self.thumbnailSize))
+        entries = []
+        for entry in page:
+            entry = dict(entry)
+            if includeThumb:
+                entry["thumbnail"] = thumbnail
+            entries.append(entry)
+
+        results = {"entries": entries, "totalEntries": len(self._files)}
+        if end < len(self._files):
+            results["continuationToken"] = str(start + entryCount)
+        return results
+# CameraEmulator
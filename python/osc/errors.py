@@ -0,0 +1,204 @@
+"""
+Exceptions raised for failed camera calls.
+
+By default, camera methods print errors and return None or False. After
+camera.setRaiseErrors(True), they raise one of these exceptions instead, so
+callers can tell a camera that dropped off the network from one that is
+busy or one that rejected the command.
+
+  OSCError
+      OSCConnectionError        The camera couldn't be reached
+          OSCTimeout            A connect or read timeout expired
+      OSCCommandError           The camera answered with an error
+          InvalidSessionId, ServiceUnavailable, DisabledCommand, ...
+
+OSCError derives from IOError. Every OSCError carries the OSC error code,
+the HTTP status, the error message and the name of the command, when they
+are known.
+
+Usage:
+
+  from osc.errors import OSCTimeout, ServiceUnavailable
+
+  thetas = RicohThetaS()
+  thetas.setRaiseErrors(True)
+  try:
+      thetas.takePicture()
+  except ServiceUnavailable, e:
+      print( "Busy : %s" % e.message )
+  except OSCTimeout:
+      print( "Camera unreachable" )
+"""
+
+import requests
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['OSCError',
+           'OSCConnectionError',
+           'OSCTimeout',
+           'OSCCommandError',
+           'UnknownCommand',
+           'DisabledCommand',
+           'MissingParameter',
+           'InvalidParameterName',
+           'InvalidParameterValue',
+           'InvalidSessionId',
+           'CorruptedFile',
+           'CameraInExclusiveUse',
+           'PowerOffSequenceRunning',
+           'InvalidFileFormat',
+           'ServiceUnavailable',
+           'UnexpectedError',
+           'errorFromException',
+           'errorFromResponse']
+
+class OSCError(IOError):
+    """
+    A call to the camera failed.
+    """
+    def __init__(self, message, code=None, status=None, command=None):
+        IOError.__init__(self, message)
+        self.message = message
+        self.code = code
+        self.status = status
+        self.command = command
+
+    def __str__(self):
+        details = [str(value) for value in (self.status, self.code, self.command)
+            if value is not None]
+        if details:
+            return "%s (%s)" % (self.message, ", ".join(details))
+        return str(self.message)
+
+class OSCConnectionError(OSCError):
+    """
+    The call couldn't be sent, or its response couldn't be read.
+    """
+    pass
+
+class OSCTimeout(OSCConnectionError):
+    """
+    A connect, read or scheduling deadline expired.
+    """
+    pass
+
+class OSCCommandError(OSCError):
+    """
+    The camera answered the call with an error.
+    """
+    pass
+
+#
+# OSC error codes
+#
+class UnknownCommand(OSCCommandError):
+    pass
+
+class DisabledCommand(OSCCommandError):
+    pass
+
+class MissingParameter(OSCCommandError):
+    pass
+
+class InvalidParameterName(OSCCommandError):
+    pass
+
+class InvalidParameterValue(OSCCommandError):
+    pass
+
+class InvalidSessionId(OSCCommandError):
+    pass
+
+class CorruptedFile(OSCCommandError):
+    pass
+
+class CameraInExclusiveUse(OSCCommandError):
+    pass
+
+class PowerOffSequenceRunning(OSCCommandError):
+    pass
+
+class InvalidFileFormat(OSCCommandError):
+    pass
+
+class ServiceUnavailable(OSCCommandError):
+    pass
+
+class UnexpectedError(OSCCommandError):
+    pass
+
+'''
+The exception raised for each OSC error code. Other codes raise
+OSCCommandError.
+
+Reference:
+https://developers.google.com/streetview/open-spherical-camera/reference/commands-execute
+'''
+g_errorClasses = {
+    "unknownCommand"          : UnknownCommand,
+    "disabledCommand"         : DisabledCommand,
+    "missingParameter"        : MissingParameter,
+    "invalidParameterName"    : InvalidParameterName,
+    "invalidParameterValue"   : InvalidParameterValue,
+    "invalidSessionId"        : InvalidSessionId,
+    "corruptedFile"           : CorruptedFile,
+    "cameraInExclusiveUse"    : CameraInExclusiveUse,
+    "powerOffSequenceRunning" : PowerOffSequenceRunning,
+    "invalidFileFormat"       : InvalidFileFormat,
+    "serviceUnavailable"      : ServiceUnavailable,
+    "unexpected"              : UnexpectedError
+    }
+
+def errorFromResponse(response):
+    """
+    The OSCCommandError for an error response, either a requests.Response or
+    an already decoded response dict.
+    """
+    status = None
+    body = response
+    if not isinstance(response, dict):
+        status = response.status_code
+        try:
+            body = response.json()
+        except Exception:
+            body = {}
+    if not isinstance(body, dict):
+        body = {}
+
+    error = body.get('error') or {}
+    code = error.get('code')
+    message = error.get('message')
+    if not message:
+        message = "Command failed"
+        if status is not None:
+            message = "HTTP status %s" % status
+    if code is None and status == 503:
+        code = "serviceUnavailable"
+
+    errorClass = g_errorClasses.get(code, OSCCommandError)
+    return errorClass(message, code, status, body.get('name'))
+
+def errorFromException(exception):
+    """
+    The OSCError for an exception raised while sending a call. OSCErrors are
+    returned as they are.
+    """
+    if isinstance(exception, OSCError):
+        return exception
+    if isinstance(exception, requests.exceptions.Timeout):
+        return OSCTimeout(repr(exception))
+    return OSCConnectionError(repr(exception))
+# OSCError
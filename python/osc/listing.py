@@ -0,0 +1,273 @@
+"""
+Paged listings of the files on a camera.
+
+listingEntries follows the continuation tokens of camera.listImages or
+camera._listAll and yields the entries one at a time, so a long listing is
+never held in memory as a whole. Entries are ListEntry objects, plain dicts
+whose thumbnail stays base64 encoded until it is asked for.
+
+The listing commands can also be read as a stream. ListingParser pulls the
+entries out of the "entries" array of the response body as it arrives, so
+a listing with thumbnails never needs more memory than its largest entry,
+instead of the whole body and every thumbnail string in it.
+
+Usage:
+
+  thetas = RicohThetaS()
+  for entry in thetas.iterImages(pageSize=50, maxSize=320, includeThumb=True):
+      entry.saveThumbnail("thumb_" + entry["name"])
+"""
+
+import base64
+import itertools
+import json
+import re
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['ListEntry',
+           'ListingParser',
+           'StreamedListing',
+           'listingEntries']
+
+class ListEntry(dict):
+    """
+    One file entry of a listing. The keys are those returned by the camera,
+    for example name, uri, size and dateTime.
+    """
+    __slots__ = []
+
+    def hasThumbnail(self):
+        return bool(self.get("thumbnail"))
+
+    def thumbnail(self):
+        """
+        The decoded thumbnail jpeg data, or None if the listing didn't include
+        it. The data is decoded on every call rather than kept.
+        """
+        encoded = self.get("thumbnail")
+        if not encoded:
+            return None
+        return base64.b64decode(encoded)
+
+    def saveThumbnail(self, fileName):
+        data = self.thumbnail()
+        if data is None:
+            return False
+        with open(fileName, 'wb') as handle:
+            handle.write(data)
+        return True
+
+#
+# Streaming parse
+#
+_decoder = json.JSONDecoder()
+_separatorPattern = re.compile(r'[\s,]*')
+
+class ListingParser(object):
+    """
+    Incrementally parse a listing response, returning the entries of its
+    array as soon as each one is complete.
+
+    arrayKey:
+            String The key of the array whose items are returned.
+
+    Only the unparsed part of the current entry is buffered. The rest of the
+    response, with an empty array, is returned by close().
+    """
+    def __init__(self, arrayKey="entries"):
+        self._arrayPattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(arrayKey))
+        self._buffer = ""
+        # Blocks received since the buffer was last parsed
+        self._blocks = []
+        # Response text before and after the array
+        self._prefix = None
+        self._suffix = []
+        self._inArray = False
+        # Whether the buffer ends in a partial entry
+        self._partial = False
+
+        self.entries = 0
+        self.bytesRead = 0
+
+    def buffered(self):
+        return len(self._buffer) + sum(len(block) for block in self._blocks)
+
+    def feed(self, block):
+        """
+        Add a block of the response body. Returns the list of entries that
+        were completed by it, as ListEntry objects.
+        """
+        self.bytesRead += len(block)
+        if self._suffix:
+            self._suffix.append(block)
+            return []
+
+        if self._inArray and self._partial and '}' not in block:
+            # A partial entry can only be completed by a closing brace, so a
+            # large entry, like one with a thumbnail, is only joined and 
+            # parsed once instead of for each block
+            self._blocks.append(block)
+            return []
+
+        self._blocks.append(block)
+        buf = self._buffer + "".join(self._blocks)
+        self._blocks = []
+        if not self._inArray:
+            match = self._arrayPattern.search(buf)
+            if not match:
+                self._buffer = buf
+                return []
+            self._prefix = buf[:match.end() - 1]
+            buf = buf[match.end():]
+            self._inArray = True
+
+        entries = []
+        index = 0
+        lastBrace = buf.rfind('}')
+        self._partial = False
+        while True:
+            index = _separatorPattern.match(buf, index).end()
+            if index == len(buf):
+                break
+            if buf[index] == ']':
+                self._inArray = False
+                self._suffix.append(buf[index + 1:])
+                index = len(buf)
+                break
+            if lastBrace < index:
+                # No closing brace yet, so the entry can't be complete
+                self._partial = True
+                break
+            try:
+                entry, index = _decoder.raw_decode(buf, index)
+            except ValueError:
+                # The entry isn't complete yet
+                self._partial = True
+                break
+            entries.append(ListEntry(entry))
+
+        self._buffer = buf[index:]
+        self.entries += len(entries)
+        return entries
+
+    def close(self):
+        """
+        The response, with an empty array, once the whole body has been fed.
+        Raises ValueError if the body was incomplete.
+        """
+        if self._inArray:
+            raise ValueError("Listing ended inside the array after %d entries" % 
+                self.entries)
+        if self._prefix is None:
+            # The response has no array, for example an error
+            return json.loads(self._buffer + "".join(self._blocks))
+        return json.loads(self._prefix + "[]" + "".join(self._suffix))
+
+class StreamedListing(object):
+    """
+    A listing command whose response body is parsed as it is read.
+
+    response:
+            requests.Response The streaming response of the command.
+    chunkSize:
+            Integer Size of the blocks read from the camera.
+
+    Iterate entries() first. response() then returns the rest of the
+    response, with an empty entries array, including the 
+    continuationToken.
+    """
+    def __init__(self, response, chunkSize=65536):
+        self._response = response
+        self.chunkSize = chunkSize
+        self._parser = ListingParser()
+        self._result = None
+
+    def entries(self):
+        """
+        Generator that yields the entries of the listing as ListEntry
+        objects.
+        """
+        if self._result is not None:
+            return
+        try:
+            for block in self._response.iter_content(self.chunkSize):
+                for entry in self._parser.feed(block):
+                    yield entry
+            self._result = self._parser.close()
+        finally:
+            self.close()
+
+    def response(self):
+        """
+        The response without its entries. Entries that haven't been read yet
+        are skipped.
+        """
+        if self._result is None:
+            for entry in self.entries():
+                pass
+        return self._result
+
+    def close(self):
+        self._response.close()
+
+def listingEntries(listPage, pageSize, strict=False):
+    """
+    Generator that yields the entries of a paged listing as ListEntry
+    objects.
+
+    listPage:
+            Function listPage(entryCount, continuationToken) that sends one
+            listing call and returns a StreamedListing, or None if it failed.
+    pageSize:
+            Integer Number of entries requested per call.
+    strict:
+            Boolean A listing call that fails ends the listing, or raises
+            IOError with strict.
+    """
+    continuationToken = None
+    pages = 0
+    while True:
+        listing = listPage(pageSize, continuationToken)
+        response = None
+        count = 0
+        if listing is not None:
+            try:
+                for entry in listing.entries():
+                    count += 1
+                    yield entry
+                response = listing.response()
+            except Exception, e:
+                print( "Listing failed : %s" % repr(e) )
+            finally:
+                listing.close()
+
+        if not response or "results" not in response:
+            if strict:
+                raise IOError("Listing failed after %d pages" % pages)
+            return
+        pages += 1
+
+        results = response["results"]
+        continuationToken = results.get("continuationToken")
+        if not continuationToken:
+            # _listAll may report the total instead of returning a token, so
+            # ask for everything in one more call and skip what was yielded
+            total = results.get("totalEntries")
+            if pages == 1 and total and total > count == pageSize:
+                for entry in itertools.islice(
+                    listingEntries(listPage, total, strict), count, None):
+                    yield entry
+            return
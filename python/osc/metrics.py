@@ -0,0 +1,377 @@
+"""
+Latency and throughput metrics for the calls sent to a camera.
+
+CommandMetrics records, for every command a camera sends, a latency
+histogram, the errors by OSC error code and the bytes sent and received,
+along with the frame rate of the live preview. Commands are named as by
+the scheduler: camera.takePicture for commands/execute, and the path below
+/osc/ otherwise, like state or commands/status.
+
+Metrics are off by default, and cost nothing until a camera is given a
+CommandMetrics. They can be read with snapshot(), or exported in the
+Prometheus text format.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.metrics import CommandMetrics, prometheusText
+
+After you import the library, you can use the commands like this:
+
+  thetas = RicohThetaS()
+  thetas.setMetrics(CommandMetrics(labels={"camera": "theta-1"}))
+  thetas.takePicture()
+
+  latency = thetas.getMetrics().snapshot()["commands"]["camera.takePicture"]["latency"]
+  print( "takePicture p90 : %.3f s" % latency["p90"] )
+
+  # One exposition for a whole fleet of cameras
+  text = prometheusText([camera.getMetrics() for camera in cameras])
+"""
+
+import bisect
+import threading
+
+import requests
+
+from errors import errorFromResponse
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['g_latencyBuckets',
+           'Histogram',
+           'CommandMetrics',
+           'prometheusText']
+
+'''
+Upper bounds of the latency histogram buckets, in seconds. Streamed calls,
+like downloads and the live preview, are timed until their response headers
+arrive.
+'''
+g_latencyBuckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0]
+
+#
+# Histogram
+#
+class Histogram(object):
+    """
+    Counts of observed values in fixed buckets.
+
+    buckets:
+            List Sorted upper bounds of the buckets. Values above the last
+            bound are counted in an extra, unbounded bucket.
+    """
+    def __init__(self, buckets=None):
+        if buckets is None:
+            buckets = g_latencyBuckets
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, fraction):
+        """
+        Estimate the value below which fraction of the observations fall, by
+        interpolating within the bucket it lands in. Returns None without
+        observations.
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    # Nothing is known about the unbounded bucket
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def cumulative(self):
+        """
+        (upper bound, count of values at or below it) pairs, ending with
+        float("inf").
+        """
+        pairs = []
+        total = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+class _CommandStats(object):
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.errors = {}
+        self.bytesSent = 0
+        self.bytesReceived = 0
+
+#
+# Metrics
+#
+class CommandMetrics(object):
+    """
+    The metrics of the calls sent by one camera.
+
+    labels:
+            Dict (Optional) Labels added to every exported series, for
+            example {"camera": "theta-1"}, so the metrics of several cameras
+            can be told apart.
+    buckets:
+            List (Optional) Upper bounds of the latency buckets, in seconds.
+            Defaults to g_latencyBuckets.
+
+    Can be updated from several threads.
+    """
+    def __init__(self, labels=None, buckets=None):
+        self.labels = dict(labels or {})
+        self.buckets = list(buckets or g_latencyBuckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+            self._previewFrames = 0
+            self._previewDropped = 0
+            self._previewFps = None
+
+    def _stats(self, command):
+        stats = self._commands.get(command)
+        if stats is None:
+            stats = self._commands[command] = _CommandStats(self.buckets)
+        return stats
+
+    def observe(self, command, seconds, errorCode=None, bytesSent=0,
+        bytesReceived=0):
+        """
+        Record one call of a command.
+        """
+        with self._lock:
+            stats = self._stats(command)
+            stats.latency.observe(seconds)
+            if errorCode is not None:
+                stats.errors[errorCode] = stats.errors.get(errorCode, 0) + 1
+            stats.bytesSent += bytesSent
+            stats.bytesReceived += bytesReceived
+
+    def addBytes(self, command, bytesReceived):
+        with self._lock:
+            self._stats(command).bytesReceived += bytesReceived
+
+    def observeResponse(self, command, seconds, response, stream=False,
+        bytesSent=0):
+        """
+        Record a call from its requests.Response. The body of a streamed
+        response is counted as it is read.
+        """
+        errorCode = None
+        if response.status_code >= 400:
+            errorCode = (errorFromResponse(response).code or
+                "http%d" % response.status_code)
+
+        bytesReceived = 0
+        if not stream or errorCode is not None:
+            # The body has already been read
+            bytesReceived = len(response.content or "")
+        else:
+            self._countStream(command, response)
+
+        self.observe(command, seconds, errorCode, bytesSent, bytesReceived)
+
+    def observeException(self, command, seconds, exception, bytesSent=0):
+        """
+        Record a call that raised instead of returning a response.
+        """
+        if isinstance(exception, requests.exceptions.Timeout):
+            errorCode = "timeout"
+        else:
+            errorCode = getattr(exception, 'code', None) or "connectionError"
+        self.observe(command, seconds, errorCode, bytesSent)
+
+    def _countStream(self, command, response):
+        iterContent = response.iter_content
+        def iter_content(chunk_size=1, decode_unicode=False):
+            for block in iterContent(chunk_size, decode_unicode):
+                self.addBytes(command, len(block))
+                yield block
+        response.iter_content = iter_content
+
+    def countFrames(self, frames):
+        """
+        Generator that passes on the PreviewFrame objects of a live preview,
+        counting them and measuring the rate the camera sends them at.
+        Frames skipped by a slow consumer are counted as dropped.
+        """
+        first = None
+        last = None
+        for frame in frames:
+            with self._lock:
+                if first is None:
+                    first = frame
+                    self._previewFrames += 1
+                else:
+                    received = frame.sequence - last.sequence
+                    self._previewFrames += received
+                    self._previewDropped += received - 1
+                    elapsed = frame.timestamp - first.timestamp
+                    if elapsed > 0:
+                        self._previewFps = (frame.sequence - first.sequence) / elapsed
+            last = frame
+            yield frame
+
+    def commands(self):
+        """
+        The names of the commands that were recorded.
+        """
+        with self._lock:
+            return sorted(self._commands)
+
+    def snapshot(self):
+        """
+        The metrics as a dict of plain values.
+        """
+        with self._lock:
+            commands = {}
+            errors = {}
+            for command, stats in self._commands.iteritems():
+                latency = stats.latency
+                commands[command] = {
+                    "count": latency.count,
+                    "errors": dict(stats.errors),
+                    "bytesSent": stats.bytesSent,
+                    "bytesReceived": stats.bytesReceived,
+                    "latency": {
+                        "sum": latency.sum,
+                        "mean": latency.sum / latency.count if latency.count else None,
+                        "p50": latency.percentile(0.5),
+                        "p90": latency.percentile(0.9),
+                        "p99": latency.percentile(0.99),
+                        "buckets": latency.cumulative()
+                    }
+                }
+                for code, count in stats.errors.iteritems():
+                    errors[code] = errors.get(code, 0) + count
+
+            return {
+                "labels": dict(self.labels),
+                "commands": commands,
+                "errors": errors,
+                "preview": {
+                    "frames": self._previewFrames,
+                    "dropped": self._previewDropped,
+                    "fps": self._previewFps
+                }
+            }
+
+    def prometheus(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        return prometheusText([self])
+
+#
+# Prometheus export
+#
+def _labelText(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key in sorted(labels):
+        value = unicode(labels[key]).replace("\\", "\\\\").replace(
+            "\n", "\\n").replace('"', '\\"')
+        pairs.append('%s="%s"' % (key, value))
+    return "{%s}" % ",".join(pairs)
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def prometheusText(metricsList):
+    """
+    The Prometheus text exposition of a list of CommandMetrics, for example
+    one per camera, each with its own labels. Entries that are None are
+    skipped.
+    """
+    snapshots = [metrics.snapshot() for metrics in metricsList if metrics is not None]
+
+    families = [
+        ("osc_command_latency_seconds", "histogram",
+            "Latency of the calls sent to the camera"),
+        ("osc_command_errors_total", "counter",
+            "Calls that failed, by OSC error code"),
+        ("osc_command_sent_bytes_total", "counter",
+            "Bytes sent in the bodies of calls"),
+        ("osc_command_received_bytes_total", "counter",
+            "Bytes received in the bodies of responses"),
+        ("osc_preview_frames_total", "counter",
+            "Live preview frames received"),
+        ("osc_preview_dropped_frames_total", "counter",
+            "Live preview frames skipped by a slow consumer"),
+        ("osc_preview_frames_per_second", "gauge",
+            "Frame rate of the last live preview")
+        ]
+    samples = dict((name, []) for name, kind, help in families)
+
+    for snapshot in snapshots:
+        labels = snapshot["labels"]
+        for command in sorted(snapshot["commands"]):
+            stats = snapshot["commands"][command]
+            commandLabels = dict(labels, command=command)
+            latency = stats["latency"]
+            for bound, count in latency["buckets"]:
+                samples["osc_command_latency_seconds"].append(("_bucket",
+                    dict(commandLabels, le=_number(bound)), count))
+            samples["osc_command_latency_seconds"].append(("_sum",
+                commandLabels, latency["sum"]))
+            samples["osc_command_latency_seconds"].append(("_count",
+                commandLabels, stats["count"]))
+            for code in sorted(stats["errors"]):
+                samples["osc_command_errors_total"].append(("",
+                    dict(commandLabels, code=code), stats["errors"][code]))
+            samples["osc_command_sent_bytes_total"].append(("",
+                commandLabels, stats["bytesSent"]))
+            samples["osc_command_received_bytes_total"].append(("",
+                commandLabels, stats["bytesReceived"]))
+
+        preview = snapshot["preview"]
+        samples["osc_preview_frames_total"].append(("", labels, preview["frames"]))
+        samples["osc_preview_dropped_frames_total"].append(("", labels,
+            preview["dropped"]))
+        if preview["fps"] is not None:
+            samples["osc_preview_frames_per_second"].append(("", labels,
+                preview["fps"]))
+
+    lines = []
+    for name, kind, help in families:
+        if not samples[name]:
+            continue
+        lines.append("# HELP %s %s" % (name, help))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for suffix, labels, value in samples[name]:
+            lines.append("%s%s%s %s" % (name, suffix, _labelText(labels),
+                _number(value)))
+    return "\n".join(lines) + "\n"
+# CommandMetrics
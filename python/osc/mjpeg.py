@@ -0,0 +1,192 @@
+"""
+Streaming demuxer for the motion jpeg streams returned by the live preview
+commands, camera._getLivePreview on the Ricoh Theta S and camera._bublStream
+on the Bublcam.
+
+Blocks of the stream are appended to one bytearray. Searches resume from
+where the previous block left off, so each byte is scanned a bounded number
+of times, and the consumed part of the buffer is dropped once per block
+rather than once per frame. Every frame completed by a block is returned.
+
+When a part carries a Content-Length header, the frame is cut at that length
+without scanning its body. Otherwise the frame ends at the last end-of-image
+marker before the next multipart boundary, or at the first end-of-image
+marker if the stream has no boundary.
+
+Usage:
+
+  from osc.mjpeg import MJPEGParser, boundaryFromContentType
+
+  boundary = boundaryFromContentType(response.headers.get('content-type'))
+  parser = MJPEGParser(boundary)
+  for block in response.iter_content(16384):
+      for jpg in parser.feed(block):
+          print( len(jpg) )
+"""
+
+import re
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['boundaryFromContentType',
+           'MJPEGParser']
+
+# Start and end of image markers
+SOI = '\xff\xd8'
+EOI = '\xff\xd9'
+
+_boundaryPattern = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_contentLengthPattern = re.compile(r'content-length\s*:\s*(\d+)', re.IGNORECASE)
+
+def boundaryFromContentType(contentType):
+    """
+    Return the boundary of a multipart Content-Type header, or None.
+    """
+    if not contentType:
+        return None
+    match = _boundaryPattern.search(contentType)
+    if match:
+        return match.group(1).strip()
+    return None
+
+class MJPEGParser(object):
+    """
+    Incrementally split a motion jpeg stream into jpegs.
+
+    boundary:
+            String (Optional) The multipart boundary of the stream, as
+            returned by boundaryFromContentType.
+    maxHeaderBytes:
+            Integer Largest number of bytes between two frames that are
+            checked for part headers.
+    """
+    def __init__(self, boundary=None, maxHeaderBytes=1024):
+        self.boundary = boundary
+        self.maxHeaderBytes = maxHeaderBytes
+
+        self._buffer = bytearray()
+        # Start of the bytes that haven't been consumed yet
+        self._start = 0
+        # Where to resume the current search
+        self._searchFrom = 0
+        # Start and, when known from the headers, end of the current frame
+        self._frameStart = None
+        self._frameEnd = None
+
+        self.frames = 0
+        self.bytesRead = 0
+
+    def _contentLength(self, headerStart, headerEnd):
+        if headerEnd - headerStart > self.maxHeaderBytes:
+            headerStart = headerEnd - self.maxHeaderBytes
+        # Use the last header, in case a part without a jpeg was skipped
+        length = None
+        for match in _contentLengthPattern.finditer(str(self._buffer[headerStart:headerEnd])):
+            length = int(match.group(1))
+        return length
+
+    def _findStart(self):
+        buf = self._buffer
+        soi = buf.find(SOI, self._searchFrom)
+        if soi == -1:
+            # Keep the last byte, in case the marker is split across blocks
+            self._searchFrom = max(self._start, len(buf) - 1)
+            return False
+
+        self._frameStart = soi
+        self._frameEnd = None
+        length = self._contentLength(self._start, soi)
+        if length is not None and length > len(SOI) + len(EOI):
+            self._frameEnd = soi + length
+        self._searchFrom = soi + len(SOI)
+        return True
+
+    def _findEnd(self):
+        buf = self._buffer
+        soi = self._frameStart
+
+        # The part length is known from its headers
+        if self._frameEnd is not None:
+            end = self._frameEnd
+            if len(buf) < end:
+                return None
+            if buf[end - len(EOI):end] == EOI:
+                return end
+            # The length didn't match the frame, so fall back to scanning
+            self._frameEnd = None
+
+        # The frame ends at the last marker before the next boundary
+        if self.boundary:
+            boundaryAt = buf.find(self.boundary, self._searchFrom)
+            if boundaryAt == -1:
+                self._searchFrom = max(soi + len(SOI), len(buf) - len(self.boundary) + 1)
+                return None
+            eoi = buf.rfind(EOI, soi + len(SOI), boundaryAt)
+            if eoi == -1:
+                # A part without a complete jpeg, skip past it
+                self._frameStart = None
+                self._start = self._searchFrom = boundaryAt
+                return None
+            return eoi + len(EOI)
+
+        # The frame ends at the first marker
+        eoi = buf.find(EOI, self._searchFrom)
+        if eoi == -1:
+            self._searchFrom = max(soi + len(SOI), len(buf) - 1)
+            return None
+        return eoi + len(EOI)
+
+    def feed(self, block):
+        """
+        Add a block of the stream and return the list of jpegs it completed.
+        """
+        self._buffer.extend(block)
+        self.bytesRead += len(block)
+
+        frames = []
+        while True:
+            if self._frameStart is None and not self._findStart():
+                break
+
+            end = self._findEnd()
+            if end is None:
+                if self._frameStart is None:
+                    # A part was skipped, look for the next frame
+                    continue
+                break
+
+            frames.append(bytes(self._buffer[self._frameStart:end]))
+            self._frameStart = None
+            self._frameEnd = None
+            self._start = self._searchFrom = end
+
+        # Drop the consumed bytes, once per block
+        if self._start:
+            del self._buffer[:self._start]
+            self._searchFrom -= self._start
+            if self._frameStart is not None:
+                self._frameStart -= self._start
+                if self._frameEnd is not None:
+                    self._frameEnd -= self._start
+            self._start = 0
+
+        self.frames += len(frames)
+        return frames
+
+    def buffered(self):
+        """
+        Number of bytes held for a frame that isn't complete yet.
+        """
+        return len(self._buffer)
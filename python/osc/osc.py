@@ -35,8 +35,18 @@ After you import the library, you can use the commands like this:
 """
 
 import json
-import requests
+import os
+import posixpath
 import time
+import urlparse
+
+from errors import OSCTimeout, errorFromException, errorFromResponse
+from listing import StreamedListing, listingEntries
+from poller import CommandFuture, StatusPoller
+from pool import FutureTimeoutError
+from preview import previewFrames
+from scheduler import CommandScheduler
+from transport import HTTPTransport, parseContentRange
 
 __author__ = 'Haarm-Pieter Duiker'
 __copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
@@ -53,6 +63,7 @@ __version__ = '.'.join((__major_version__,
                         __change_version__))
 
 __all__ = ['g_oscOptions',
+           'g_oscVolatileOptions',
            'shutterSpeedNames',
            'shutterSpeeds',
            'exposurePrograms',
@@ -110,6 +121,16 @@ g_oscOptions = [
             "wifiPassword"
             ]
 
+'''
+Read-only options that change as the camera is used. Their values are never
+cached.
+'''
+g_oscVolatileOptions = [
+            "remainingPictures",
+            "remainingSpace",
+            "totalSpace"
+            ]
+
 #
 # Known options values
 #
@@ -281,13 +302,32 @@ unexpected              - 503 - Other errors
 class OpenSphericalCamera:
     # Class variables / methods
     oscOptions = g_oscOptions
+    oscVolatileOptions = g_oscVolatileOptions
 
     # Instance variables / methods
-    def __init__(self, ip_base="192.168.1.1", httpPort=80):
+    def __init__(self, ip_base="192.168.1.1", httpPort=80, transport=None):
         self.sid = None
         self.fingerprint = None
         self._api = None
 
+        # All commands are sent through one pooled, keep-alive transport
+        self._ownsTransport = transport is None
+        if transport is None:
+            transport = HTTPTransport()
+        self._transport = transport
+        self._raiseErrors = False
+        # Commands are sent one at a time, retrying while the camera is busy
+        self._scheduler = CommandScheduler(transport)
+        self._thumbnailCache = None
+
+        # Option values, valid until the state fingerprint changes or an
+        # option is set
+        self._options = {}
+        self._optionsGeneration = 0
+
+        # One thread polls the status of all of the inProgress commands
+        self._poller = StatusPoller(self)
+
         self._ip = ip_base
         self._httpPort = httpPort
         self._httpUpdatesPort = httpPort
@@ -305,6 +345,57 @@ class OpenSphericalCamera:
     def __del__(self):
         if self.sid:
             self.closeSession()
+        if self._ownsTransport:
+            self._transport.close()
+
+    def getTransport(self):
+        return self._transport
+
+    def getScheduler(self):
+        return self._scheduler
+
+    def setMetrics(self, metrics):
+        """
+        Record the latency, errors and bytes of every call, and the live
+        preview frame rate, in a metrics.CommandMetrics. Use None to stop
+        recording.
+        """
+        self._scheduler.metrics = metrics
+
+    def getMetrics(self):
+        return self._scheduler.metrics
+
+    def setRaiseErrors(self, raiseErrors):
+        """
+        Raise an errors.OSCError when a call fails, instead of printing the
+        error and returning None or False.
+        """
+        self._raiseErrors = raiseErrors
+
+    def getRaiseErrors(self):
+        return self._raiseErrors
+
+    def commandPoller(self):
+        return self._poller
+
+    def _commandFuture(self, response):
+        """
+        Wrap the response of a command that may finish in the background in
+        a CommandFuture.
+        """
+        if response is None:
+            return None
+        return CommandFuture(response, self._poller)
+
+    def setThumbnailCache(self, cache):
+        """
+        Serve the thumbnails of iterImages from a ThumbnailCache. Use None to
+        stop caching.
+        """
+        self._thumbnailCache = cache
+
+    def getThumbnailCache(self):
+        return self._thumbnailCache
 
     def _request(self, url_request, update=False):
         """
@@ -327,12 +418,26 @@ class OpenSphericalCamera:
 
         return url
 
-    def _httpError(self, exception):
+    def _httpError(self, exception, fatal=True):
+        """
+        Report an exception raised while sending a call. Raises it as an
+        OSCError if errors are raised and the call won't be retried.
+        """
+        if self._raiseErrors and fatal:
+            raise errorFromException(exception)
+
         print( "HTTP Error - begin" )
         print( repr(exception) )
         print( "HTTP Error - end" )
 
     def _oscError(self, request):
+        """
+        Report an error response. Raises it as an OSCCommandError if errors
+        are raised.
+        """
+        if self._raiseErrors:
+            raise errorFromResponse(request)
+
         status = request.status_code
 
         try:
@@ -349,9 +454,50 @@ class OpenSphericalCamera:
 
         return status
 
+    def _streamError(self, response):
+        """
+        Report the error response of a streamed call, and close it so its
+        connection goes back to the pool, even if the error is raised.
+        """
+        try:
+            return self._oscError(response)
+        finally:
+            response.close()
+
     def getOptionNames(self):
         return self.oscOptions
 
+    def getVolatileOptionNames(self):
+        return self.oscVolatileOptions
+
+    def invalidateOptions(self):
+        """
+        Forget the cached option values, so the next reads go to the camera.
+        """
+        self._optionsGeneration += 1
+        self._options = {}
+
+    def _cacheOptions(self, options, generation):
+        """
+        Cache option values read from the camera, unless the cache was
+        invalidated since the read was sent.
+        """
+        if generation != self._optionsGeneration:
+            return
+        volatileOptions = self.getVolatileOptionNames()
+        for option, value in options.iteritems():
+            if option not in volatileOptions:
+                self._options[option] = value
+
+    def _updateFingerprint(self, fingerprint):
+        """
+        Record the state fingerprint. A new fingerprint means the camera
+        state changed, so the cached option values are dropped.
+        """
+        if fingerprint != self.fingerprint:
+            self.invalidateOptions()
+        self.fingerprint = fingerprint
+
     def info(self):
         """
         Get basic information on the camera.  Note that this is a GET call
@@ -362,7 +508,7 @@ class OpenSphericalCamera:
         """
         url = self._request("info")
         try:
-            req = requests.get(url)
+            req = self._scheduler.get(url)
         except Exception, e:
             self._httpError(e)
             return None
@@ -384,14 +530,14 @@ class OpenSphericalCamera:
         """
         url = self._request("state")
         try:
-            req = requests.post(url)
+            req = self._scheduler.post(url)
         except Exception, e:
             self._httpError(e)
             return None
 
         if req.status_code == 200:
             response = req.json()
-            self.fingerprint = response['fingerprint']
+            self._updateFingerprint(response['fingerprint'])
             state = response['state']
         else:
             self._oscError(req)
@@ -402,81 +548,132 @@ class OpenSphericalCamera:
         """
         Returns the status for previous inProgress commands.
 
+        Reference:
+        https://developers.google.com/streetview/open-spherical-camera/guides/osc/commands/status
+        """
+        response = self.commandStatus(command_id)
+        if response is None:
+            return None
+
+        state = response['state']
+        print( "State : %s" % state )
+        return state
+
+    def commandStatus(self, command_id):
+        """
+        Returns the whole status response for previous inProgress commands,
+        including the results once the command is done.
+
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/guides/osc/commands/status
         """
         url = self._request("commands/status")
         body = json.dumps({"id": command_id})
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
 
         if req.status_code == 200:
             response = req.json()
-            state = response['state']
-            print( "State : %s" % state )
         else:
             self._oscError(req)
-            state = None
-        return state
+            response = None
+        return response
 
-    def checkForUpdates(self):
+    def checkForUpdates(self, waitTimeout=None):
         """
         Check for updates on the camera, using the current state fingerprint.
 
+        waitTimeout:
+                Integer (Optional) Let the camera hold the request for up to
+                this many seconds, answering as soon as the state changes.
+
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/guides/osc/checkforupdates
         """
         if self.fingerprint is None:
             self.state()
 
+        newFingerprint = self.checkFingerprint(waitTimeout)
+        if newFingerprint is None:
+            response = False
+        elif newFingerprint != self.fingerprint:
+            print( "Update - new, old fingerprint : %s, %s" % (newFingerprint, self.fingerprint) )
+            self._updateFingerprint(newFingerprint)
+            response = True
+        else:
+            print( "No update - fingerprint : %s" % self.fingerprint )
+            response = False
+        return response
+
+    def checkFingerprint(self, waitTimeout=None):
+        """
+        Send checkForUpdates with the current state fingerprint and return
+        the fingerprint the camera answers with, or None if the request 
+        failed. Unlike checkForUpdates, the stored fingerprint isn't changed
+        and nothing is printed.
+
+        Reference:
+        https://developers.google.com/streetview/open-spherical-camera/guides/osc/checkforupdates
+        """
         url = self._request("checkForUpdates")
-        body = json.dumps({"stateFingerprint": self.fingerprint})
+        parameters = {"stateFingerprint": self.fingerprint}
+        if waitTimeout is not None:
+            parameters["waitTimeout"] = waitTimeout
+        body = json.dumps(parameters)
         try:
-            req = requests.post(url, data=body)
+            # A long poll doesn't hold up the other commands
+            if waitTimeout is None:
+                req = self._scheduler.post(url, data=body)
+            else:
+                req = self._scheduler.post(url, data=body, serialize=False,
+                    timeout=self._scheduler.longPollTimeout(waitTimeout))
         except Exception, e:
             self._httpError(e)
-            return False
+            return None
 
         if req.status_code == 200:
             response = req.json()
-            newFingerprint = response['stateFingerprint']
-            if newFingerprint != self.fingerprint:
-                print( "Update - new, old fingerprint : %s, %s" % (newFingerprint, self.fingerprint) )
-                self.fingerprint = newFingerprint
-                response = True
-            else:
-                print( "No update - fingerprint : %s" % self.fingerprint )
-                response = False
+            fingerprint = response['stateFingerprint']
         else:
             self._oscError(req)
-            response = False
-        return response
+            fingerprint = None
+        return fingerprint
 
     def waitForProcessing(self, command_id, maxWait=20):
         """
-        Helper function that will poll the camera until the status to changes 
-        to 'done' or the timeout is hit.
+        Helper function that will wait until the status of the command 
+        changes to 'done' or the timeout is hit. Returns the results of the
+        command, or None if it failed or timed out.
+
+        The status is polled by the camera's StatusPoller, along with any 
+        other commands being waited on.
 
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/guides/osc/commands/status
         """
 
         print( "Waiting for processing")
-        for i in range(maxWait):
-            status = self.status(command_id)
-            if status == "done":
-                print( "Image processing finished" )
-                break
-            elif not status or "error" in status:
-                print( "Status failed. Stopping wait." )
-                break
-            print( "%d - %s" % (i, status) )
-            time.sleep( 1 )
-
-        return
+        try:
+            # The command may already be tracked without a deadline, for
+            # example by a CommandFuture, so the wait is bounded here too
+            results = self._poller.track(command_id, maxWait).result(maxWait)
+        except FutureTimeoutError:
+            if self._raiseErrors:
+                raise OSCTimeout("Command %s didn't finish in %s seconds" % (
+                    command_id, maxWait))
+            print( "Status timed out. Stopping wait." )
+            return None
+        except Exception, e:
+            if self._raiseErrors:
+                raise errorFromException(e)
+            print( "Status failed. Stopping wait. %s" % e )
+            return None
+
+        print( "Image processing finished" )
+        return results
 
     def startSession(self):
         """
@@ -491,7 +688,7 @@ class OpenSphericalCamera:
              "parameters": {}
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             self.sid = None
@@ -500,6 +697,7 @@ class OpenSphericalCamera:
         if req.status_code == 200:
             response = req.json()
             self.sid = (response["results"]["sessionId"])
+            self.invalidateOptions()
         else:
             self._oscError(req)
             self.sid = None
@@ -517,7 +715,7 @@ class OpenSphericalCamera:
              "parameters": { "sessionId":self.sid }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -543,7 +741,7 @@ class OpenSphericalCamera:
              "parameters": { "sessionId":self.sid }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -563,6 +761,9 @@ class OpenSphericalCamera:
         startSession or from state.  You can change the mode
         from video to image with captureMode in the options.
 
+        Returns a CommandFuture. response.result() waits for the image to
+        be processed and returns the results, including the fileUri.
+
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/reference/camera/takepicture
         """
@@ -576,20 +777,20 @@ class OpenSphericalCamera:
              }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
 
         if req.status_code == 200:
-            response = req.json()
+            response = self._commandFuture(req.json())
         else:
             self._oscError(req)
             response = None
         return response
 
     def listImages(self, entryCount = 3, maxSize = None, 
-        continuationToken = None, includeThumb = True ):
+        continuationToken = None, includeThumb = True, stream = False ):
         """
         entryCount:
                 Integer No. of still images and video files to be acquired
@@ -603,6 +804,10 @@ class OpenSphericalCamera:
         includeThumb:
                 Boolean (Optional) Defaults to true. Use false to omit 
                 thumbnail images from the result.
+        stream:
+                Boolean (Optional) Return a StreamedListing that parses the
+                entries as the response is read, instead of the whole
+                response.
 
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/reference/camera/listimages
@@ -620,8 +825,11 @@ class OpenSphericalCamera:
         body = json.dumps({"name": "camera.listImages",
              "parameters": parameters
              })
+        if stream:
+            return self._streamListing(url, body)
+
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -633,6 +841,68 @@ class OpenSphericalCamera:
             response = None
         return response
 
+    def _streamListing(self, url, body):
+        """
+        Send a listing command and return a StreamedListing over its 
+        response, or None if the request failed.
+        """
+        try:
+            req = self._scheduler.post(url, data=body, stream=True)
+        except Exception, e:
+            self._httpError(e)
+            return None
+
+        if req.status_code == 200:
+            response = StreamedListing(req)
+        else:
+            self._streamError(req)
+            response = None
+        return response
+
+    def iterImages(self, pageSize=20, maxSize=None, includeThumb=False, 
+        strict=False):
+        """
+        Generator that yields the entry of every image on the camera as a
+        ListEntry, following the continuation tokens of listImages. The
+        responses are parsed as they are read, so only one entry is held in
+        memory at a time, and thumbnails stay base64 encoded until 
+        ListEntry.thumbnail() is called.
+
+        pageSize:
+                Integer (Optional) No. of entries requested per call.
+        maxSize:
+                Integer (Optional) Maximum size of thumbnail images; 
+                max(thumbnail_width, thumbnail_height).
+        includeThumb:
+                Boolean (Optional) Defaults to false. Use true to include
+                thumbnail images in the entries. With a thumbnail cache, the
+                pages are listed without thumbnails and filled in from the
+                cache, listing a page again with thumbnails only when some
+                are missing.
+        strict:
+                Boolean (Optional) Raise IOError when a listing call fails
+                instead of ending the listing.
+
+        Reference:
+        https://developers.google.com/streetview/open-spherical-camera/reference/camera/listimages
+        """
+        cache = self._thumbnailCache if includeThumb else None
+        def listPage(entryCount, continuationToken):
+            if cache is None:
+                return self.listImages(entryCount, maxSize, continuationToken, 
+                    includeThumb, stream=True)
+
+            listing = self.listImages(entryCount, maxSize, continuationToken, 
+                False, stream=True)
+            if listing is None:
+                return None
+            def listWithThumbnails():
+                return self.listImages(entryCount, maxSize, continuationToken,
+                    True, stream=True)
+            return cache.listing(listing, maxSize, listWithThumbnails)
+
+        return listingEntries(listPage, pageSize, strict)
+
     def delete(self, fileUri):
         """
         Delete the image with the named fileUri
@@ -647,7 +917,7 @@ class OpenSphericalCamera:
              }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -659,7 +929,8 @@ class OpenSphericalCamera:
             response = None
         return response
 
-    def getImage(self, fileUri, imageType="image"):
+    def getImage(self, fileUri, imageType="image", fileName=None, chunkSize=65536,
+        retries=2):
         """
         Transfer the file from the camera to computer and save the
         binary data to local storage.  This works, but is clunky.
@@ -667,6 +938,19 @@ class OpenSphericalCamera:
         can be set to "thumb" for a thumbnail or "image" for the
         full-size image.  The default is "image".
 
+        The data is written to fileName + ".part" and moved into place once
+        complete. An interrupted transfer resumes from the end of the .part
+        file, on the next attempt or the next call.
+
+        fileName:
+                String (Optional) Where to save the file. Defaults to the 
+                name of the file in the current directory.
+        chunkSize:
+                Integer (Optional) Size of the blocks read from the camera.
+        retries:
+                Integer (Optional) Number of times an interrupted transfer is
+                resumed before giving up.
+
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/reference/camera/getimage
         """
@@ -677,25 +961,45 @@ class OpenSphericalCamera:
                 "_type": imageType
              }
              })
-        fileName = fileUri.split("/")[1]
+        if fileName is None:
+            fileName = self._fileName(fileUri)
         print( "Writing image : %s" % fileName )
 
-        acquired = False
+        fileUrl = self._fileUrl(fileUri) if imageType == "image" else None
+        def send(headers):
+            if fileUrl:
+                return self._scheduler.get(fileUrl, headers=headers, stream=True)
+            return self._scheduler.post(url, data=body, headers=headers, stream=True)
+
+        return self._downloadFile(send, fileName, chunkSize, retries)
+
+    def iterImage(self, fileUri, imageType="image", chunkSize=65536):
+        """
+        Generator that yields the binary data of the named fileUri in blocks
+        of up to chunkSize bytes instead of writing it to local storage.
+        Nothing is yielded if the request fails.
+
+        Reference:
+        https://developers.google.com/streetview/open-spherical-camera/reference/camera/getimage
+        """
+        url = self._request("commands/execute")
+        body = json.dumps({"name": "camera.getImage",
+             "parameters": {
+                "fileUri": fileUri,
+                "_type": imageType
+             }
+             })
         try:
-            response = requests.post(url, data=body, stream=True)
+            response = self._scheduler.post(url, data=body, stream=True)
         except Exception, e:
             self._httpError(e)
-            return acquired
+            return
 
         if response.status_code == 200:
-            with open(fileName, 'wb') as handle:
-                for block in response.iter_content(1024):
-                    handle.write(block)
-            acquired = True
+            for block in response.iter_content(chunkSize):
+                yield block
         else:
-            self._oscError(response)
-
-        return acquired
+            self._streamError(response)
 
     def getMetadata(self, fileUri):
         """
@@ -711,7 +1015,7 @@ class OpenSphericalCamera:
              }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -729,6 +1033,9 @@ class OpenSphericalCamera:
         Set an option to a value. The validity of the option is checked. The
         validity of the value is not.  
 
+        Setting an option can change others, so the cached option values 
+        are dropped, apart from the one that was set.
+
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/reference/camera/setoptions
         https://developers.theta360.com/en/docs/v2/api_reference/commands/camera.set_options.html
@@ -749,7 +1056,7 @@ class OpenSphericalCamera:
              }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -757,6 +1064,66 @@ class OpenSphericalCamera:
         if req.status_code == 200:
             response = req.json()
             #print( "setOption suceeeded - %s " % response )
+            self.invalidateOptions()
+            self._cacheOptions({option: value}, self._optionsGeneration)
+        else:
+            self._oscError(req)
+            response = None
+
+        return response
+
+    def setOptions(self, options, force=False):
+        """
+        Set several options in a single request. The option names are
+        checked against getOptionNames before anything is sent, and options
+        whose cached value already matches are skipped. If nothing needs to
+        change, no request is sent and an empty done response is returned.
+
+        options:
+                Dict Option names and their values.
+        force:
+                Boolean (Optional) Send every value, even the ones that are
+                known to be current.
+
+        Reference:
+        https://developers.google.com/streetview/open-spherical-camera/reference/camera/setoptions
+        https://developers.theta360.com/en/docs/v2/api_reference/commands/camera.set_options.html
+        """
+        if self.sid == None:
+            response = None
+            return response
+
+        optionNames = self.getOptionNames()
+        unknown = [option for option in options if option not in optionNames]
+        if unknown:
+            print( "setOptions - unknown options : %s" % ", ".join(sorted(unknown)) )
+            return None
+
+        cached = self._options
+        changes = dict((option, value) for option, value in options.iteritems()
+            if force or option not in cached or cached[option] != value)
+        if not changes:
+            return {"name": "camera.setOptions", "state": "done", "results": {}}
+
+        print( "setOptions - %s" % changes )
+
+        url = self._request("commands/execute")
+        body = json.dumps({"name": "camera.setOptions",
+             "parameters": {
+                "sessionId": self.sid,
+                "options": changes
+             }
+             })
+        try:
+            req = self._scheduler.post(url, data=body)
+        except Exception, e:
+            self._httpError(e)
+            return None
+
+        if req.status_code == 200:
+            response = req.json()
+            self.invalidateOptions()
+            self._cacheOptions(changes, self._optionsGeneration)
         else:
             self._oscError(req)
             response = None
@@ -767,10 +1134,18 @@ class OpenSphericalCamera:
         """
         Get an option value. The validity of the option is not checked.
 
+        Values are cached until the state fingerprint changes, as seen by
+        state or checkForUpdates, or an option is set. Volatile options,
+        like remainingSpace, are always read from the camera.
+
         Reference:
         https://developers.google.com/streetview/open-spherical-camera/reference/camera/getoptions
         https://developers.theta360.com/en/docs/v2/api_reference/commands/camera.get_options.html
         """
+        if option in self._options:
+            return self._options[option]
+
+        generation = self._optionsGeneration
         url = self._request("commands/execute")
         body = json.dumps({"name": "camera.getOptions",
              "parameters": {
@@ -780,7 +1155,7 @@ class OpenSphericalCamera:
              }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -788,11 +1163,186 @@ class OpenSphericalCamera:
         if req.status_code == 200:
             response = req.json()
             value = response["results"]["options"][option]
+            self._cacheOptions({option: value}, generation)
         else:
             self._oscError(req)
             value = None
         return value
 
+    def _fileUrl(self, fileUri):
+        """
+        The URL a file can be fetched from with a plain GET, or None. Cameras
+        implementing API level 2 return fileUris that are URLs.
+        """
+        if fileUri.startswith("http://") or fileUri.startswith("https://"):
+            return fileUri
+        return None
+
+    def _fileName(self, fileUri):
+        """
+        The default local file name of a fileUri, which is either a path on
+        the camera or, for API level 2, a URL.
+        """
+        return posixpath.basename(urlparse.urlsplit(fileUri).path)
+
+    def _readPartInfo(self, partFileName):
+        """
+        The size and validators of the file a .part file was started from.
+        """
+        try:
+            with open(partFileName + ".json", 'r') as handle:
+                return json.load(handle)
+        except (IOError, ValueError):
+            return {}
+
+    def _writePartInfo(self, partFileName, response, size):
+        etag = response.headers.get('etag')
+        if etag and etag.startswith("W/"):
+            # Weak validators can't be used with If-Range
+            etag = None
+        info = {"size": size, "etag": etag,
+            "lastModified": response.headers.get('last-modified')}
+        with open(partFileName + ".json", 'w') as handle:
+            json.dump(info, handle)
+
+    def _removePart(self, partFileName):
+        for name in (partFileName, partFileName + ".json"):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def _downloadFile(self, send, fileName, chunkSize, retries):
+        """
+        Write the body of a download to fileName, through fileName + ".part".
+        send(headers) sends the request and returns the streaming response.
+
+        An existing .part file is resumed with a Range request. The size, and
+        the ETag or Last-Modified date, of the file it was started from are
+        kept next to it in a .part.json file, and sent with If-Range, so a
+        .part file of a file that has since changed isn't appended to. If the
+        camera answers with the whole file instead of the range, it is
+        fetched again from the start. A .part file that doesn't match the
+        file on the camera is discarded.
+
+        Interrupted transfers are resumed after the scheduler's retry delay,
+        so a camera that dropped the connection has time to recover.
+        """
+        partFileName = fileName + ".part"
+        discarded = False
+        delay = False
+        attempt = -1
+        while attempt < retries:
+            attempt += 1
+            if delay:
+                time.sleep(self._scheduler.retryDelay(attempt - 1))
+            # Every attempt that doesn't return is a failure, unless it
+            # discarded the .part file
+            delay = True
+            offset = 0
+            info = {}
+            if os.path.exists(partFileName):
+                offset = os.path.getsize(partFileName)
+                info = self._readPartInfo(partFileName)
+
+            headers = {}
+            if offset:
+                headers['Range'] = "bytes=%d-" % offset
+                validator = info.get('etag') or info.get('lastModified')
+                if validator:
+                    headers['If-Range'] = validator
+
+            try:
+                response = send(headers)
+            except Exception, e:
+                self._httpError(e, fatal=attempt == retries)
+                continue
+            if response is None:
+                continue
+
+            contentRange = parseContentRange(response.headers.get('content-range'))
+            size = info.get('size')
+            if (response.status_code == 206 and contentRange
+                and contentRange[0] == offset and size in (None, contentRange[2])):
+                mode = 'ab'
+                expected = contentRange[2]
+                if not info:
+                    self._writePartInfo(partFileName, response, expected)
+            elif response.status_code == 200:
+                mode = 'wb'
+                expected = response.headers.get('content-length')
+                if expected is not None:
+                    expected = int(expected)
+                self._writePartInfo(partFileName, response, expected)
+            elif (response.status_code == 416 and contentRange
+                and contentRange[2] == offset and size in (None, offset)):
+                # The .part file already holds the whole file
+                response.close()
+                mode = None
+                expected = offset
+            elif response.status_code in (206, 416):
+                # The .part file is longer than the file on the camera, or was
+                # started from a different file. Fetch the file from the start,
+                # without counting it as a retry the first time
+                response.close()
+                print( "Discarding partial download : %s" % partFileName )
+                self._removePart(partFileName)
+                if not discarded:
+                    discarded = True
+                    attempt -= 1
+                delay = False
+                continue
+            else:
+                self._streamError(response)
+                return False
+
+            if mode:
+                try:
+                    with open(partFileName, mode) as handle:
+                        for block in response.iter_content(chunkSize):
+                            handle.write(block)
+                except Exception, e:
+                    self._httpError(e, fatal=attempt == retries)
+                    continue
+                finally:
+                    response.close()
+
+            # A connection that closes early can look like the end of the file
+            if expected is not None and os.path.getsize(partFileName) < expected:
+                print( "Download incomplete : %s, %d of %d bytes" % (
+                    fileName, os.path.getsize(partFileName), expected) )
+                continue
+
+            if os.path.exists(fileName):
+                os.remove(fileName)
+            os.rename(partFileName, fileName)
+            self._removePart(partFileName)
+            return True
+
+        return False
+
+    def _previewFrames(self, response, timeLimitSeconds=None, maxFrames=None,
+        latestOnly=False):
+        """
+        Generator that splits a streaming motion jpeg response into 
+        PreviewFrame objects. See preview.previewFrames.
+        """
+        frames = previewFrames(response, timeLimitSeconds, maxFrames, latestOnly)
+        metrics = self._scheduler.metrics
+        if metrics is not None:
+            frames = metrics.countFrames(frames)
+        return frames
+
+    def _savePreview(self, response, fileNamePrefix, timeLimitSeconds, recorder=None):
+        """
+        Write the frames of a streaming motion jpeg response to disk, 
+        directly or through a FrameRecorder.
+        """
+        for frame in self._previewFrames(response, timeLimitSeconds):
+            frameFileName = "%s.%04d.jpg" % (fileNamePrefix, frame.sequence)
+            if recorder is not None:
+                recorder.put(frame, frameFileName)
+            else:
+                frame.save(frameFileName)
+
     def getSid(self):
         """
         Helper function that will refresh the cache of the sessionsId and 
@@ -800,7 +1350,7 @@ class OpenSphericalCamera:
         """
         url = self._request("state")
         try:
-            req = requests.post(url)
+            req = self._scheduler.post(url)
         except Exception, e:
             self._httpError(e)
             self.sid = None
@@ -808,6 +1358,7 @@ class OpenSphericalCamera:
 
         if req.status_code == 200:
             response = req.json()
+            self._updateFingerprint(response['fingerprint'])
             self.sid = response["state"]["sessionId"]
         else:
             self._oscError(req)
@@ -818,16 +1369,25 @@ class OpenSphericalCamera:
     def getAllOptions(self):
         """
         Helper function that will get the value for all options.
+        Only the options whose values aren't cached are read from the 
+        camera.
         """
+        optionNames = self.getOptionNames()
+        cached = self._options
+        missing = [option for option in optionNames if option not in cached]
+        if not missing:
+            return dict((option, cached[option]) for option in optionNames)
+
+        generation = self._optionsGeneration
         url = self._request("commands/execute")
         body = json.dumps({"name": "camera.getOptions",
                  "parameters": {
                     "sessionId": self.sid,
-                    "optionNames": self.getOptionNames()
+                    "optionNames": missing
                  }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -835,6 +1395,10 @@ class OpenSphericalCamera:
         if req.status_code == 200:
             response = req.json()
             returnOptions = response["results"]["options"]
+            self._cacheOptions(returnOptions, generation)
+            for option in optionNames:
+                if option in cached and option not in returnOptions:
+                    returnOptions[option] = cached[option]
         else:
             self._oscError(req)
             returnOptions = None
@@ -0,0 +1,288 @@
+"""
+Completion tracking for commands that run in the background on the camera.
+
+Commands like camera.takePicture answer with an inProgress state and an id,
+and finish later. Each camera has one StatusPoller that polls
+commands/status for all of its outstanding ids from a single background
+thread. The first poll of a command is timed from how long recent commands
+took, and the interval grows from there, so a command is seen to finish soon
+after it does without flooding the camera with requests.
+
+The responses of those commands are CommandFuture objects. They are the
+usual response dicts, and can also be waited on for the final results.
+
+Usage:
+
+  response = thetas.takePicture()
+  results = response.result(timeout=10)
+  thetas.getImage(results["fileUri"])
+"""
+
+import heapq
+import threading
+import timeit
+import weakref
+
+from errors import OSCCommandError
+from pool import Future, FutureTimeoutError
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['CommandFailed',
+           'CommandFuture',
+           'StatusPoller']
+
+class CommandFailed(OSCCommandError):
+    """
+    A command finished with an error state.
+    """
+    def __init__(self, response):
+        self.response = response
+        error = response.get('error') or {}
+        OSCCommandError.__init__(self, error.get('message') or "Command failed",
+            error.get('code'), None, response.get('name'))
+
+#
+# Command handle
+#
+class CommandFuture(dict):
+    """
+    The response of a command, which can also be used as a Future of its
+    final results. Polling for an inProgress command only starts once one
+    of the Future methods is called.
+    """
+    def __init__(self, response, poller):
+        dict.__init__(self, response)
+        self._poller = poller
+        self._received = timeit.default_timer()
+        self._future = None
+        self._lock = threading.Lock()
+
+    def _getFuture(self):
+        with self._lock:
+            if self._future is None:
+                state = self.get('state')
+                if state == "inProgress" and 'id' in self:
+                    self._future = self._poller.track(self['id'],
+                        started=self._received)
+                else:
+                    self._future = Future()
+                    if state == "error":
+                        self._future.setException(CommandFailed(dict(self)))
+                    else:
+                        self._future.setResult(self.get('results', {}))
+            return self._future
+
+    def done(self):
+        return self._getFuture().done()
+
+    def result(self, timeout=None):
+        """
+        Wait up to timeout seconds for the command to finish and return its
+        results. Raises CommandFailed if the command failed and
+        FutureTimeoutError if it didn't finish in time.
+        """
+        return self._getFuture().result(timeout)
+
+    def exception(self, timeout=None):
+        return self._getFuture().exception(timeout)
+
+    def addDoneCallback(self, callback):
+        self._getFuture().addDoneCallback(callback)
+
+#
+# Status polling
+#
+class _Tracked(object):
+    def __init__(self, commandId, started, deadline):
+        self.commandId = commandId
+        self.future = Future()
+        self.started = started
+        self.deadline = deadline
+        self.interval = None
+        self.failures = 0
+        # Whether the time the command took to finish is known well enough
+        # to count towards the expected duration
+        self.timed = False
+
+class StatusPoller(object):
+    """
+    Poll commands/status for every outstanding command of one camera.
+
+    camera:
+            OpenSphericalCamera The camera the commands were sent to.
+    minInterval:
+            Float Shortest time between two polls of a command, in seconds.
+    maxInterval:
+            Float Longest time between two polls of a command, in seconds.
+    backoff:
+            Float Factor the interval grows by after each poll.
+    maxFailures:
+            Integer Number of status requests in a row that may fail before
+            the command is given up on.
+
+    The thread only runs while there are commands to poll. The camera is
+    held through a weak reference, so that the camera, which closes its
+    session in __del__, can still be collected.
+    """
+    def __init__(self, camera, minInterval=0.1, maxInterval=1.0, backoff=1.5,
+        maxFailures=5):
+        self.camera = weakref.proxy(camera)
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.maxFailures = maxFailures
+
+        self._condition = threading.Condition()
+        self._tracked = {}
+        self._schedule = []
+        self._thread = None
+        # Moving average of how long commands take to finish
+        self._expected = None
+
+        self.polls = 0
+
+    def outstanding(self):
+        return len(self._tracked)
+
+    def expectedDuration(self):
+        """
+        How long recent commands took to finish, in seconds, or None.
+        """
+        return self._expected
+
+    def track(self, commandId, timeout=None, started=None):
+        """
+        Return a Future for the results of an inProgress command. Tracking
+        the same id again returns the same Future. With timeout, the command
+        is given up on after that many seconds, failing the Future with
+        FutureTimeoutError. started is the timeit.default_timer() value when
+        the command was answered, if it wasn't just now.
+        """
+        with self._condition:
+            tracked = self._tracked.get(commandId)
+            if tracked is not None:
+                return tracked.future
+
+            now = timeit.default_timer()
+            if started is None:
+                started = now
+            deadline = None
+            if timeout is not None:
+                deadline = now + timeout
+            tracked = _Tracked(commandId, started, deadline)
+            # A command that is tracked late, because its results were asked
+            # for late, may have finished long before its first poll
+            tracked.timed = now - started <= self.minInterval
+            self._tracked[commandId] = tracked
+
+            # Skip polls that are sure to come back inProgress
+            due = now + self.minInterval
+            if self._expected is not None:
+                due = max(due, started + 0.8 * self._expected)
+            heapq.heappush(self._schedule, (due, commandId))
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                    name="osc-status-poller")
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+        return tracked.future
+
+    def _finish(self, tracked, result=None, exception=None):
+        with self._condition:
+            self._tracked.pop(tracked.commandId, None)
+            if exception is None and tracked.timed:
+                duration = timeit.default_timer() - tracked.started
+                if self._expected is None:
+                    self._expected = duration
+                else:
+                    self._expected = 0.7 * self._expected + 0.3 * duration
+
+        if exception is None:
+            tracked.future.setResult(result)
+        else:
+            tracked.future.setException(exception)
+
+    def _next(self):
+        """
+        Wait for the next command that is due to be polled. Returns False once
+        there are no commands left, ending the thread.
+        """
+        with self._condition:
+            while True:
+                if not self._schedule:
+                    self._thread = None
+                    return False
+                due, commandId = self._schedule[0]
+                wait = due - timeit.default_timer()
+                if wait <= 0:
+                    heapq.heappop(self._schedule)
+                    tracked = self._tracked.get(commandId)
+                    if tracked is not None:
+                        return tracked
+                else:
+                    self._condition.wait(wait)
+
+    def _poll(self, tracked):
+        now = timeit.default_timer()
+        if tracked.deadline is not None and now > tracked.deadline:
+            self._finish(tracked, exception=FutureTimeoutError(
+                "Command %s didn't finish in time" % tracked.commandId))
+            return
+
+        self.polls += 1
+        try:
+            response = self.camera.commandStatus(tracked.commandId)
+        except Exception, e:
+            print( "Status poll failed : %s" % repr(e) )
+            response = None
+
+        if response is None:
+            tracked.failures += 1
+            if tracked.failures >= self.maxFailures:
+                self._finish(tracked, exception=IOError(
+                    "Status of command %s could not be read" % tracked.commandId))
+                return
+        else:
+            tracked.failures = 0
+            state = response.get('state')
+            if state == "done":
+                self._finish(tracked, result=response.get('results', {}))
+                return
+            elif state == "error":
+                self._finish(tracked, exception=CommandFailed(response))
+                return
+
+        # Still in progress. Poll again soon, and less often the longer the
+        # command takes
+        tracked.timed = True
+        if tracked.interval is None:
+            tracked.interval = self.minInterval
+        else:
+            tracked.interval = min(self.maxInterval, tracked.interval * self.backoff)
+        with self._condition:
+            heapq.heappush(self._schedule,
+                (timeit.default_timer() + tracked.interval, tracked.commandId))
+
+    def _run(self):
+        while True:
+            tracked = self._next()
+            if tracked is False:
+                return
+            self._poll(tracked)
+# StatusPoller
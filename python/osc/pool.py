@@ -0,0 +1,330 @@
+"""
+A small worker pool and future implementation used to run camera commands
+concurrently.
+
+One pool of worker threads can be shared by many cameras. Each worker runs
+one blocking call at a time, so a pool of n workers runs at most n calls at
+once across all of its cameras, and an iterator returned by iterate holds a
+worker for as long as it is being filled. SerialQueue runs the calls of one
+camera one at a time without holding a worker while they wait.
+
+Usage:
+
+  from osc.pool import WorkerPool, waitAll
+
+  pool = WorkerPool(workers=8)
+  futures = [pool.submit(camera.state) for camera in cameras]
+  states = waitAll(futures)
+"""
+
+import Queue
+import collections
+import sys
+import threading
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['FutureTimeoutError',
+           'Future',
+           'WorkerPool',
+           'SerialQueue',
+           'BufferedIterator',
+           'defaultPool',
+           'waitAll']
+
+class FutureTimeoutError(Exception):
+    pass
+
+#
+# Future
+#
+class Future(object):
+    """
+    The eventual result of a call running on another thread.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._done = False
+        self._result = None
+        self._excInfo = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def _wait(self, timeout):
+        with self._condition:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise FutureTimeoutError()
+
+    def result(self, timeout=None):
+        """
+        Wait up to timeout seconds for the call to finish and return its
+        result. Exceptions raised by the call are raised again here.
+        """
+        self._wait(timeout)
+        if self._excInfo:
+            raise self._excInfo[0], self._excInfo[1], self._excInfo[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """
+        Wait up to timeout seconds for the call to finish and return the
+        exception it raised, or None.
+        """
+        self._wait(timeout)
+        if self._excInfo:
+            return self._excInfo[1]
+        return None
+
+    def addDoneCallback(self, callback):
+        """
+        Call callback(future) once the call has finished. The callback is
+        called immediately if the call has already finished.
+        """
+        with self._condition:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, result, excInfo):
+        with self._condition:
+            self._result = result
+            self._excInfo = excInfo
+            self._done = True
+            self._condition.notify_all()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception, e:
+                print( "Future - callback failed : %s" % repr(e) )
+
+    def setResult(self, result):
+        self._finish(result, None)
+
+    def setException(self, exception):
+        self._finish(None, (type(exception), exception, None))
+
+    def setExcInfo(self, excInfo):
+        self._finish(None, excInfo)
+
+#
+# Worker pool
+#
+class WorkerPool(object):
+    """
+    A fixed number of daemon threads pulling calls from a shared queue.
+    """
+    def __init__(self, workers=8):
+        self._jobs = Queue.Queue()
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name="osc-worker-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            future, function, args, kwargs = job
+            try:
+                result = function(*args, **kwargs)
+            except:
+                future.setExcInfo(sys.exc_info())
+            else:
+                future.setResult(result)
+
+    def workers(self):
+        return len(self._threads)
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Schedule function(*args, **kwargs) to run on a worker and return a
+        Future for its result.
+        """
+        future = Future()
+        self._jobs.put((future, function, args, kwargs))
+        return future
+
+    def iterate(self, generator, maxBuffered=8):
+        """
+        Run a generator on a worker, buffering up to maxBuffered of its items
+        ahead of the consumer. Returns a BufferedIterator.
+        """
+        iterator = BufferedIterator(maxBuffered)
+        self.submit(iterator._buffer.fill, generator)
+        return iterator
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers once the calls already submitted have finished.
+        """
+        for thread in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+#
+# Serial queue
+#
+class SerialQueue(object):
+    """
+    Calls run on a WorkerPool one at a time, in the order they were
+    submitted. Calls waiting for their turn don't hold a worker.
+    """
+    def __init__(self, pool):
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._running = False
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Schedule function(*args, **kwargs) to run after the calls already
+        submitted and return a Future for its result.
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append((future, function, args, kwargs))
+            if self._running:
+                return future
+            self._running = True
+        self._pool.submit(self._runNext)
+        return future
+
+    def _runNext(self):
+        with self._lock:
+            future, function, args, kwargs = self._pending.popleft()
+        try:
+            result = function(*args, **kwargs)
+        except:
+            future.setExcInfo(sys.exc_info())
+        else:
+            future.setResult(result)
+
+        with self._lock:
+            if not self._pending:
+                self._running = False
+                return
+        self._pool.submit(self._runNext)
+
+_defaultPool = None
+_defaultPoolLock = threading.Lock()
+
+def defaultPool():
+    """
+    The pool shared by all asynchronous cameras that aren't given their own.
+    """
+    global _defaultPool
+    with _defaultPoolLock:
+        if _defaultPool is None:
+            _defaultPool = WorkerPool(workers=16)
+    return _defaultPool
+
+def waitAll(futures, timeout=None):
+    """
+    Wait for a list of futures and return their results, in order.
+    """
+    return [future.result(timeout) for future in futures]
+
+#
+# Buffered iterator
+#
+class _Buffer(object):
+    """
+    The items passed from the producer of a BufferedIterator to its
+    consumer. The producer only holds the buffer, so an iterator that is
+    dropped without being closed can still be closed when it is collected.
+    """
+    end = object()
+
+    def __init__(self, maxBuffered):
+        self.items = Queue.Queue(maxBuffered)
+        self.closed = False
+        self.excInfo = None
+
+    def _put(self, item):
+        # Wake up regularly, so a consumer that went away doesn't hold the
+        # worker forever
+        while not self.closed:
+            try:
+                self.items.put(item, timeout=0.1)
+                return
+            except Queue.Full:
+                pass
+
+    def fill(self, generator):
+        try:
+            for item in generator:
+                if self.closed:
+                    break
+                self._put(item)
+        except:
+            self.excInfo = sys.exc_info()
+        finally:
+            close = getattr(generator, 'close', None)
+            if close:
+                close()
+            self._put(self.end)
+
+class BufferedIterator(object):
+    """
+    Iterator over items produced by a generator running on another thread.
+    At most maxBuffered items are held between the producer and consumer.
+    The producer is stopped by close(), or once the iterator is collected.
+    """
+    def __init__(self, maxBuffered=8):
+        self._buffer = _Buffer(maxBuffered)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        buffer = self._buffer
+        if buffer.closed:
+            raise StopIteration
+        item = buffer.items.get()
+        if item is _Buffer.end:
+            buffer.closed = True
+            if buffer.excInfo:
+                raise buffer.excInfo[0], buffer.excInfo[1], buffer.excInfo[2]
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+        Stop the producer and release the items already buffered.
+        """
+        buffer = self._buffer
+        buffer.closed = True
+        try:
+            while True:
+                buffer.items.get_nowait()
+        except Queue.Empty:
+            pass
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,177 @@
+"""
+Live preview frames held in memory.
+
+previewFrames turns a streaming motion jpeg response, from
+camera._getLivePreview or camera._bublStream, into a series of PreviewFrame
+objects. Each frame carries its jpeg data, its sequence number in the stream
+and the time it was received.
+
+With latestOnly, the stream is read on a separate thread and only the newest
+frame is kept, so a slow consumer skips frames instead of falling behind the
+camera. Skipped frames show up as gaps in the sequence numbers.
+
+Usage:
+
+  thetas = RicohThetaS()
+  for frame in thetas.iterLivePreview(maxFrames=100, latestOnly=True):
+      print( "%04d - %d bytes" % (frame.sequence, len(frame)) )
+"""
+
+import threading
+import time
+
+from mjpeg import MJPEGParser, boundaryFromContentType
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['PreviewFrame',
+           'previewFrames']
+
+class PreviewFrame(object):
+    """
+    One jpeg from the live preview stream.
+
+    data:
+            String The jpeg data.
+    sequence:
+            Integer Index of the frame in the stream, starting at 0.
+    timestamp:
+            Float time.time() when the frame was received.
+    """
+    __slots__ = ['data', 'sequence', 'timestamp']
+
+    def __init__(self, data, sequence, timestamp):
+        self.data = data
+        self.sequence = sequence
+        self.timestamp = timestamp
+
+    def __len__(self):
+        return len(self.data)
+
+    def view(self):
+        """
+        A memoryview of the jpeg data, for passing it on without a copy.
+        """
+        return memoryview(self.data)
+
+    def save(self, fileName):
+        with open(fileName, 'wb') as handle:
+            handle.write(self.data)
+
+def _readFrames(response, timeLimitSeconds, stopped=None):
+    parser = MJPEGParser(boundaryFromContentType(response.headers.get('content-type')))
+    t0 = time.time()
+    sequence = 0
+    for block in response.iter_content(16384):
+        if stopped is not None and stopped.is_set():
+            break
+
+        t1 = time.time()
+        for jpg in parser.feed(block):
+            yield PreviewFrame(jpg, sequence, t1)
+            sequence += 1
+
+        if timeLimitSeconds is not None and t1 - t0 > timeLimitSeconds:
+            break
+
+class _LatestFrame(object):
+    """
+    Single slot shared by the stream reader and the consumer. A frame that
+    hasn't been taken yet is replaced by the next one.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self.finished = False
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._condition:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._condition.notify()
+
+    def finish(self):
+        with self._condition:
+            self.finished = True
+            self._condition.notify()
+
+    def take(self):
+        with self._condition:
+            while self._frame is None and not self.finished:
+                self._condition.wait()
+            frame = self._frame
+            self._frame = None
+        return frame
+
+def _readLatest(response, timeLimitSeconds, latest, stopped):
+    try:
+        for frame in _readFrames(response, timeLimitSeconds, stopped):
+            latest.put(frame)
+    except Exception, e:
+        # Closing the response from the consumer interrupts the read
+        if not stopped.is_set():
+            print( "Live preview - read failed : %s" % repr(e) )
+    finally:
+        latest.finish()
+
+def previewFrames(response, timeLimitSeconds=None, maxFrames=None, latestOnly=False):
+    """
+    Generator that splits a streaming motion jpeg response into PreviewFrame
+    objects. The response is closed when the generator finishes.
+
+    timeLimitSeconds:
+            Float (Optional) Stop after this many seconds.
+    maxFrames:
+            Integer (Optional) Stop after yielding this many frames.
+    latestOnly:
+            Boolean (Optional) Read the stream on a separate thread and only
+            yield the newest frame, dropping frames the consumer was too slow
+            to take.
+    """
+    if maxFrames is not None and maxFrames <= 0:
+        response.close()
+        return
+
+    stopped = threading.Event()
+    if latestOnly:
+        latest = _LatestFrame()
+        reader = threading.Thread(target=_readLatest, name="osc-live-preview",
+            args=(response, timeLimitSeconds, latest, stopped))
+        reader.daemon = True
+        reader.start()
+
+        def frames():
+            while True:
+                frame = latest.take()
+                if frame is None:
+                    break
+                yield frame
+    else:
+        def frames():
+            return _readFrames(response, timeLimitSeconds)
+
+    count = 0
+    try:
+        for frame in frames():
+            yield frame
+            count += 1
+            if maxFrames is not None and count >= maxFrames:
+                break
+    finally:
+        # The stream doesn't end on its own, so drop the connection
+        stopped.set()
+        response.close()
@@ -0,0 +1,135 @@
+"""
+Background writer for recording the live preview to disk.
+
+The thread reading the live preview hands each frame to a FrameRecorder,
+which queues it for a writer thread. A slow disk then only fills the queue
+instead of stalling the network reader. When the queue is full, the
+overflow policy decides what happens:
+
+  block      - wait for the writer to catch up
+  dropOldest - drop the oldest queued frame to make room
+  dropNewest - drop the new frame
+
+Usage:
+
+  from osc.recorder import FrameRecorder
+
+  recorder = FrameRecorder(maxQueued=64, overflow="dropOldest")
+  thetas.getLivePreview(timeLimitSeconds=30, recorder=recorder)
+  recorder.close()
+  print( "%d received, %d written, %d dropped" % (
+      recorder.received, recorder.written, recorder.dropped) )
+"""
+
+import collections
+import threading
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['overflowPolicies',
+           'FrameRecorder']
+
+overflowPolicies = [
+    "block",
+    "dropOldest",
+    "dropNewest"
+]
+
+class FrameRecorder(object):
+    """
+    Write frames to disk on a background thread.
+
+    maxQueued:
+            Integer Largest number of frames waiting to be written.
+    overflow:
+            String What to do with a frame when the queue is full. One of
+            overflowPolicies.
+    """
+    def __init__(self, maxQueued=64, overflow="block"):
+        if overflow not in overflowPolicies:
+            raise ValueError("Unknown overflow policy : %s" % overflow)
+
+        self.maxQueued = maxQueued
+        self.overflow = overflow
+
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._writer = threading.Thread(target=self._write, name="osc-recorder")
+        self._writer.daemon = True
+        self._writer.start()
+
+    def put(self, frame, fileName):
+        """
+        Queue a PreviewFrame to be written to fileName. Returns False if the
+        frame was dropped.
+        """
+        with self._condition:
+            self.received += 1
+            if self._closed:
+                self.dropped += 1
+                return False
+
+            if len(self._queue) >= self.maxQueued:
+                if self.overflow == "dropNewest":
+                    self.dropped += 1
+                    return False
+                elif self.overflow == "dropOldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.maxQueued and not self._closed:
+                        self._condition.wait()
+
+            self._queue.append((frame, fileName))
+            self._condition.notify_all()
+        return True
+
+    def queued(self):
+        return len(self._queue)
+
+    def _write(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    break
+                frame, fileName = self._queue.popleft()
+                self._condition.notify_all()
+
+            try:
+                frame.save(fileName)
+                self.written += 1
+            except Exception, e:
+                self.failed += 1
+                print( "Recorder - write failed : %s, %s" % (fileName, repr(e)) )
+
+    def close(self, wait=True):
+        """
+        Stop accepting frames. The frames already queued are still written;
+        with wait, this returns once they are.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self._writer.join()
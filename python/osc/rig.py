@@ -0,0 +1,230 @@
+"""
+Synchronized capture across a rig of Open Spherical Cameras.
+
+A CameraRig holds one worker thread per camera. To trigger the rig, every
+worker is armed with its command and waits on a shared start signal, so all
+of the requests leave as close together as possible instead of one after
+the other. The time each request was sent and acknowledged is recorded,
+along with the resulting skew across the rig.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.rig import CameraRig
+  from osc.theta import RicohThetaS
+
+After you import the library, you can use the commands like this:
+
+  rig = CameraRig([RicohThetaS("192.168.1.1"), RicohThetaS("192.168.1.2")])
+
+  # Capture an image on every camera
+  trigger = rig.takePicture()
+  print( "Trigger skew : %2.4f seconds" % trigger.triggerSkew() )
+
+  # Wait for the stitching to finish on all of the cameras
+  rig.waitForProcessing(trigger)
+
+  # Capture video
+  rig.startCapture()
+  rig.stopCapture()
+
+  rig.close()
+"""
+
+import threading
+import timeit
+
+from pool import WorkerPool
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['CameraTrigger',
+           'RigTrigger',
+           'CameraRig']
+
+#
+# Trigger results
+#
+class CameraTrigger(object):
+    """
+    The outcome of sending one command to one camera of the rig.
+
+    sent and acknowledged are timeit.default_timer() values taken just
+    before the request was sent and just after the response arrived.
+    finished is set by CameraRig.waitForProcessing.
+    """
+    def __init__(self, camera):
+        self.camera = camera
+        self.response = None
+        self.error = None
+        self.sent = None
+        self.acknowledged = None
+        self.finished = None
+        self.state = None
+
+    def commandId(self):
+        if self.response and 'id' in self.response:
+            return self.response['id']
+        return None
+
+    def latency(self):
+        if self.sent is None or self.acknowledged is None:
+            return None
+        return self.acknowledged - self.sent
+
+class RigTrigger(object):
+    """
+    The outcome of sending one command to every camera of the rig.
+    """
+    def __init__(self, name, results):
+        self.name = name
+        self.results = results
+
+    def _spread(self, values):
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        return max(values) - min(values)
+
+    def triggerSkew(self):
+        """
+        Seconds between the first and the last request being sent.
+        """
+        return self._spread([result.sent for result in self.results])
+
+    def acknowledgeSkew(self):
+        """
+        Seconds between the first and the last response arriving.
+        """
+        return self._spread([result.acknowledged for result in self.results])
+
+    def finishSkew(self):
+        """
+        Seconds between the first and the last camera finishing processing.
+        """
+        return self._spread([result.finished for result in self.results])
+
+    def succeeded(self):
+        return all(result.response is not None for result in self.results)
+
+    def report(self):
+        print( "%s - trigger skew : %s, acknowledge skew : %s" % (
+            self.name, self.triggerSkew(), self.acknowledgeSkew()) )
+        t0 = min([result.sent for result in self.results if result.sent is not None] or [0])
+        for i, result in enumerate(self.results):
+            if result.sent is None:
+                print( "%d - not sent : %s" % (i, repr(result.error)) )
+            else:
+                print( "%d - sent : +%2.4f, acknowledged : +%2.4f" % (i,
+                    result.sent - t0, result.acknowledged - t0) )
+
+#
+# Rig
+#
+class CameraRig(object):
+    """
+    Fan commands out to a list of cameras concurrently.
+    """
+    def __init__(self, cameras):
+        self.cameras = list(cameras)
+        self._pool = WorkerPool(workers=len(self.cameras))
+        self._lock = threading.Lock()
+
+    def _arm(self, result, function, args, armed, ready, go):
+        # Signal that this worker is ready, then wait for every other one
+        with armed:
+            ready.append(result)
+            armed.notify_all()
+        go.wait()
+
+        result.sent = timeit.default_timer()
+        try:
+            result.response = function(*args)
+        except Exception, e:
+            result.error = e
+        result.acknowledged = timeit.default_timer()
+        return result
+
+    def trigger(self, name, *args):
+        """
+        Call the named method on every camera at the same time and return a
+        RigTrigger with the responses and timings.
+        """
+        with self._lock:
+            armed = threading.Condition()
+            ready = []
+            go = threading.Event()
+
+            results = []
+            futures = []
+            for camera in self.cameras:
+                result = CameraTrigger(camera)
+                results.append(result)
+                futures.append(self._pool.submit(self._arm, result,
+                    getattr(camera, name), args, armed, ready, go))
+
+            # Release all of the workers once they are all waiting
+            with armed:
+                while len(ready) < len(self.cameras):
+                    armed.wait()
+            go.set()
+
+            for future in futures:
+                future.result()
+
+        return RigTrigger(name, results)
+
+    def takePicture(self):
+        return self.trigger("takePicture")
+
+    def startCapture(self):
+        """
+        Start video capture on every camera. The cameras must support
+        _startCapture, for example RicohThetaS.
+        """
+        return self.trigger("startCapture")
+
+    def stopCapture(self):
+        """
+        Stop video capture on every camera. The cameras must support
+        _stopCapture, for example RicohThetaS.
+        """
+        return self.trigger("stopCapture")
+
+    def _wait(self, result, maxWait):
+        commandId = result.commandId()
+        if commandId is not None and result.response.get('state') != "done":
+            if result.camera.waitForProcessing(commandId, maxWait) is not None:
+                result.state = "done"
+            else:
+                result.state = result.camera.status(commandId)
+        elif result.response is not None:
+            result.state = result.response.get('state')
+        result.finished = timeit.default_timer()
+        return result
+
+    def waitForProcessing(self, rigTrigger, maxWait=20):
+        """
+        Wait for the commands of a RigTrigger to finish processing on all of
+        the cameras at once. Sets the state and finished time of each result.
+        """
+        futures = [self._pool.submit(self._wait, result, maxWait)
+            for result in rigTrigger.results]
+        for future in futures:
+            future.result()
+        return rigTrigger
+
+    def close(self):
+        self._pool.shutdown()
@@ -0,0 +1,348 @@
+"""
+Scheduling of the commands sent to a camera.
+
+A camera handles one command at a time, and answers serviceUnavailable (503)
+or cameraInExclusiveUse while it is busy, for example while an image is
+stitching. Every OpenSphericalCamera sends its calls through a
+CommandScheduler, which
+
+  - sends one call to the camera at a time, in order of priority, so a
+    takePicture goes ahead of listings and downloads that are waiting,
+  - sends a call again after a jittered, exponentially growing delay when
+    the camera answers that it is busy,
+  - gives up on a call whose deadline passed while it was waiting.
+
+Streamed calls, like downloads and the live preview, only hold the camera
+until the headers of their response arrive, so other commands can be sent
+while the body is read.
+
+Usage:
+
+  from osc.scheduler import CommandScheduler
+  from osc.theta import RicohThetaS
+
+  thetas = RicohThetaS()
+  scheduler = thetas.getScheduler()
+  scheduler.setPriority("camera._listAll", 2)
+  scheduler.setDeadline("camera.takePicture", 5)
+"""
+
+import heapq
+import json
+import random
+import threading
+import time
+import timeit
+
+from errors import OSCTimeout
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['g_commandPriorities',
+           'g_commandTimeouts',
+           'g_retryErrorCodes',
+           'DeadlineExceeded',
+           'CommandScheduler']
+
+#
+# Priorities
+#
+'''
+Lower numbers are sent first. Commands that aren't listed have priority 1.
+Captures go ahead of everything else, while listings and downloads, which
+can take a long time and are rarely urgent, wait for the other commands.
+'''
+g_commandPriorities = {
+    "camera.takePicture"       : 0,
+    "camera.startCapture"      : 0,
+    "camera.stopCapture"       : 0,
+    "camera._startCapture"     : 0,
+    "camera._stopCapture"      : 0,
+    "camera._bublCaptureVideo" : 0,
+    "commands/_bublStop"       : 0,
+    "camera.listImages"        : 2,
+    "camera.listFiles"         : 2,
+    "camera._listAll"          : 2,
+    "camera.getImage"          : 2,
+    "camera._getVideo"         : 2,
+    "camera.getMetadata"       : 2,
+    "_bublGetImage"            : 2
+    }
+
+'''
+(connect, read) timeouts, in seconds, for the commands that need longer than
+the transport's. The read timeout is the longest wait between two bytes of the
+response, not for the whole response.
+'''
+g_commandTimeouts = {
+    "_bublUpdate"              : (5.0, 300.0)
+    }
+
+'''
+OSC error codes that mean the camera didn't run the command because it was
+busy, so the command can safely be sent again.
+'''
+g_retryErrorCodes = [
+    "serviceUnavailable",
+    "cameraInExclusiveUse"
+    ]
+
+class DeadlineExceeded(OSCTimeout):
+    """
+    A call couldn't be sent to the camera before its deadline.
+    """
+    pass
+
+#
+# Scheduler
+#
+class CommandScheduler(object):
+    """
+    Send the calls of one camera one at a time, in order of priority,
+    retrying the calls the camera was too busy to run.
+
+    transport:
+            HTTPTransport The transport the calls are sent through.
+    maxRetries:
+            Integer Number of times a call is sent again while the camera is
+            busy.
+    baseDelay:
+            Float Delay before the first retry, in seconds. The delay doubles
+            with every retry.
+    maxDelay:
+            Float Longest delay between two retries, in seconds.
+    deadline:
+            Float (Optional) Default number of seconds a call may take, from
+            when it is scheduled to when the camera accepts it, including
+            waiting for other calls and retries. None waits as long as it
+            takes.
+
+    Used like an HTTPTransport. request, get and post also take a priority
+    and a deadline, which default to the ones set for the command, and
+    serialize, which can be set to False for calls, like long polls, that
+    shouldn't hold up the other commands. Calls without a timeout use the one
+    set for the command, or the transport's.
+    """
+    def __init__(self, transport, maxRetries=5, baseDelay=0.25, maxDelay=4.0,
+        deadline=None):
+        self.transport = transport
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.deadline = deadline
+
+        self._priorities = dict(g_commandPriorities)
+        self._deadlines = {}
+        self._timeouts = dict(g_commandTimeouts)
+
+        self._condition = threading.Condition()
+        self._busy = False
+        # (priority, sequence) of the calls waiting for the camera
+        self._waiting = []
+        self._sequence = 0
+
+        # A metrics.CommandMetrics, when calls are being measured
+        self.metrics = None
+
+        self.calls = 0
+        self.retries = 0
+        self.expired = 0
+
+    def setPriority(self, command, priority):
+        """
+        Set the priority of a command, by its name, like camera.takePicture,
+        or by its path below /osc/ for calls that aren't sent through
+        commands/execute. Lower numbers are sent first.
+        """
+        self._priorities[command] = priority
+
+    def setDeadline(self, command, deadline):
+        """
+        Set the deadline of a command, in seconds. Use None to go back to the
+        default deadline.
+        """
+        if deadline is None:
+            self._deadlines.pop(command, None)
+        else:
+            self._deadlines[command] = deadline
+
+    def setTimeout(self, command, timeout):
+        """
+        Set the timeout of a command, either a number of seconds or a
+        (connect, read) tuple, as passed to requests. Use None to go back to
+        the transport's timeout.
+        """
+        if timeout is None:
+            self._timeouts.pop(command, None)
+        else:
+            self._timeouts[command] = timeout
+
+    def longPollTimeout(self, waitTimeout):
+        """
+        The timeout for a call the camera may hold for waitTimeout seconds
+        before answering. The read timeout is extended by waitTimeout.
+        """
+        timeout = self.transport.timeout()
+        if timeout is None:
+            return None
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        connectTimeout, readTimeout = timeout
+        if readTimeout is None:
+            return timeout
+        return (connectTimeout, readTimeout + waitTimeout)
+
+    def waiting(self):
+        """
+        The number of calls waiting for the camera.
+        """
+        return len(self._waiting)
+
+    def timeout(self):
+        return self.transport.timeout()
+
+    def close(self):
+        self.transport.close()
+
+    @staticmethod
+    def commandName(url, data=None):
+        """
+        The name of the command sent by a call, or the path of the call below
+        /osc/ for calls that aren't sent through commands/execute.
+        """
+        path = (url or "").split("/osc/", 1)[-1]
+        if path == "commands/execute" and data:
+            try:
+                return json.loads(data)["name"]
+            except (ValueError, KeyError, TypeError):
+                pass
+        elif path.startswith("_bublGetImage/"):
+            return "_bublGetImage"
+        return path
+
+    def _acquire(self, priority, expires):
+        with self._condition:
+            self._sequence += 1
+            ticket = (priority, self._sequence)
+            if not self._busy and not self._waiting:
+                self._busy = True
+                return
+
+            heapq.heappush(self._waiting, ticket)
+            while self._busy or self._waiting[0] != ticket:
+                wait = None
+                if expires is not None:
+                    wait = expires - timeit.default_timer()
+                    if wait <= 0:
+                        self._waiting.remove(ticket)
+                        heapq.heapify(self._waiting)
+                        self._condition.notify_all()
+                        self.expired += 1
+                        raise DeadlineExceeded(
+                            "Call waited past its deadline for the camera")
+                self._condition.wait(wait)
+            heapq.heappop(self._waiting)
+            self._busy = True
+
+    def _release(self):
+        with self._condition:
+            self._busy = False
+            self._condition.notify_all()
+
+    def _busyResponse(self, response):
+        """
+        Whether the camera answered that it was too busy to run the call.
+        """
+        if response.status_code == 503:
+            return True
+        if response.status_code < 400:
+            return False
+        try:
+            error = response.json().get('error') or {}
+        except Exception:
+            return False
+        return error.get('code') in g_retryErrorCodes
+
+    def retryDelay(self, retry):
+        """
+        Seconds to wait before retry number retry, counting from 0. Also used
+        to space out the attempts of an interrupted download.
+        """
+        # Half of the delay is fixed and half is random, so that calls that
+        # failed together don't retry together
+        delay = min(self.maxDelay, self.baseDelay * (2 ** retry))
+        return delay * (0.5 + 0.5 * random.random())
+
+    def request(self, method, url, priority=None, deadline=None, serialize=True,
+        **kwargs):
+        command = self.commandName(url, kwargs.get('data'))
+        if 'timeout' not in kwargs and command in self._timeouts:
+            kwargs['timeout'] = self._timeouts[command]
+        if not serialize:
+            return self._send(command, method, url, kwargs)
+
+        if priority is None:
+            priority = self._priorities.get(command, 1)
+        if deadline is None:
+            deadline = self._deadlines.get(command, self.deadline)
+        expires = None
+        if deadline is not None:
+            expires = timeit.default_timer() + deadline
+
+        retry = 0
+        while True:
+            self._acquire(priority, expires)
+            try:
+                self.calls += 1
+                response = self._send(command, method, url, kwargs)
+            finally:
+                self._release()
+
+            if retry >= self.maxRetries or not self._busyResponse(response):
+                return response
+
+            delay = self.retryDelay(retry)
+            if expires is not None and timeit.default_timer() + delay > expires:
+                # Let the caller see the busy response rather than wait past
+                # the deadline
+                return response
+            response.close()
+            retry += 1
+            self.retries += 1
+            time.sleep(delay)
+
+    def _send(self, command, method, url, kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return self.transport.request(method, url, **kwargs)
+
+        bytesSent = len(kwargs.get('data') or "")
+        t0 = timeit.default_timer()
+        try:
+            response = self.transport.request(method, url, **kwargs)
+        except Exception, e:
+            metrics.observeException(command, timeit.default_timer() - t0, e,
+                bytesSent)
+            raise
+        metrics.observeResponse(command, timeit.default_timer() - t0, response,
+            kwargs.get('stream', False), bytesSent)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+# CommandScheduler
@@ -46,10 +46,10 @@ After you import the library, you can use the commands like this:
 """
 
 import json
-import requests
-import timeit
 
 import osc
+from download import SegmentedDownload
+from listing import listingEntries
 
 __author__ = 'Haarm-Pieter Duiker'
 __copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
@@ -66,6 +66,7 @@ __version__ = '.'.join((__major_version__,
                         __change_version__))
 
 __all__ = ['g_ricohOptions',
+           'g_ricohVolatileOptions',
            'ricohFileFormats',
            'RicohThetaS']
 
@@ -100,6 +101,10 @@ g_ricohOptions = [
             "_shutterVolumeSupport"
             ]
 
+g_ricohVolatileOptions = [
+            "_remainingVideos"
+            ]
+
 ricohFileFormats = {
     "image_5k" : {'width': 5376, 'type': 'jpeg', 'height': 2688},
     "image_2k" : {'width': 2048, 'type': 'jpeg', 'height': 1024},
@@ -110,13 +115,17 @@ ricohFileFormats = {
 class RicohThetaS(osc.OpenSphericalCamera):
     # Class variables / methods
     ricohOptions = g_ricohOptions
+    ricohVolatileOptions = g_ricohVolatileOptions
 
-    def __init__(self, ip_base="192.168.1.1", httpPort=80):
-        osc.OpenSphericalCamera.__init__(self, ip_base, httpPort)
+    def __init__(self, ip_base="192.168.1.1", httpPort=80, transport=None):
+        osc.OpenSphericalCamera.__init__(self, ip_base, httpPort, transport)
 
     def getOptionNames(self):
         return self.oscOptions + self.ricohOptions
 
+    def getVolatileOptionNames(self):
+        return self.oscVolatileOptions + self.ricohVolatileOptions
+
     # 'image', '_video'
     def setCaptureMode(self, mode):
         return self.setOption("captureMode", mode)
@@ -124,7 +133,8 @@ class RicohThetaS(osc.OpenSphericalCamera):
     def getCaptureMode(self):
         return self.getOption("captureMode")
 
-    def listAll(self, entryCount = 3, detail = False, sortType = "newest", ):
+    def listAll(self, entryCount = 3, detail = False, sortType = "newest", 
+        continuationToken = None, stream = False):
         """
         entryCount:
                 Integer No. of still images and video files to be acquired
@@ -136,20 +146,34 @@ class RicohThetaS(osc.OpenSphericalCamera):
                 String  (Optional) Specify the sort order
                 newest (dateTime descending order)/ oldest (dateTime ascending order)
                 Default is newest
+        continuationToken
+                String (Optional) An opaque continuation token returned by
+                a previous listAll call, used to retrieve the next entries.
+        stream:
+                Boolean (Optional) Return a StreamedListing that parses the
+                entries as the response is read, instead of the whole
+                response.
 
         Reference:
         https://developers.theta360.com/en/docs/v2/api_reference/commands/camera._list_all.html
         """
-        url = self._request("commands/execute")
-        body = json.dumps({"name": "camera._listAll",
-             "parameters": {
+        parameters = {
                 "entryCount": entryCount,
                 "detail": detail,
                 "sort": sortType
              }
+        if continuationToken is not None:
+            parameters['continuationToken'] = continuationToken
+
+        url = self._request("commands/execute")
+        body = json.dumps({"name": "camera._listAll",
+             "parameters": parameters
              })
+        if stream:
+            return self._streamListing(url, body)
+
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -161,6 +185,33 @@ class RicohThetaS(osc.OpenSphericalCamera):
             response = None
         return response
 
+    def iterAll(self, pageSize=20, detail=False, sortType="newest", 
+        strict=False):
+        """
+        Generator that yields the entry of every still image and video file
+        on the camera as a ListEntry, paging through listAll. The responses
+        are parsed as they are read, so only one entry is held in memory at
+        a time.
+
+        pageSize:
+                Integer (Optional) No. of entries requested per call.
+        detail:
+                Boolean (Optional) Whether or not file details are acquired.
+        sortType:
+                String (Optional) newest or oldest first.
+        strict:
+                Boolean (Optional) Raise IOError when a listing call fails
+                instead of ending the listing.
+
+        Reference:
+        https://developers.theta360.com/en/docs/v2/api_reference/commands/camera._list_all.html
+        """
+        def listPage(entryCount, continuationToken):
+            return self.listAll(entryCount, detail, sortType, continuationToken,
+                stream=True)
+
+        return listingEntries(listPage, pageSize, strict)
+
     def finishWlan(self):
         """
         Turns the wireless LAN off.
@@ -175,7 +226,7 @@ class RicohThetaS(osc.OpenSphericalCamera):
              }
              })
         try:
-             req = requests.post(url, data=body)
+             req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
@@ -205,13 +256,13 @@ class RicohThetaS(osc.OpenSphericalCamera):
              }
              })
         try:
-             req = requests.post(url, data=body)
+             req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
 
         if req.status_code == 200:
-            response = req.json()
+            response = self._commandFuture(req.json())
         else:
             self._oscError(req)
             response = None
@@ -232,19 +283,20 @@ class RicohThetaS(osc.OpenSphericalCamera):
              }
              })
         try:
-            req = requests.post(url, data=body)
+            req = self._scheduler.post(url, data=body)
         except Exception, e:
             self._httpError(e)
             return None
 
         if req.status_code == 200:
-            response = req.json()
+            response = self._commandFuture(req.json())
         else:
             self._oscError(req)
             response = None
         return response
 
-    def getVideo(self, fileUri, imageType="full"):
+    def getVideo(self, fileUri, imageType="full", fileName=None, chunkSize=65536,
+        retries=2, connections=1):
         """
         Transfer the video file from the camera to computer and save the
         binary data to local storage.  This works, but is clunky.
@@ -252,36 +304,98 @@ class RicohThetaS(osc.OpenSphericalCamera):
         can be set to "thumb" for a thumbnail or "full" for the
         full-size video.  The default is "full".
 
+        The data is written to fileName + ".part" and moved into place once
+        complete. An interrupted transfer resumes from the end of the .part
+        file, on the next attempt or the next call.
+
+        fileName:
+                String (Optional) Where to save the file. Defaults to the 
+                name of the file in the current directory.
+        chunkSize:
+                Integer (Optional) Size of the blocks read from the camera.
+        retries:
+                Integer (Optional) Number of times an interrupted transfer is
+                resumed before giving up.
+        connections:
+                Integer (Optional) Fetch the file as byte ranges over this 
+                many connections at once. See download.SegmentedDownload. 
+                Falls back to a single connection if the camera doesn't 
+                honor range requests. The transport's pool is grown to hold
+                a connection for each.
+
         Reference:
         https://developers.theta360.com/en/docs/v2/api_reference/commands/camera._get_video.html
         """
         acquired = False
         if fileUri:
-            url = self._request("commands/execute")
-            body = json.dumps({"name": "camera._getVideo",
-                 "parameters": {
-                    "fileUri": fileUri,
-                    "type": imageType
-                 }
-                 })
-            fileName = fileUri.split("/")[1]
-
-            try:
-                response = requests.post(url, data=body, stream=True)
-            except Exception, e:
-                self._httpError(e)
-                return acquired
-
-            if response.status_code == 200:
-                with open(fileName, 'wb') as handle:
-                    for block in response.iter_content(1024):
-                        handle.write(block)
-                acquired = True
-            else:
-                self._oscError(req)
+            if fileName is None:
+                fileName = self._fileName(fileUri)
+
+            fileUrl = self._fileUrl(fileUri) if imageType == "full" else None
+            def send(headers):
+                if fileUrl:
+                    return self._scheduler.get(fileUrl, headers=headers, stream=True)
+                return self._getVideoResponse(fileUri, imageType, headers)
+
+            if connections > 1:
+                # A connection for each segment fetched at the same time
+                growPool = getattr(self._transport, 'growPool', None)
+                if growPool is not None:
+                    growPool(connections)
+                acquired = SegmentedDownload(send, fileName, connections, 
+                    chunkSize=chunkSize).run()
+                if acquired:
+                    # An earlier single stream download is no longer needed
+                    self._removePart(fileName + ".part")
+                if acquired is not None:
+                    return acquired
+
+            acquired = self._downloadFile(send, fileName, chunkSize, retries)
 
         return acquired
 
+    def iterVideo(self, fileUri, imageType="full", chunkSize=65536):
+        """
+        Generator that yields the binary data of the named video file in 
+        blocks of up to chunkSize bytes instead of writing it to local
+        storage. Nothing is yielded if the request fails.
+
+        Reference:
+        https://developers.theta360.com/en/docs/v2/api_reference/commands/camera._get_video.html
+        """
+        if not fileUri:
+            return
+
+        response = self._getVideoResponse(fileUri, imageType)
+        if response is None:
+            return
+
+        if response.status_code == 200:
+            for block in response.iter_content(chunkSize):
+                yield block
+        else:
+            self._streamError(response)
+
+    def _getVideoResponse(self, fileUri, imageType, headers=None):
+        """
+        Send the _getVideo command and return the streaming response, or None
+        if the request could not be sent.
+        """
+        url = self._request("commands/execute")
+        body = json.dumps({"name": "camera._getVideo",
+             "parameters": {
+                "fileUri": fileUri,
+                "type": imageType
+             }
+             })
+        try:
+            response = self._scheduler.post(url, data=body, headers=headers, 
+                stream=True)
+        except Exception, e:
+            self._httpError(e)
+            return None
+        return response
+
     def getLatestVideo(self, imageType="full"):
         """
         Transfer the latest file from the camera to computer and save the
@@ -293,19 +407,66 @@ class RicohThetaS(osc.OpenSphericalCamera):
         if fileUri:
             self.getVideo(fileUri, imageType)
 
-    def getLivePreview(self, fileNamePrefix = "livePreview", timeLimitSeconds=10):
+    def getLivePreview(self, fileNamePrefix = "livePreview", timeLimitSeconds=10,
+        recorder=None):
         """
         Save the live preview video stream to disk as a series of jpegs. 
         The capture mode must be 'image'.
 
-        Credit for jpeq decoding:
-        https://stackoverflow.com/questions/21702477/how-to-parse-mjpeg-http-stream-from-ip-camera
+        recorder:
+                FrameRecorder (Optional) Hand the frames to a background 
+                writer instead of writing them while reading the stream.
 
         Reference:
         https://developers.theta360.com/en/docs/v2/api_reference/commands/camera._get_live_preview.html
         """
         acquired = False
 
+        response = self._livePreviewResponse()
+        if response is None:
+            return acquired
+
+        if response.status_code == 200:
+            self._savePreview(response, fileNamePrefix, timeLimitSeconds, recorder)
+
+            acquired = True
+        else:
+            self._streamError(response)
+
+        return acquired
+
+    def iterLivePreview(self, timeLimitSeconds=None, maxFrames=None, latestOnly=False):
+        """
+        Generator that yields the live preview video stream as a series of 
+        PreviewFrame objects, held in memory. The capture mode must be 'image'.
+
+        timeLimitSeconds:
+                Float (Optional) Stop after this many seconds.
+        maxFrames:
+                Integer (Optional) Stop after this many frames.
+        latestOnly:
+                Boolean (Optional) Only yield the newest frame, dropping 
+                frames when the consumer is slower than the camera.
+
+        Reference:
+        https://developers.theta360.com/en/docs/v2/api_reference/commands/camera._get_live_preview.html
+        """
+        response = self._livePreviewResponse()
+        if response is None:
+            return
+
+        if response.status_code == 200:
+            for frame in self._previewFrames(response, timeLimitSeconds, 
+                maxFrames, latestOnly):
+                yield frame
+        else:
+            self._streamError(response)
+
+    def _livePreviewResponse(self):
+        """
+        Send the _getLivePreview command and return the streaming response, 
+        or None if the request could not be sent.
+        """
         url = self._request("commands/execute")
         body = json.dumps({"name": "camera._getLivePreview",
                 "parameters": {
@@ -313,46 +474,11 @@ class RicohThetaS(osc.OpenSphericalCamera):
                  }})
 
         try:
-            response = requests.post(url, data=body, stream=True)
+            response = self._scheduler.post(url, data=body, stream=True)
         except Exception, e:
             self._httpError(e)
-            return acquired
-
-        if response.status_code == 200:
-            bytes=''
-            t0 = timeit.default_timer()
-            i = 0
-            for block in response.iter_content(16384):
-                bytes += block
-
-                # Search the current block of bytes for the jpq start and end
-                a = bytes.find('\xff\xd8')
-                b = bytes.find('\xff\xd9')
-
-                # If you have a jpg, write it to disk
-                if a !=- 1 and b != -1:
-                    #print( "Writing frame %04d - Byte range : %d to %d" % (i, a, b) )
-                    # Found a jpg, write to disk
-                    frameFileName = "%s.%04d.jpg" % (fileNamePrefix, i)
-                    with open(frameFileName, 'wb') as handle:
-                        jpg = bytes[a:b+2]
-                        handle.write(jpg)
-
-                        # Reset the buffer to point to the next set of bytes
-                        bytes = bytes[b+2:]
-                        #print( "Wrote frame %04d - %2.2f seconds" % (i, elapsed) )
-
-                    i += 1
-
-                t1 = timeit.default_timer()
-                elapsed = t1 - t0
-                if elapsed > timeLimitSeconds:
-                    #print( "Breaking" )
-                    break
-
-            acquired = True
-        else:
-            self._oscError(response)
+            return None
+        return response
 # RicohThetaS
 
 
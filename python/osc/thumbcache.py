@@ -0,0 +1,300 @@
+"""
+A cache for the thumbnails of the files on a camera.
+
+ThumbnailCache keeps thumbnails in a memory tier and, optionally, an on-disk
+tier, each bounded in size and evicting the least recently used thumbnail
+first. Thumbnails are keyed by fileUri, thumbnail size and the dateTime and
+size of the file, so a file that is replaced on the camera misses the cache
+instead of returning a stale thumbnail.
+
+Once a camera has a cache, iterImages(includeThumb=True) lists without
+thumbnails and fills them in from the cache. The camera is only asked for
+the thumbnails of a page when some of them are missing.
+getImage(imageType="thumb") isn't cached, as it doesn't know the dateTime and
+size of the file the key needs.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.thumbcache import ThumbnailCache
+
+After you import the library, you can use the commands like this:
+
+  thetas = RicohThetaS()
+  thetas.setThumbnailCache(ThumbnailCache("/data/theta/thumbnails"))
+
+  # The first pass fetches the thumbnails, the second reads them from
+  # the cache
+  for i in range(2):
+      for entry in thetas.iterImages(pageSize=50, includeThumb=True):
+          data = entry.thumbnail()
+"""
+
+import base64
+import collections
+import hashlib
+import json
+import os
+import threading
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['ThumbnailCache']
+
+class ThumbnailCache(object):
+    """
+    A two tier, least recently used cache of thumbnail jpegs.
+
+    directory:
+            String (Optional) Where the on-disk tier is kept. Without it,
+            only the memory tier is used.
+    memoryBytes:
+            Integer Largest number of bytes of thumbnails held in memory.
+    diskBytes:
+            Integer Largest number of bytes of thumbnails kept on disk.
+
+    The cache can be shared between threads and cameras. The on-disk tier
+    is kept between runs, with the file modification times recording the
+    order of use.
+    """
+    def __init__(self, directory=None, memoryBytes=8388608, diskBytes=268435456):
+        self.directory = directory
+        self.memoryBytes = memoryBytes
+        self.diskBytes = diskBytes
+
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()
+        self._memoryUsed = 0
+        self._disk = collections.OrderedDict()
+        self._diskUsed = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        if directory:
+            self._loadDirectory()
+
+    def _loadDirectory(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".jpg"):
+                continue
+            path = os.path.join(self.directory, name)
+            files.append((os.path.getmtime(path), name[:-4], os.path.getsize(path)))
+
+        # Least recently used first
+        for mtime, key, size in sorted(files):
+            self._disk[key] = size
+            self._diskUsed += size
+        with self._lock:
+            self._evictDisk()
+
+    @staticmethod
+    def key(fileUri, maxSize=None, dateTime=None, size=None):
+        return hashlib.sha1(json.dumps([fileUri, maxSize, dateTime, size])).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".jpg")
+
+    def _evictMemory(self):
+        while self._memoryUsed > self.memoryBytes and self._memory:
+            key, data = self._memory.popitem(last=False)
+            self._memoryUsed -= len(data)
+
+    def _evictDisk(self):
+        while self._diskUsed > self.diskBytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._diskUsed -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _remember(self, key, data):
+        if len(data) > self.memoryBytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memoryUsed -= len(previous)
+        self._memory[key] = data
+        self._memoryUsed += len(data)
+        self._evictMemory()
+
+    def get(self, fileUri, maxSize=None, dateTime=None, size=None):
+        """
+        The cached thumbnail jpeg data, or None.
+        """
+        key = self.key(fileUri, maxSize, dateTime, size)
+        with self._lock:
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory[key] = data
+                self.hits += 1
+                return data
+            onDisk = key in self._disk
+            if onDisk:
+                self._disk[key] = self._disk.pop(key)
+
+        data = None
+        if onDisk:
+            try:
+                with open(self._path(key), 'rb') as handle:
+                    data = handle.read()
+                os.utime(self._path(key), None)
+            except (IOError, OSError):
+                # Evicted by another thread in the meantime
+                data = None
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, data)
+        return data
+
+    def put(self, fileUri, data, maxSize=None, dateTime=None, size=None):
+        """
+        Add the thumbnail jpeg data of a file to the cache.
+        """
+        if not data:
+            return
+        key = self.key(fileUri, maxSize, dateTime, size)
+        with self._lock:
+            self._remember(key, data)
+            if not self.directory or key in self._disk or len(data) > self.diskBytes:
+                return
+            # Reserve the space, so concurrent puts evict for each other
+            self._disk[key] = len(data)
+            self._diskUsed += len(data)
+            self._evictDisk()
+
+        # Write through a temporary file, so a reader never sees a partial
+        # thumbnail
+        path = self._path(key)
+        temporary = "%s.%d.tmp" % (path, threading.current_thread().ident)
+        try:
+            with open(temporary, 'wb') as handle:
+                handle.write(data)
+            os.rename(temporary, path)
+        except (IOError, OSError), e:
+            print( "Thumbnail cache - write failed : %s" % repr(e) )
+            with self._lock:
+                if self._disk.pop(key, None) is not None:
+                    self._diskUsed -= len(data)
+
+    def getEntry(self, entry, maxSize=None):
+        """
+        The cached thumbnail of a listing entry, or None.
+        """
+        return self.get(entry["uri"], maxSize, entry.get("dateTime"), entry.get("size"))
+
+    def putEntry(self, entry, maxSize=None):
+        """
+        Add the thumbnail included in a listing entry to the cache.
+        """
+        data = entry.thumbnail()
+        if data:
+            self.put(entry["uri"], data, maxSize, entry.get("dateTime"),
+                entry.get("size"))
+
+    def memoryUsed(self):
+        return self._memoryUsed
+
+    def diskUsed(self):
+        return self._diskUsed
+
+    def clear(self):
+        """
+        Remove every thumbnail from both tiers.
+        """
+        with self._lock:
+            keys = self._disk.keys()
+            self._memory.clear()
+            self._memoryUsed = 0
+            self._disk.clear()
+            self._diskUsed = 0
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def listing(self, listing, maxSize, listWithThumbnails):
+        """
+        Wrap a StreamedListing, sent without thumbnails, so that its entries
+        carry their thumbnails from the cache.
+
+        listWithThumbnails:
+                Function that sends the same listing call with thumbnails
+                and returns a StreamedListing, or None. Only called when
+                some of the thumbnails of the page are missing.
+        """
+        return CachedThumbnailListing(self, listing, maxSize, listWithThumbnails)
+
+class CachedThumbnailListing(object):
+    """
+    A page of a listing whose thumbnails come from a ThumbnailCache. Used
+    like a StreamedListing. Created by ThumbnailCache.listing.
+    """
+    def __init__(self, cache, listing, maxSize, listWithThumbnails):
+        self._cache = cache
+        self._listing = listing
+        self._maxSize = maxSize
+        self._listWithThumbnails = listWithThumbnails
+
+    def _fetchMissing(self, missing):
+        """
+        Fill in the missing thumbnails from a listing that includes them.
+        """
+        listing = self._listWithThumbnails()
+        if listing is None:
+            return
+        try:
+            for entry in listing.entries():
+                target = missing.get(entry["uri"])
+                if target is not None and entry.hasThumbnail():
+                    target["thumbnail"] = entry["thumbnail"]
+                    self._cache.putEntry(entry, self._maxSize)
+        finally:
+            listing.close()
+
+    def entries(self):
+        # The entries of a page without thumbnails are small, so the page is
+        # read as a whole to find out which thumbnails are missing
+        entries = list(self._listing.entries())
+
+        missing = {}
+        for entry in entries:
+            data = self._cache.getEntry(entry, self._maxSize)
+            if data is None:
+                missing[entry["uri"]] = entry
+            else:
+                entry["thumbnail"] = base64.b64encode(data)
+        if missing:
+            self._fetchMissing(missing)
+
+        for entry in entries:
+            yield entry
+
+    def response(self):
+        return self._listing.response()
+
+    def close(self):
+        self._listing.close()
+# ThumbnailCache
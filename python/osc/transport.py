@@ -0,0 +1,166 @@
+"""
+HTTP transport used to send commands to an Open Spherical Camera.
+
+Every OpenSphericalCamera owns a transport and routes all of its calls
+through it. The transport wraps a single requests.Session, so commands
+reuse a pool of keep-alive connections instead of paying for a new TCP
+handshake on every call.
+
+Usage:
+
+  from osc.transport import HTTPTransport
+  from osc.theta import RicohThetaS
+
+  transport = HTTPTransport(poolSize=2, connectTimeout=2, readTimeout=10)
+  thetas = RicohThetaS(transport=transport)
+"""
+
+import re
+import socket
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import HTTPConnection
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['g_defaultSocketOptions',
+           'parseContentRange',
+           'HTTPTransport']
+
+#
+# Socket options
+#
+'''
+Nagle is already disabled by urllib3. Keep-alive probes are added so that a
+camera that silently drops off the Wi-Fi network is noticed on idle pooled
+connections.
+'''
+g_defaultSocketOptions = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    ]
+
+class SocketOptionsAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies a list of socket options to every new connection
+    in its pool.
+    """
+    def __init__(self, socketOptions=None, **kwargs):
+        self._socketOptions = socketOptions
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._socketOptions is not None:
+            kwargs['socket_options'] = self._socketOptions
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+
+#
+# Ranges
+#
+_contentRangePattern = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)|bytes\s+\*/(\d+)')
+
+def parseContentRange(contentRange):
+    """
+    Parse a Content-Range header into (first byte, last byte, total size).
+    The byte positions are None for an unsatisfied range.
+    """
+    if not contentRange:
+        return None
+    match = _contentRangePattern.match(contentRange.strip())
+    if not match:
+        return None
+    if match.group(4):
+        return (None, None, int(match.group(4)))
+    return (int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+#
+# Transport
+#
+class HTTPTransport(object):
+    """
+    A pooled, keep-alive HTTP session owned by a single camera.
+
+    poolSize:
+            Integer Maximum number of connections kept open to the camera.
+            Use more than one when commands are sent from several threads,
+            for example while a live preview is streaming.
+    connectTimeout:
+            Float (Optional) Seconds to wait for a connection to be made.
+            None waits forever.
+    readTimeout:
+            Float (Optional) Seconds to wait between bytes of a response.
+            None waits forever. Long polls extend it by their waitTimeout.
+    socketOptions:
+            List (Optional) (level, option, value) tuples applied to every
+            new socket. Defaults to g_defaultSocketOptions.
+    """
+    def __init__(self, poolSize=2, connectTimeout=5.0, readTimeout=30.0,
+        socketOptions=None):
+        self.poolSize = poolSize
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+
+        if socketOptions is None:
+            socketOptions = g_defaultSocketOptions
+        self.socketOptions = socketOptions
+
+        self._session = requests.Session()
+        self._mount()
+
+    def _mount(self):
+        previous = self._session.get_adapter("http://")
+        adapter = SocketOptionsAdapter(socketOptions=self.socketOptions,
+            pool_connections=1, pool_maxsize=self.poolSize)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Close the idle connections of the replaced pool. Connections in use
+        # are closed as they are released.
+        previous.close()
+
+    def growPool(self, poolSize):
+        """
+        Keep at least poolSize connections open, for example while a file is
+        downloaded over several connections. Calls already sent finish on
+        the connections of the smaller pool, which are then closed.
+        """
+        if poolSize <= self.poolSize:
+            return
+        self.poolSize = poolSize
+        self._mount()
+
+    def timeout(self):
+        """
+        The (connect, read) timeout passed to requests, or None.
+        """
+        if self.connectTimeout is None and self.readTimeout is None:
+            return None
+        return (self.connectTimeout, self.readTimeout)
+
+    def request(self, method, url, **kwargs):
+        if 'timeout' not in kwargs:
+            kwargs['timeout'] = self.timeout()
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """
+        Close all of the pooled connections.
+        """
+        self._session.close()
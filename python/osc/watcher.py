@@ -0,0 +1,204 @@
+"""
+Change notifications for the state of a camera.
+
+StateWatcher checks the state fingerprint of a camera with checkForUpdates
+from a background thread, and only reads the whole state when the
+fingerprint changed. Callbacks receive the keys of the state that changed,
+so a new capture, a battery change or a change in the remaining storage can
+be acted on without polling state() in a loop.
+
+Usage:
+At the top of your Python script, use
+
+  from osc.watcher import StateWatcher
+
+After you import the library, you can use the commands like this:
+
+  thetas = RicohThetaS()
+  watcher = StateWatcher(thetas, interval=0.5)
+
+  def newFile(diff, state):
+      old, new = diff["_latestFileUri"]
+      print( "New file : %s" % new )
+
+  watcher.addCallback(newFile, keys=["_latestFileUri"])
+  watcher.start()
+
+  thetas.takePicture()
+  ...
+  watcher.stop()
+"""
+
+import threading
+
+__author__ = 'Haarm-Pieter Duiker'
+__copyright__ = 'Copyright (C) 2016 - Duiker Research Corp'
+__license__ = ''
+__maintainer__ = 'Haarm-Pieter Duiker'
+__email__ = 'support@duikerresearch.org'
+__status__ = 'Production'
+
+__major_version__ = '1'
+__minor_version__ = '0'
+__change_version__ = '0'
+__version__ = '.'.join((__major_version__,
+                        __minor_version__,
+                        __change_version__))
+
+__all__ = ['StateWatcher',
+           'stateDiff']
+
+def stateDiff(old, new):
+    """
+    The top level keys whose values differ between two states, as a dict of
+    key: (old value, new value). Keys missing from one of the states have a
+    value of None there.
+    """
+    old = old or {}
+    new = new or {}
+    diff = {}
+    for key in set(old) | set(new):
+        before = old.get(key)
+        after = new.get(key)
+        if before != after:
+            diff[key] = (before, after)
+    return diff
+
+class StateWatcher(object):
+    """
+    Watch the state of a camera and call back when it changes.
+
+    camera:
+            OpenSphericalCamera The camera to watch.
+    interval:
+            Float Time between two fingerprint checks, in seconds.
+    waitTimeout:
+            Integer (Optional) Passed on to checkForUpdates, for cameras that
+            hold the request until the state changes.
+
+    The state when the watcher starts is the baseline, and doesn't call
+    back. Callbacks are called from the watcher thread.
+    """
+    def __init__(self, camera, interval=1.0, waitTimeout=None):
+        self.camera = camera
+        self.interval = interval
+        self.waitTimeout = waitTimeout
+
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._state = None
+        # Fingerprint of the state the watcher last read, which may be older
+        # than the camera's if other calls updated it
+        self._fingerprint = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.checks = 0
+        self.updates = 0
+        self.failures = 0
+
+    def addCallback(self, callback, keys=None):
+        """
+        Call callback(diff, state) when the state changes. diff holds the
+        keys that changed, as returned by stateDiff. With keys, the callback
+        is only called when one of those keys changed.
+        """
+        if keys is not None:
+            keys = set(keys)
+        with self._lock:
+            self._callbacks.append((callback, keys))
+
+    def removeCallback(self, callback):
+        with self._lock:
+            self._callbacks = [(registered, keys) for registered, keys in
+                self._callbacks if registered != callback]
+
+    def state(self):
+        """
+        The last state read by the watcher, or None.
+        """
+        return self._state
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Read the baseline state and start the watcher thread.
+        """
+        if self.running():
+            return
+        if self._state is None:
+            self._readState()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="osc-state-watcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+
+    def _readState(self):
+        state = self.camera.state()
+        if state is None:
+            self.failures += 1
+            return None
+        self._state = state
+        self._fingerprint = self.camera.fingerprint
+        return state
+
+    def poll(self):
+        """
+        Check the fingerprint once, calling back if the state changed.
+        Returns the diff, which is empty if nothing changed, or None if the
+        camera couldn't be reached.
+        """
+        self.checks += 1
+        if self._state is None:
+            # No baseline yet
+            if self._readState() is None:
+                return None
+            return {}
+
+        fingerprint = self.camera.checkFingerprint(self.waitTimeout)
+        if fingerprint is None:
+            self.failures += 1
+            return None
+        if fingerprint == self._fingerprint:
+            return {}
+
+        old = self._state
+        new = self._readState()
+        if new is None:
+            return None
+        self.updates += 1
+
+        diff = stateDiff(old, new)
+        if diff:
+            self._notify(diff, new)
+        return diff
+
+    def _notify(self, diff, state):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback, keys in callbacks:
+            if keys is not None and keys.isdisjoint(diff):
+                continue
+            try:
+                callback(diff, state)
+            except Exception, e:
+                print( "State watcher callback failed : %s" % repr(e) )
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception, e:
+                self.failures += 1
+                print( "State watcher check failed : %s" % repr(e) )
+            self._stop.wait(self.interval)
+# StateWatcher
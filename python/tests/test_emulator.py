@@ -0,0 +1,203 @@
+"""
+End to end tests of downloads, retries and cassettes against the camera
+emulator.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from osc.cassette import RecordingTransport, ReplayTransport
+from osc.download import SegmentedDownload
+from osc.emulator import CameraEmulator
+from osc.errors import ServiceUnavailable
+from osc.theta import RicohThetaS
+from osc.transport import HTTPTransport
+
+class EmulatorTestCase(unittest.TestCase):
+    fileSize = 300000
+    videoSize = 2000000
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="osctest")
+        self.emulator = CameraEmulator(files=3, fileSize=self.fileSize,
+            videoSize=self.videoSize, stitchDelay=0.1)
+        self.emulator.start()
+        self.host, self.port = self.emulator.address()
+
+    def tearDown(self):
+        # The camera closes its session when it is collected
+        self.__dict__.pop("camera", None)
+        self.emulator.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read(self, name):
+        with open(self.path(name), 'rb') as handle:
+            return handle.read()
+
+class TestDownloads(EmulatorTestCase):
+    def setUp(self):
+        EmulatorTestCase.setUp(self)
+        self.camera = RicohThetaS(self.host, self.port)
+        self.imageUri = self.camera.latestFileUri()
+        self.image = self.emulator._payload(self.fileSize)
+
+    def test_download(self):
+        self.assertTrue(self.camera.getImage(self.imageUri,
+            fileName=self.path("image.jpg")))
+        self.assertEqual(self.read("image.jpg"), self.image)
+        self.assertFalse(os.path.exists(self.path("image.jpg.part")))
+
+    def test_resume(self):
+        offset = 100000
+        with open(self.path("image.jpg.part"), 'wb') as handle:
+            handle.write(self.image[:offset])
+        sent = self.emulator.bytesSent
+
+        self.assertTrue(self.camera.getImage(self.imageUri,
+            fileName=self.path("image.jpg")))
+        self.assertEqual(self.read("image.jpg"), self.image)
+        # Only the missing bytes were sent
+        self.assertTrue(self.emulator.bytesSent - sent < self.fileSize - offset + 1000)
+
+    def test_resume_complete_part(self):
+        with open(self.path("image.jpg.part"), 'wb') as handle:
+            handle.write(self.image)
+        self.assertTrue(self.camera.getImage(self.imageUri,
+            fileName=self.path("image.jpg")))
+        self.assertEqual(self.read("image.jpg"), self.image)
+
+    def test_oversized_part(self):
+        with open(self.path("image.jpg.part"), 'wb') as handle:
+            handle.write("x" * (self.fileSize + 5000))
+        for attempt in range(2):
+            self.assertTrue(self.camera.getImage(self.imageUri,
+                fileName=self.path("image.jpg"), retries=0))
+            self.assertEqual(self.read("image.jpg"), self.image)
+
+    def test_part_of_another_file(self):
+        offset = 100000
+        with open(self.path("image.jpg.part"), 'wb') as handle:
+            handle.write("x" * offset)
+        with open(self.path("image.jpg.part.json"), 'w') as handle:
+            json.dump({"size": self.fileSize + 1}, handle)
+        self.assertTrue(self.camera.getImage(self.imageUri,
+            fileName=self.path("image.jpg"), retries=0))
+        self.assertEqual(self.read("image.jpg"), self.image)
+        self.assertFalse(os.path.exists(self.path("image.jpg.part.json")))
+
+    def test_missing_file(self):
+        self.assertFalse(self.camera.getImage("100RICOH/MISSING.JPG",
+            fileName=self.path("missing.jpg")))
+        self.assertFalse(os.path.exists(self.path("missing.jpg")))
+
+    def test_segmented(self):
+        self.camera.startCapture()
+        self.camera.stopCapture()
+        videoUri = self.camera.latestFileUri()
+
+        def send(headers):
+            return self.camera._getVideoResponse(videoUri, "full", headers)
+        download = SegmentedDownload(send, self.path("video.mp4"), connections=4,
+            segmentSize=262144, chunkSize=65536)
+        self.assertTrue(download.run())
+        self.assertEqual(download.received, self.videoSize)
+        self.assertEqual(self.read("video.mp4"), self.emulator._payload(self.videoSize))
+
+    def test_segmented_open_ended_range(self):
+        self.camera.startCapture()
+        self.camera.stopCapture()
+        videoUri = self.camera.latestFileUri()
+
+        # A camera that answers every range with the rest of the file
+        def send(headers):
+            headers = dict(headers)
+            headers['Range'] = headers['Range'].split('-')[0] + '-'
+            return self.camera._getVideoResponse(videoUri, "full", headers)
+        download = SegmentedDownload(send, self.path("video.mp4"), connections=4,
+            segmentSize=262144, chunkSize=65536)
+        self.assertEqual(download.run(), None)
+        # Only the last segment, which the range does end at, is read
+        self.assertTrue(download.received <= 262144)
+        self.assertFalse(os.path.exists(self.path("video.mp4.segments")))
+
+    def test_segmented_keeps_part(self):
+        self.camera.startCapture()
+        self.camera.stopCapture()
+        videoUri = self.camera.latestFileUri()
+        with open(self.path("video.mp4.part"), 'wb') as handle:
+            handle.write(self.emulator._payload(self.videoSize)[:100000])
+
+        def send(headers):
+            if 'Range' in headers:
+                return self.camera._getVideoResponse(videoUri, "full", {})
+            return self.camera._getVideoResponse(videoUri, "full", headers)
+        self.assertEqual(SegmentedDownload(send, self.path("video.mp4")).run(), None)
+        self.assertEqual(os.path.getsize(self.path("video.mp4.part")), 100000)
+
+    def test_segmented_getVideo(self):
+        self.camera.startCapture()
+        self.camera.stopCapture()
+        videoUri = self.camera.latestFileUri()
+        self.assertTrue(self.camera.getVideo(videoUri,
+            fileName=self.path("video.mp4"), connections=4))
+        self.assertEqual(self.read("video.mp4"), self.emulator._payload(self.videoSize))
+        self.assertFalse(os.path.exists(self.path("video.mp4.segments")))
+        self.assertTrue(self.camera.getTransport().poolSize >= 4)
+
+class TestRetries(EmulatorTestCase):
+    def setUp(self):
+        EmulatorTestCase.setUp(self)
+        self.camera = RicohThetaS(self.host, self.port)
+        self.scheduler = self.camera.getScheduler()
+        self.scheduler.baseDelay = 0.001
+        self.scheduler.maxDelay = 0.01
+
+    def test_busy_is_retried(self):
+        self.emulator.failNext(3)
+        self.assertTrue(self.camera.state() is not None)
+        self.assertEqual(self.scheduler.retries, 3)
+
+    def test_retries_run_out(self):
+        self.scheduler.maxRetries = 2
+        self.emulator.failNext(5)
+        self.camera.setRaiseErrors(True)
+        with self.assertRaises(ServiceUnavailable) as context:
+            self.camera.state()
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(self.scheduler.retries, 2)
+
+    def test_other_errors_are_not_retried(self):
+        self.emulator.failNext(1, "invalidParameterValue", 400)
+        self.assertEqual(self.camera.state(), None)
+        self.assertEqual(self.scheduler.retries, 0)
+
+class TestCassette(EmulatorTestCase):
+    def test_replay(self):
+        cassette = self.path("session.cassette")
+        transport = RecordingTransport(cassette, HTTPTransport())
+        camera = RicohThetaS(self.host, self.port, transport=transport)
+        state = camera.state()
+        fileUri = camera.takePicture().result(timeout=5)["fileUri"]
+        self.assertTrue(camera.getImage(fileUri, fileName=self.path("recorded.jpg")))
+        del camera
+        transport.close()
+        self.emulator.stop()
+
+        camera = RicohThetaS(self.host, self.port,
+            transport=ReplayTransport(cassette, speed=None))
+        self.assertEqual(camera.state(), state)
+        self.assertEqual(camera.takePicture().result(timeout=5)["fileUri"], fileUri)
+        self.assertTrue(camera.getImage(fileUri, fileName=self.path("replayed.jpg")))
+        self.assertEqual(self.read("replayed.jpg"), self.read("recorded.jpg"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests of the incremental listing parser.
+"""
+
+import base64
+import json
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from osc.listing import ListEntry, ListingParser
+
+def _entries(count):
+    entries = []
+    for index in range(count):
+        entries.append({
+            "name": u"R%07d.JPG" % index,
+            "uri": u"100RICOH/R%07d.JPG" % index,
+            "size": 4000000 + index,
+            "dateTime": u"2016:01:01 00:00:%02d" % (index % 60),
+            # Braces, brackets and quotes inside strings, and unicode
+            "_comment": u'}{ ] [ \\"} caf\xe9 \u65e5\u672c %d' % index,
+            "_nested": {"a": [{"b": {}}, []], "c": u"}"},
+            "thumbnail": base64.b64encode(chr(index % 256) * 3000)
+        })
+    return entries
+
+def _response(entries, arrayKey="entries"):
+    return json.dumps({"name": "camera.listImages", "state": "done",
+        "results": {arrayKey: entries, "totalEntries": len(entries),
+            "continuationToken": "10"}})
+
+def _parse(parser, body, splits):
+    entries = []
+    previous = 0
+    for split in sorted(splits) + [len(body)]:
+        entries.extend(parser.feed(body[previous:split]))
+        previous = split
+    return entries
+
+class TestListingParser(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random(0)
+        self.entries = _entries(10)
+        self.body = _response(self.entries)
+
+    def _check(self, body, entries, splits, arrayKey="entries"):
+        parser = ListingParser(arrayKey)
+        self.assertEqual(_parse(parser, body, splits), entries)
+        self.assertEqual(parser.entries, len(entries))
+        self.assertEqual(parser.bytesRead, len(body))
+        response = parser.close()
+        self.assertEqual(response["results"][arrayKey], [])
+        self.assertEqual(response["results"]["continuationToken"], "10")
+
+    def test_whole_body(self):
+        self._check(self.body, self.entries, [])
+
+    def test_random_splits(self):
+        for count in (1, 10, 100, 1000):
+            splits = [self.random.randint(0, len(self.body)) for i in range(count)]
+            self._check(self.body, self.entries, splits)
+
+    def test_small_blocks(self):
+        body = _response(self.entries[:2])
+        self._check(body, self.entries[:2], range(0, len(body), 3))
+
+    def test_utf8_body(self):
+        # Multibyte characters split across blocks
+        body = json.dumps(json.loads(self.body), ensure_ascii=False).encode('utf-8')
+        splits = [self.random.randint(0, len(body)) for i in range(500)]
+        self._check(body, self.entries, splits)
+
+    def test_entry_type(self):
+        entries = ListingParser().feed(self.body)
+        self.assertTrue(isinstance(entries[0], ListEntry))
+        self.assertEqual(entries[0].thumbnail(), chr(0) * 3000)
+
+    def test_whitespace(self):
+        body = json.dumps(json.loads(self.body), indent=4)
+        splits = [self.random.randint(0, len(body)) for i in range(100)]
+        self._check(body, self.entries, splits)
+
+    def test_array_key(self):
+        body = _response(self.entries, "_files")
+        self._check(body, self.entries, [17, 50, 400], "_files")
+
+    def test_empty_listing(self):
+        self._check(_response([]), [], [5])
+
+    def test_error_response(self):
+        body = json.dumps({"name": "camera.listImages", "state": "error",
+            "error": {"code": "invalidParameterValue", "message": "}"}})
+        parser = ListingParser()
+        self.assertEqual(parser.feed(body[:20]) + parser.feed(body[20:]), [])
+        self.assertEqual(parser.close()["error"]["code"], "invalidParameterValue")
+
+    def test_incomplete_body(self):
+        parser = ListingParser()
+        parser.feed(self.body[:len(self.body) // 2])
+        self.assertRaises(ValueError, parser.close)
+
+    def test_partial_entry_is_buffered(self):
+        parser = ListingParser()
+        parser.feed(self.body[:200])
+        self.assertTrue(0 < parser.buffered() <= 200)
+
+if __name__ == '__main__':
+    unittest.main()
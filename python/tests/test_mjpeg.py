@@ -0,0 +1,108 @@
+"""
+Tests of the motion jpeg demuxer.
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from osc.mjpeg import EOI, SOI, MJPEGParser, boundaryFromContentType
+
+_boundary = "---osclivepreview---"
+
+def _jpeg(index, size):
+    body = "".join(chr((index + offset) % 256) for offset in range(size))
+    # Markers can appear inside a jpeg, for example in an embedded thumbnail
+    return SOI + body + EOI + body[:7] + EOI
+
+def _part(jpeg, contentLength=True, lengthDelta=0):
+    headers = "Content-type: image/jpeg\r\n"
+    if contentLength:
+        headers += "Content-Length: %d\r\n" % (len(jpeg) + lengthDelta)
+    return "%s\r\n%s\r\n%s\r\n" % (_boundary, headers, jpeg)
+
+def _feed(parser, stream, splits):
+    frames = []
+    previous = 0
+    for split in sorted(splits) + [len(stream)]:
+        frames.extend(parser.feed(stream[previous:split]))
+        previous = split
+    return frames
+
+class TestMJPEGParser(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random(0)
+        self.jpegs = [_jpeg(index, self.random.randint(10, 3000))
+            for index in range(20)]
+
+    def _randomSplits(self, stream, count):
+        return [self.random.randint(0, len(stream)) for i in range(count)]
+
+    def _check(self, stream, boundary, splitCounts=(0, 1, 10, 100, 1000)):
+        # Without a usable Content-Length, a frame is complete once the next
+        # boundary arrives
+        stream += _boundary
+        for count in splitCounts:
+            parser = MJPEGParser(boundary)
+            frames = _feed(parser, stream, self._randomSplits(stream, count))
+            self.assertEqual(frames, self.jpegs)
+            self.assertEqual(parser.frames, len(self.jpegs))
+            self.assertEqual(parser.bytesRead, len(stream))
+
+    def test_content_length(self):
+        stream = "".join(_part(jpeg) for jpeg in self.jpegs)
+        self._check(stream, _boundary)
+
+    def test_without_content_length(self):
+        stream = "".join(_part(jpeg, contentLength=False) for jpeg in self.jpegs)
+        self._check(stream, _boundary)
+
+    def test_wrong_content_length(self):
+        for delta in (-5, -1, 1, 5):
+            stream = "".join(_part(jpeg, lengthDelta=delta) for jpeg in self.jpegs)
+            self._check(stream, _boundary, (0, 10, 100))
+
+    def test_byte_at_a_time(self):
+        stream = "".join(_part(jpeg) for jpeg in self.jpegs[:3])
+        parser = MJPEGParser(_boundary)
+        frames = []
+        for char in stream:
+            frames.extend(parser.feed(char))
+        self.assertEqual(frames, self.jpegs[:3])
+
+    def test_without_boundary(self):
+        jpegs = [SOI + "frame %d" % index + EOI for index in range(20)]
+        stream = "".join(jpegs)
+        for count in (0, 10, 100):
+            parser = MJPEGParser()
+            self.assertEqual(_feed(parser, stream,
+                self._randomSplits(stream, count)), jpegs)
+
+    def test_part_without_jpeg(self):
+        stream = (_part(self.jpegs[0], contentLength=False) +
+            "%s\r\nContent-type: text/plain\r\n\r\nnot a frame\r\n" % _boundary +
+            _part(self.jpegs[1], contentLength=False) + _boundary)
+        self.assertEqual(MJPEGParser(_boundary).feed(stream), self.jpegs[:2])
+
+    def test_consumed_bytes_are_dropped(self):
+        parser = MJPEGParser(_boundary)
+        for jpeg in self.jpegs:
+            parser.feed(_part(jpeg))
+        self.assertTrue(parser.buffered() < 100)
+
+class TestBoundaryFromContentType(unittest.TestCase):
+    def test_boundary(self):
+        self.assertEqual(boundaryFromContentType(
+            'multipart/x-mixed-replace; boundary="%s"' % _boundary), _boundary)
+        self.assertEqual(boundaryFromContentType(
+            'multipart/x-mixed-replace;BOUNDARY=frame; charset=x'), "frame")
+
+    def test_no_boundary(self):
+        self.assertEqual(boundaryFromContentType(None), None)
+        self.assertEqual(boundaryFromContentType("image/jpeg"), None)
+
+if __name__ == '__main__':
+    unittest.main()